@@ -1,12 +1,18 @@
 import os
+import sys
 import asyncio
 from dotenv import load_dotenv
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.graph import StateGraph, MessagesState, START
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_openai import ChatOpenAI
-from typing import Any, List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Tuple
 from dataclasses import dataclass
+from contextlib import AsyncExitStack
+from tracing import Tracer, span, use_tracer, run_config
+from mcp_transport import client_connection
+
+# langgraph、langchain_openai、MCP客户端等较重的依赖在用到时才导入，
+# 保证 import 本模块和命令行启动足够快（见 benchmarks/bench_import_time.py）
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from step_limits import StepLimits
 
 load_dotenv()
 
@@ -23,11 +29,11 @@ def get_mcp_config() -> Dict[str, Dict[str, str]]:
     """获取MCP配置"""
     config = {}
     
-    # 天气服务器配置
-    config["weather"] = {
-        "url": "http://localhost:8000/sse",
-        "transport": "sse",
-    }
+    # 天气服务器配置：默认使用 streamable HTTP（每次调用的开销最低，响应不依赖长连接），
+    # 可以用 WEATHER_MCP_TRANSPORT=sse 或 stdio（作为子进程启动 weather.py，不需要单独启动服务器）切换
+    weather_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather.py")
+    config["weather"] = client_connection(os.getenv("WEATHER_MCP_TRANSPORT"), "http://localhost:8000",
+                                          [sys.executable, weather_script, "--transport", "stdio"])
     
     # 智谱Web搜索配置（只在有API密钥时添加）
     if zhipu_key:
@@ -47,9 +53,21 @@ class TaskConfig:
 class AgentConfig:
     """智能体配置类"""
     llm: str = "moonshot-v1-32k"  # 语言模型名称
+    fallback_llms: Optional[List[str]] = None  # 备用模型（"提供方:模型"），主模型出错或慢于 p95 时使用；None 为 LLM_FALLBACKS 环境变量（默认不使用）
+    hedge: bool = True  # 主模型慢于 p95 时是否同时向备用模型发出请求（对冲），为False时只在出错时切换
     tools: List[str] = None  # 可用工具列表
-    max_steps: int = 3  # 最大工具调用次数
-    max_iterations: int = 5  # 最大迭代次数
+    max_steps: int = 3  # 每个问题的最大工具调用次数
+    max_iterations: int = 5  # 每个问题的最大模型调用次数（包括最后一次回答）
+    time_budget_s: Optional[float] = None  # 每个问题的时间预算（秒），超出时返回已有的部分结果
+    tool_top_k: Optional[int] = None  # 每个问题只绑定最相关的 k 个工具（缩小提示词），None 表示绑定全部工具
+    cache_tools: bool = True  # 是否缓存工具调用结果（相同参数的重复调用直接返回）
+    fast_path: bool = True  # 是否对简单的算术/字符串问题跳过LLM直接调用本地工具
+    stream: bool = True  # 是否流式输出回答和工具调用进度（并统计首个token耗时）
+    answer_cache: bool = False  # 是否缓存回答（相似的问题直接返回之前的回答，不调用LLM和工具；可能误命中，默认关闭）
+    trace_file: Optional[str] = None  # 记录每个步骤耗时区间的输出文件（None表示不记录）
+    trace_format: str = "chrome"  # 区间导出格式: "chrome"（chrome://tracing / Perfetto）或 "otel"（OTLP JSON）
+    workers: int = 1  # 处理问题的进程数，大于1时使用多进程工作池（见 worker_pool.py，不支持流式输出和追踪）
+    worker_concurrency: int = 4  # 多进程时每个进程内同时处理的问题数
     
     def __post_init__(self):
         if self.tools is None:
@@ -57,7 +75,8 @@ class AgentConfig:
                 "mcp-weather", "mcp-zhipu-web-search", 
                 "add", "multiply", "subtract", "divide", 
                 "square_root", "power", "concatenate", 
-                "to_uppercase", "to_lowercase"
+                "to_uppercase", "to_lowercase",
+                "evaluate_expression", "elementwise", "batch_square_root", "aggregate"
             ]
 
 def parse_tools_config(tools: List[str]) -> Tuple[List[str], List[str]]:
@@ -85,14 +104,18 @@ def load_local_tools(tool_names: List[str]) -> List[Any]:
         from langgraph_tools import (
             add, multiply, subtract, divide, 
             square_root, power, concatenate, 
-            to_uppercase, to_lowercase
+            to_uppercase, to_lowercase,
+            evaluate_expression, elementwise, batch_square_root, aggregate
         )
         
         local_tools_map = {
             "add": add, "multiply": multiply, "subtract": subtract,
             "divide": divide, "square_root": square_root, "power": power,
             "concatenate": concatenate, "to_uppercase": to_uppercase,
-            "to_lowercase": to_lowercase
+            "to_lowercase": to_lowercase,
+            "evaluate_expression": evaluate_expression,
+            "elementwise": elementwise, "batch_square_root": batch_square_root,
+            "aggregate": aggregate
         }
         
         for tool_name in tool_names:
@@ -115,89 +138,203 @@ def build_servers_config(mcp_tools_names: List[str]) -> Dict[str, Dict[str, str]
     for mcp_tool in mcp_tools_names:
         if mcp_tool in mcp_config:
             servers_config[mcp_tool] = mcp_config[mcp_tool]
-            print(f"✓ 添加MCP服务器: {mcp_tool} -> {mcp_config[mcp_tool]['url']}")
+            target = mcp_config[mcp_tool].get("url") or " ".join(mcp_config[mcp_tool]["args"])
+            print(f"✓ 添加MCP服务器: {mcp_tool} -> {target}（{mcp_config[mcp_tool]['transport']}）")
         else:
             print(f"⚠️ 警告: 未找到MCP工具 '{mcp_tool}' 的配置")
     
     return servers_config
 
-async def load_mcp_tools(servers_config: Dict[str, Dict[str, str]]) -> List[Any]:
-    """加载MCP工具"""
+async def load_mcp_tools(servers_config: Dict[str, Dict[str, str]], exit_stack: AsyncExitStack) -> List[Any]:
+    """加载MCP工具（会话由 exit_stack 管理，在整个运行期间保持连接）"""
     if not servers_config:
         print("ℹ️ 没有配置MCP服务器")
         return []
     
-    try:
-        async with MultiServerMCPClient(servers_config) as client:
-            mcp_tools = client.get_tools()
-            print(f"✓ 从MCP服务器加载了 {len(mcp_tools)} 个工具")
-            return mcp_tools
-    except Exception as e:
-        print(f"❌ 连接MCP服务器失败: {e}")
-        return []
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+    from langchain_mcp_adapters.tools import load_mcp_tools as load_session_tools
+    from parallel_tool_node import tag_server_tools
+
+    client = MultiServerMCPClient(servers_config)
+    mcp_tools = []
+    for server_name in servers_config:
+        try:
+            with span(f"connect {server_name}", kind="client", category="mcp", mcp_server=server_name):
+                session = await exit_stack.enter_async_context(client.session(server_name))
+                server_tools = await load_session_tools(session)
+            # 标记所属服务器，ParallelToolNode 按服务器限制并发
+            mcp_tools.extend(tag_server_tools(server_tools, server_name))
+        except Exception as e:
+            print(f"❌ 连接MCP服务器 {server_name} 失败: {e}")
+    
+    print(f"✓ 从MCP服务器加载了 {len(mcp_tools)} 个工具")
+    return mcp_tools
+
+def create_model(agent_config: AgentConfig) -> "ChatOpenAI":
+    """创建语言模型（同一进程内的所有运行共用到 api.moonshot.cn 的连接池，配置了备用模型时带故障切换和对冲）"""
+    from model_factory import get_routed_model
+
+    return get_routed_model(agent_config.llm, temperature=0.7,  # 使用固定的temperature值
+                            fallbacks=agent_config.fallback_llms, hedge=agent_config.hedge)
+
+def create_graph(model: "ChatOpenAI", tools: List[Any], fast_path: bool = False,
+                 limits: Optional["StepLimits"] = None, tool_top_k: Optional[int] = None,
+                 verbose: bool = True) -> Any:
+    """
+    创建LangGraph状态图
+
+    参数:
+        model: 语言模型
+        tools: 工具列表
+        fast_path: 为True时，简单的算术/字符串问题直接调用本地工具，不经过LLM
+        limits: 每个问题的工具调用次数、迭代次数和时间预算限制，达到限制时返回部分回答
+        tool_top_k: 每个问题只给模型绑定最相关的 k 个工具（见 tool_retrieval.py），None 表示绑定全部工具
+        verbose: 是否打印每一步工具调用的耗时统计（批处理、多进程和基准测试时关闭）
+    """
+    import time
+    from langgraph.graph import StateGraph, MessagesState, START
+    from langgraph.prebuilt import tools_condition
+    from parallel_tool_node import ParallelToolNode
+    from fast_path import make_fast_path_node, route_after_fast_path
+    from history import truncate_tool_messages
+    from step_limits import StepLimits
+
+    limits = limits or StepLimits()
+    if tool_top_k is not None and len(tools) > tool_top_k:
+        from tool_retrieval import make_tool_selector
+
+        select_model = make_tool_selector(model, tools, tool_top_k)
+    else:
+        bound_model = model.bind_tools(tools)
+        select_model = lambda question: bound_model
+
+    class AgentState(MessagesState):
+        started_at: float  # 开始处理问题的时间（time.monotonic），用于时间预算
+        deadline: Optional[float]  # 时间预算的截止时间，ParallelToolNode 据此取消到期的工具调用
+
+    async def call_model(state: AgentState):
+        """模型调用节点（过长的工具输出截断后再发给模型，只返回新消息，由 add_messages 追加）"""
+        messages = state["messages"]
+        started_at = state.get("started_at") or time.monotonic()
+        update = {} if state.get("started_at") else {"started_at": started_at, "deadline": limits.deadline(started_at)}
+
+        reason = limits.exhausted(messages, started_at)
+        if reason is not None:
+            return {"messages": [await limits.final_answer(model, messages, reason, started_at)], **update}
 
-def create_model(agent_config: AgentConfig) -> ChatOpenAI:
-    """创建语言模型"""
-    return ChatOpenAI(
-        openai_api_base="https://api.moonshot.cn/v1",
-        openai_api_key=moonshot_key,
-        model_name=agent_config.llm,
-        temperature=0.7  # 使用固定的temperature值
-    )
-
-def create_graph(model: ChatOpenAI, tools: List[Any]) -> Any:
-    """创建LangGraph状态图"""
-    def call_model(state: MessagesState):
-        """模型调用节点"""
-        response = model.bind_tools(tools).invoke(state["messages"])
-        return {"messages": state["messages"] + [response]}
-
-    builder = StateGraph(MessagesState)
+        question = next((str(m.content) for m in reversed(messages) if m.type == "human"), "")
+        call = select_model(question).ainvoke(truncate_tool_messages(messages))
+        remaining = limits.remaining(started_at)
+        try:
+            response = await (asyncio.wait_for(call, remaining) if remaining is not None else call)
+        except asyncio.TimeoutError:
+            return {"messages": [await limits.final_answer(model, messages, "time_budget", started_at)], **update}
+        return {"messages": [limits.cap_tool_calls(response, messages)], **update}
+
+    builder = StateGraph(AgentState)
     builder.add_node("call_model", call_model)
-    builder.add_node("tools", ToolNode(tools))
-    builder.add_edge(START, "call_model")
+    builder.add_node("tools", ParallelToolNode(tools, verbose=verbose))
+    if fast_path:
+        builder.add_node("fast_path", make_fast_path_node(tools))
+        builder.add_edge(START, "fast_path")
+        builder.add_conditional_edges("fast_path", route_after_fast_path)
+    else:
+        builder.add_edge(START, "call_model")
     builder.add_conditional_edges("call_model", tools_condition)
     builder.add_edge("tools", "call_model")
     
-    return builder.compile()
+    graph = builder.compile()
+    recursion_limit = limits.recursion_limit(fast_path)
+    return graph.with_config(recursion_limit=recursion_limit) if recursion_limit else graph
 
-async def process_questions(graph: Any, questions: List[str]) -> Tuple[List[Dict], int]:
-    """处理问题列表"""
+async def process_questions(graph: Any, questions: List[str], stream: bool = False,
+                            answer_cache: Any = None) -> Tuple[List[Dict], int]:
+    """处理问题列表（stream 为True时边生成边打印回答，并记录首个token耗时；answer_cache 为回答缓存）"""
     responses = []
     successful_tests = 0
     
     for i, question in enumerate(questions):
         print(f"\n=== 处理问题 {i+1}/{len(questions)}: {question} ===")
         
-        try:
-            response = await graph.ainvoke({
-                "messages": [{"role": "user", "content": question}]
-            })
+        with span("question", category="question", index=i + 1, question=question):
+            try:
+                cached = None
+                if answer_cache is not None:
+                    with span("answer_cache.lookup", category="cache") as lookup:
+                        cached = answer_cache.lookup(question)
+                        if lookup is not None:
+                            lookup.attributes["hit"] = cached is not None
+                if cached is not None:
+                    print(f"💾 命中回答缓存（相似度 {cached['similarity']:.2f}，原问题: {cached['question']}）")
+                    print(f"回答: {cached['answer']}")
+                    responses.append({
+                        "question": question,
+                        "answer": cached["answer"],
+                        "success": True,
+                        "cached": True
+                    })
+                    successful_tests += 1
+                    continue
+
+                if stream:
+                    from streaming import print_stream
+
+                    final = await print_stream(graph, question, config=run_config())
+                    success = final["answer"] is not None
+                    responses.append({
+                        "question": question,
+                        "answer": final["answer"] if success else "异常回答: 没有生成回答",
+                        "success": success,
+                        "ttft_ms": final["ttft_ms"],
+                        "total_ms": final["total_ms"],
+                        "stopped_by": final["stopped_by"],
+                        "routed_to": final["routed_to"]
+                    })
+                    if final["stopped_by"]:
+                        print(f"⚠️ 达到执行限制 ({final['stopped_by']})，返回的是部分回答")
+                    successful_tests += success
+                    if success and answer_cache is not None and not final["stopped_by"]:  # 部分回答不缓存
+                        answer_cache.store(question, final["answer"], final["tools"])
+                else:
+                    response = await graph.ainvoke({
+                        "messages": [{"role": "user", "content": question}]
+                    }, config=run_config())
             
-            if response and "messages" in response:
-                last_message = response["messages"][-1]
-                print(f"回答: {last_message.content}")
+                    if response and "messages" in response:
+                        from model_router import routed_models
+
+                        last_message = response["messages"][-1]
+                        print(f"回答: {last_message.content}")
+                        stopped_by = last_message.response_metadata.get("stopped_by")
+                        if stopped_by:
+                            print(f"⚠️ 达到执行限制 ({stopped_by})，返回的是部分回答")
                 
+                        responses.append({
+                            "question": question,
+                            "answer": last_message.content,
+                            "success": True,
+                            "stopped_by": stopped_by,
+                            "routed_to": routed_models(response["messages"])
+                        })
+                        successful_tests += 1
+                        if answer_cache is not None and not stopped_by:
+                            from answer_cache import tools_used
+
+                            answer_cache.store(question, last_message.content, tools_used(response["messages"]))
+                    else:
+                        responses.append({
+                            "question": question,
+                            "answer": f"异常回答: {response}",
+                            "success": False
+                        })
+                
+            except Exception as e:
+                print(f"处理失败: {e}")
                 responses.append({
                     "question": question,
-                    "answer": last_message.content,
-                    "success": True
-                })
-                successful_tests += 1
-            else:
-                responses.append({
-                    "question": question,
-                    "answer": f"异常回答: {response}",
+                    "answer": f"错误: {str(e)}",
                     "success": False
                 })
-                
-        except Exception as e:
-            print(f"处理失败: {e}")
-            responses.append({
-                "question": question,
-                "answer": f"错误: {str(e)}",
-                "success": False
-            })
     
     return responses, successful_tests
 
@@ -208,47 +345,25 @@ async def run_agent(task_config: TaskConfig, agent_config: AgentConfig) -> Dict[
     print(f"工具: {agent_config.tools}")
     print(f"任务: {len(task_config.questions)} 个问题")
     
+    if agent_config.workers > 1:
+        from worker_pool import run_agent_pool
+
+        try:
+            return await run_agent_pool(task_config, agent_config)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"运行智能体失败: {str(e)}",
+                "agent_config": agent_config,
+                "task_config": task_config
+            }
+
+    tracer = Tracer("agent_langgraph", spill_path=f"{agent_config.trace_file}.spill") if agent_config.trace_file else None
     try:
-        # 1. 解析工具配置
-        mcp_tools_names, local_tools_names = parse_tools_config(agent_config.tools)
-        print(f"MCP工具: {mcp_tools_names}")
-        print(f"本地工具: {local_tools_names}")
-        
-        # 2. 加载工具
-        servers_config = build_servers_config(mcp_tools_names)
-        mcp_tools = await load_mcp_tools(servers_config)
-        local_tools = load_local_tools(local_tools_names)
-        
-        all_tools = mcp_tools + local_tools
-        print(f"总共加载 {len(all_tools)} 个工具")
-        
-        if len(all_tools) == 0:
-            return {"success": False, "error": "没有加载到任何工具"}
-        
-        # 3. 创建模型和图
-        model = create_model(agent_config)
-        graph = create_graph(model, all_tools)
-        print("✓ LangGraph状态图构建完成")
-        
-        # 4. 处理问题
-        responses, successful_tests = await process_questions(graph, task_config.questions)
-        
-        # 5. 返回结果
-        result = {
-            "success": True,
-            "total_questions": len(task_config.questions),
-            "successful_tests": successful_tests,
-            "success_rate": successful_tests / len(task_config.questions),
-            "responses": responses,
-            "agent_config": agent_config,
-            "task_config": task_config
-        }
-        
-        print(f"\n=== 任务完成 ===")
-        print(f"成功率: {successful_tests}/{len(task_config.questions)} ({result['success_rate']:.1%})")
-        
-        return result
-        
+        with use_tracer(tracer):
+            async with AsyncExitStack() as exit_stack:
+                with span("run_agent", category="run", model=agent_config.llm):
+                    return await _run_agent(task_config, agent_config, exit_stack)
     except Exception as e:
         return {
             "success": False,
@@ -256,11 +371,109 @@ async def run_agent(task_config: TaskConfig, agent_config: AgentConfig) -> Dict[
             "agent_config": agent_config,
             "task_config": task_config
         }
+    finally:
+        if tracer is not None:
+            tracer.export(agent_config.trace_file, agent_config.trace_format)
+            tracer.close()
+            summary = tracer.summary()
+            print(f"🧭 已记录 {summary['spans']} 个区间 -> {agent_config.trace_file}")
+            for category, entry in summary["by_category"].items():
+                print(f"   {category}: {entry['count']} 个，共 {entry['total_ms']:.0f}ms")
+            print(f"   最慢: " + "，".join(f"{name} {ms:.0f}ms" for name, ms in summary["slowest"]))
+
+async def build_agent(agent_config: AgentConfig, exit_stack: AsyncExitStack, verbose: bool = True) -> Optional[Any]:
+    """
+    按配置加载工具、创建模型并构建状态图
+
+    参数:
+        agent_config: 智能体配置
+        exit_stack: 管理MCP会话的 AsyncExitStack，关闭前会话保持连接
+        verbose: 是否打印每一步工具调用的耗时统计，见 create_graph
+
+    返回:
+        编译后的状态图；没有加载到任何工具时返回None
+    """
+    from tool_cache import apply_tool_cache
+
+    # 1. 解析工具配置
+    mcp_tools_names, local_tools_names = parse_tools_config(agent_config.tools)
+    print(f"MCP工具: {mcp_tools_names}")
+    print(f"本地工具: {local_tools_names}")
+
+    # 2. 加载工具
+    with span("load_tools"):
+        servers_config = build_servers_config(mcp_tools_names)
+        mcp_tools = await load_mcp_tools(servers_config, exit_stack)
+        local_tools = load_local_tools(local_tools_names)
+
+        all_tools = mcp_tools + local_tools
+        if agent_config.cache_tools:
+            all_tools = apply_tool_cache(all_tools)
+    print(f"总共加载 {len(all_tools)} 个工具")
+
+    if len(all_tools) == 0:
+        return None
+
+    # 3. 创建模型和图
+    with span("create_graph"):
+        from step_limits import StepLimits
+
+        model = create_model(agent_config)
+        limits = StepLimits(agent_config.max_steps, agent_config.max_iterations, agent_config.time_budget_s)
+        graph = create_graph(model, all_tools, fast_path=agent_config.fast_path, limits=limits,
+                             tool_top_k=agent_config.tool_top_k, verbose=verbose)
+    print("✓ LangGraph状态图构建完成")
+    return graph
+
+async def _run_agent(task_config: TaskConfig, agent_config: AgentConfig, exit_stack: AsyncExitStack) -> Dict[str, Any]:
+    """运行智能体的主体逻辑，MCP会话在 exit_stack 关闭前保持连接"""
+    from tool_cache import default_tool_cache
+    from answer_cache import default_answer_cache
+    from model_router import default_latency_tracker, format_router_stats
+
+    graph = await build_agent(agent_config, exit_stack)
+    if graph is None:
+        return {"success": False, "error": "没有加载到任何工具"}
+
+    # 4. 处理问题
+    answer_cache = default_answer_cache if agent_config.answer_cache else None
+    responses, successful_tests = await process_questions(graph, task_config.questions, stream=agent_config.stream,
+                                                          answer_cache=answer_cache)
+
+    # 5. 返回结果
+    result = {
+        "success": True,
+        "total_questions": len(task_config.questions),
+        "successful_tests": successful_tests,
+        "success_rate": successful_tests / len(task_config.questions),
+        "responses": responses,
+        "agent_config": agent_config,
+        "task_config": task_config,
+        "trace_file": agent_config.trace_file
+    }
+
+    print(f"\n=== 任务完成 ===")
+    print(f"成功率: {successful_tests}/{len(task_config.questions)} ({result['success_rate']:.1%})")
+    stopped = [r["stopped_by"] for r in responses if r.get("stopped_by")]
+    if stopped:
+        print(f"达到执行限制: {len(stopped)} 个问题 ({', '.join(sorted(set(stopped)))})")
+    ttfts = [r["ttft_ms"] for r in responses if "ttft_ms" in r]
+    if ttfts:
+        print(f"首个token耗时: 平均 {sum(ttfts) / len(ttfts):.0f}ms，最长 {max(ttfts):.0f}ms")
+    if agent_config.cache_tools:
+        print(f"工具缓存: {default_tool_cache.stats()}")
+    if agent_config.answer_cache:
+        print(f"回答缓存: {default_answer_cache.stats()}")
+    router_stats = default_latency_tracker.stats()
+    if router_stats:
+        print(f"模型路由:\n{format_router_stats(router_stats)}")
+
+    return result
 
 # 默认配置
 default_agent_config = AgentConfig(
     llm="moonshot-v1-32k",
-    tools=["mcp-weather", "mcp-zhipu-web-search", "add", "multiply", "subtract", "divide", "square_root", "power", "concatenate", "to_uppercase", "to_lowercase"]
+    tools=["mcp-weather", "mcp-zhipu-web-search", "add", "multiply", "subtract", "divide", "square_root", "power", "concatenate", "to_uppercase", "to_lowercase", "evaluate_expression", "elementwise", "batch_square_root", "aggregate"]
 )
 
 default_task_config = TaskConfig(
@@ -4,10 +4,18 @@ import asyncio
 import logging
 import warnings
 import atexit
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
+from rate_limiter import get_rate_limiter, apply_rate_limit
+from model_factory import get_chat_model, get_routed_model
+from streaming import stream_agent, print_stream
+from async_input import StdinReader
+from history import ChatSession, make_pre_model_hook
+from answer_cache import AnswerCache, default_answer_cache, tools_used
+from mcp_server_pool import StdioServerPool
 
 load_dotenv()
 
@@ -68,62 +76,6 @@ def get_mcp_config():
     logger.info(f"📋 MCP配置总数: {len(config)}")
     return config
 
-async def get_mcp_tools():
-    """
-    获取MCP工具列表 - 修复版本兼容性
-    
-    Returns:
-        tuple: (tools, client) - 工具列表和MCP客户端实例
-    """
-    try:
-        config = get_mcp_config()
-        if not config:
-            logger.warning("📭 没有可用的MCP配置")
-            return [], None
-            
-        logger.info(f"🔌 开始连接MCP服务器，配置数量: {len(config)}")
-        
-        # 创建MCP客户端
-        client = MultiServerMCPClient(config)
-        
-        # 方式1：直接获取工具（推荐） - 根据react.py修正
-        try:
-            mcp_tools = await client.get_tools()  # 🔧 修复：确实需要 await
-            logger.info(f"✓ 使用方式1成功，从MCP服务器加载了 {len(mcp_tools)} 个工具")
-            logger.info(f"🔍 工具列表: {mcp_tools}")
-            
-            # 详细日志输出工具信息
-            for i, tool in enumerate(mcp_tools, 1):
-                tool_name = getattr(tool, 'name', 'unknown')
-                tool_desc = getattr(tool, 'description', 'No description')[:100]
-                logger.info(f"  - 工具 {i}: {tool_name}")
-                logger.info(f"    描述: {tool_desc}...")
-            
-            return mcp_tools, client
-            
-        except Exception as e1:
-            logger.warning(f"⚠️ 方式1失败: {e1}")
-            
-            # 方式2：使用session方式（备用）
-            try:
-                all_tools = []
-                for server_name in config.keys():
-                    logger.info(f"🔗 尝试连接服务器: {server_name}")
-                    async with client.session(server_name) as session:
-                        # 这里需要根据实际的session API来获取工具
-                        # 具体实现可能需要根据文档调整
-                        pass
-                logger.info(f"✓ 使用方式2成功，加载了 {len(all_tools)} 个工具")
-                return all_tools, client
-            except Exception as e2:
-                logger.error(f"❌ 方式2也失败: {e2}")
-                raise e2
-                
-    except Exception as e:
-        logger.error(f"❌ 连接MCP服务器失败: {e}")
-        logger.warning("🔄 将返回空工具列表")
-        return [], None
-
 def create_agent_with_tools(tools, model_name: str = "kimi-latest"):
     """
     使用工具创建智能体
@@ -143,16 +95,11 @@ def create_agent_with_tools(tools, model_name: str = "kimi-latest"):
         logger.info(f"🤖 正在创建智能体，使用模型: {model_name}")
         logger.info(f"🔧 可用工具数量: {len(tools)}")
         
-        # 创建模型
-        model = ChatOpenAI(
-            openai_api_base="https://api.moonshot.cn/v1",
-            openai_api_key=moonshot_key,
-            model_name=model_name,
-            temperature=0.7
-        )
+        # 创建模型（共享连接池和 moonshot 限流器，配置了备用模型时带故障切换和对冲）
+        model = get_routed_model(model_name, temperature=0.7)
         
-        # 创建代理
-        agent = create_react_agent(model, tools)
+        # 创建代理（发给模型前截断过长的工具输出，例如大量天气预警）
+        agent = create_react_agent(model, tools, pre_model_hook=make_pre_model_hook())
         logger.info("✅ 智能体创建成功")
         
         return agent
@@ -161,14 +108,139 @@ def create_agent_with_tools(tools, model_name: str = "kimi-latest"):
         logger.error(f"❌ 创建智能体失败: {e}")
         return None
 
-async def query_agent(agent, client, query: str):
+class MCPAgentRuntime:
     """
-    使用智能体处理查询 - 修复客户端管理
+    可复用的MCP智能体运行时
+    
+    持有 MultiServerMCPClient 以及每个服务器的长连接会话（stdio 子进程、SSE 流），
+    工具和智能体只创建一次，之后的查询都复用这些连接，直到显式调用 shutdown()。
+    
+    注意：会话由 anyio 管理，start() 和 shutdown() 需要在同一个任务中调用，
+    推荐直接使用 ``async with MCPAgentRuntime() as runtime:``。
+    """
+    
+    def __init__(self, model_name: str = "kimi-latest", config: dict = None, stdio_pool_size: int = 2,
+                 answer_cache: bool = False):
+        """
+        Args:
+            model_name: 模型名称，默认为 kimi-latest
+            config: MCP服务器配置，默认使用 get_mcp_config()
+            stdio_pool_size: 每个 stdio 服务器预先启动的进程数，工具调用从池中租用
+                已初始化的进程；为0时每个服务器只使用一个会话
+            answer_cache: 是否使用进程内共享的回答缓存，相似的问题直接返回之前的回答（默认关闭）
+        """
+        self.model_name = model_name
+        self.config = config
+        self.stdio_pool_size = stdio_pool_size
+        self.answer_cache = default_answer_cache if answer_cache else None
+        self.client = None
+        self.tools = []
+        self.agent = None
+        self._exit_stack = None
+    
+    @property
+    def ready(self) -> bool:
+        """智能体是否已就绪"""
+        return self.agent is not None
+    
+    async def start(self):
+        """
+        连接所有MCP服务器并创建智能体（重复调用不会重新连接）
+        
+        Returns:
+            运行时自身，便于链式调用
+        """
+        if self._exit_stack is not None:
+            return self
+        
+        if self.config is None:
+            self.config = get_mcp_config()
+        if not self.config:
+            logger.warning("📭 没有可用的MCP配置")
+        
+        self._exit_stack = AsyncExitStack()
+        self.client = MultiServerMCPClient(self.config)
+        
+        logger.info(f"🔌 开始连接MCP服务器，配置数量: {len(self.config)}")
+        for server_name in self.config.keys():
+            try:
+                server_config = self.config[server_name]
+                if server_config.get("transport") == "stdio" and self.stdio_pool_size > 0:
+                    # stdio 服务器（如 npx -y tavily-mcp）冷启动很慢，使用预热的进程池
+                    pool = await self._exit_stack.enter_async_context(
+                        StdioServerPool(server_name, server_config, size=self.stdio_pool_size)
+                    )
+                    session = pool.session()
+                else:
+                    # 会话在 shutdown() 之前一直保持打开，工具调用直接复用该会话
+                    session = await self._exit_stack.enter_async_context(
+                        self.client.session(server_name)
+                    )
+                server_tools = await load_mcp_tools(session)
+                self.tools.extend(apply_rate_limit(server_tools, get_rate_limiter(server_name)))
+                logger.info(f"✓ 服务器 {server_name} 已连接，加载了 {len(server_tools)} 个工具")
+            except Exception as e:
+                logger.error(f"❌ 连接MCP服务器 {server_name} 失败: {e}")
+        
+        self.agent = create_agent_with_tools(self.tools, self.model_name)
+        return self
+    
+    async def query(self, query: str) -> str:
+        """
+        使用已连接的智能体处理一条查询
+        
+        Args:
+            query: 用户查询
+            
+        Returns:
+            智能体的回答
+        """
+        if not self.ready:
+            return "❌ 智能体未创建"
+        return await query_agent(self.agent, query, self.answer_cache)
+    
+    async def stream(self, query: str):
+        """
+        流式处理一条查询，产出文本片段、工具调用进度和最终回答（见 streaming.stream_agent）
+        
+        Args:
+            query: 用户查询
+        """
+        if not self.ready:
+            yield {"type": "final", "answer": "❌ 智能体未创建", "ttft_ms": 0.0, "total_ms": 0.0, "tool_calls": 0}
+            return
+        async for event in stream_agent(self.agent, query):
+            yield event
+    
+    async def shutdown(self):
+        """关闭所有MCP会话（包括 stdio 子进程和 SSE 流）"""
+        if self._exit_stack is None:
+            return
+        try:
+            await self._exit_stack.aclose()
+            logger.info("🔌 MCP连接已关闭")
+        finally:
+            self._exit_stack = None
+            self.client = None
+            self.tools = []
+            self.agent = None
+    
+    async def __aenter__(self):
+        return await self.start()
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.shutdown()
+
+async def query_agent(agent, query: str, answer_cache: AnswerCache = None):
+    """
+    使用智能体处理查询
+    
+    MCP连接由 MCPAgentRuntime 统一管理，这里不再为每次查询重新进入客户端上下文。
     
     Args:
         agent: 智能体实例
-        client: MCP客户端实例
         query: 用户查询
+        answer_cache: 回答缓存；命中时直接返回，不调用LLM和工具
         
     Returns:
         智能体的回答
@@ -176,26 +248,26 @@ async def query_agent(agent, client, query: str):
     try:
         if not agent:
             return "❌ 智能体未创建"
+        
+        if answer_cache is not None:
+            cached = answer_cache.lookup(query)
+            if cached is not None:
+                logger.info(f"💾 命中回答缓存（相似度 {cached['similarity']:.2f}）: {cached['question']}")
+                return cached["answer"]
             
         logger.info(f"🔍 处理查询: {query}")
         
-        # 🔧 修复：如果client存在，使用上下文管理器
-        if client:
-            async with client:
-                result = await agent.ainvoke({
-                    "messages": [{"role": "user", "content": query}]
-                })
-        else:
-            # 如果没有client（比如只使用本地工具），直接调用
-            result = await agent.ainvoke({
-                "messages": [{"role": "user", "content": query}]
-            })
+        result = await agent.ainvoke({
+            "messages": [{"role": "user", "content": query}]
+        })
             
         # 提取回答
         if result and "messages" in result:
             last_message = result["messages"][-1]
             answer = last_message.content if hasattr(last_message, 'content') else str(last_message)
             logger.info("✅ 查询处理完成")
+            if answer_cache is not None:
+                answer_cache.store(query, answer, tools_used(result["messages"]))
             return answer
         else:
             return str(result)
@@ -205,138 +277,167 @@ async def query_agent(agent, client, query: str):
         return f"处理失败: {e}"
 
 # 便捷函数 - 整合版本
-async def create_mcp_agent(query: str, model_name: str = "kimi-latest"):
+async def create_mcp_agent(query: str, model_name: str = "kimi-latest", runtime: MCPAgentRuntime = None,
+                           answer_cache: bool = False):
     """
     创建MCP智能体并处理查询（整合版本）
     
     Args:
         query: 用户查询
         model_name: 模型名称，默认为 kimi-latest
+        runtime: 已启动的运行时；传入时直接复用其连接，否则临时创建一个
+        answer_cache: 临时创建运行时时是否使用回答缓存（传入 runtime 时由其自身的设置决定）
         
     Returns:
         智能体的回答
     """
-    # 获取工具
-    tools, client = await get_mcp_tools()  # 保持这个 await，因为函数本身是异步的
-    if not tools:
-        return "❌ 无法获取MCP工具"
+    if runtime is not None:
+        await runtime.start()
+        return await _answer(runtime, query)
     
-    # 创建智能体
-    agent = create_agent_with_tools(tools, model_name)
-    if not agent:
-        return "❌ 无法创建智能体"
+    # 命中回答缓存时连MCP服务器都不需要连接
+    if answer_cache:
+        cached = default_answer_cache.lookup(query)
+        if cached is not None:
+            logger.info(f"💾 命中回答缓存（相似度 {cached['similarity']:.2f}）: {cached['question']}")
+            return cached["answer"]
     
-    # 处理查询
-    return await query_agent(agent, client, query)
+    async with MCPAgentRuntime(model_name, answer_cache=answer_cache) as runtime:
+        return await _answer(runtime, query)
+
+async def _answer(runtime: MCPAgentRuntime, query: str) -> str:
+    """检查运行时状态后处理查询"""
+    if not runtime.tools:
+        return "❌ 无法获取MCP工具"
+    if not runtime.ready:
+        return "❌ 无法创建智能体"
+    return await runtime.query(query)
 
 # 批处理多个查询
-async def batch_queries(queries: list, model_name: str = "kimi-latest"):
+async def batch_queries(queries: list, model_name: str = "kimi-latest", max_concurrency: int = 5,
+                        runtime: MCPAgentRuntime = None, stream: bool = True):
     """
-    批量处理多个查询（优化版本 - 复用工具和智能体）
+    批量处理多个查询（优化版本 - 复用工具和智能体，并发执行）
+    
+    查询之间不再固定等待，而是并发执行；LLM 和各 MCP 服务器的调用频率
+    由 rate_limiter 中的令牌桶限流器控制。
     
     Args:
         queries: 查询列表
         model_name: 模型名称
+        max_concurrency: 同时处理的最大查询数
+        runtime: 已启动的运行时；传入时直接复用其连接，否则临时创建一个
+        stream: 是否流式输出工具调用进度，并记录每个查询的首个token耗时；
+            max_concurrency 为1时逐片段打印回答，否则每个回答完成后整体打印
         
     Returns:
-        结果列表
+        结果列表（与查询顺序一致）
     """
-    results = []
+    if runtime is None:
+        async with MCPAgentRuntime(model_name) as runtime:
+            return await batch_queries(queries, model_name, max_concurrency, runtime, stream)
     
-    # 一次性获取工具和创建智能体
-    tools, client = await get_mcp_tools()  # 保持这个 await
-    if not tools:
+    await runtime.start()
+    if not runtime.tools:
         return [{"query": query, "answer": "❌ 无法获取MCP工具"} for query in queries]
-    
-    agent = create_agent_with_tools(tools, model_name)
-    if not agent:
+    if not runtime.ready:
         return [{"query": query, "answer": "❌ 无法创建智能体"} for query in queries]
     
-    # 🔧 如果有MCP客户端，在整个批处理过程中保持连接
-    if client:
-        async with client:
-            for i, query in enumerate(queries, 1):
-                print(f"\n🤖 处理查询 {i}/{len(queries)}: {query}")
-                print("=" * 60)
-                
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_query(i: int, query: str) -> dict:
+        async with semaphore:
+            print(f"\n🤖 处理查询 {i}/{len(queries)}: {query}")
+            if stream:
+                cached = runtime.answer_cache.lookup(query) if runtime.answer_cache is not None else None
+                if cached is not None:
+                    print(f"[{i}] 💾 命中回答缓存（相似度 {cached['similarity']:.2f}，原问题: {cached['question']}）")
+                    print(f"[{i}] 回答: {cached['answer']}")
+                    print("\n" + "="*60)
+                    return {"query": query, "answer": cached["answer"], "ttft_ms": None, "total_ms": None,
+                            "cached": True}
                 try:
-                    # 直接调用agent，不再使用query_agent（避免重复的上下文管理）
-                    result = await agent.ainvoke({
-                        "messages": [{"role": "user", "content": query}]
-                    })
-                    
-                    # 提取回答
-                    if result and "messages" in result:
-                        last_message = result["messages"][-1]
-                        answer = last_message.content if hasattr(last_message, 'content') else str(last_message)
-                    else:
-                        answer = str(result)
-                        
+                    final = await print_stream(runtime.agent, query, prefix=f"[{i}] ",
+                                               show_tokens=max_concurrency == 1)
+                    if (runtime.answer_cache is not None and final["answer"] is not None
+                            and not final.get("stopped_by")):  # 部分回答不缓存
+                        runtime.answer_cache.store(query, final["answer"], final["tools"])
                 except Exception as e:
-                    answer = f"处理失败: {e}"
                     logger.error(f"❌ 查询处理失败: {e}")
-                
-                print(f"📝 回答: {answer}")
+                    final = {"answer": f"处理失败: {e}", "ttft_ms": None, "total_ms": None}
                 print("\n" + "="*60)
-                
-                results.append({"query": query, "answer": answer})
-                
-                # 避免频繁调用，稍作延迟
-                if i < len(queries):
-                    await asyncio.sleep(2)
-    else:
-        # 没有MCP客户端的情况
-        for i, query in enumerate(queries, 1):
-            print(f"\n🤖 处理查询 {i}/{len(queries)}: {query}")
-            print("=" * 60)
-            
-            answer = await query_agent(agent, None, query)
-            print(f"📝 回答: {answer}")
+                return {"query": query, "answer": final["answer"],
+                        "ttft_ms": final["ttft_ms"], "total_ms": final["total_ms"]}
+            answer = await runtime.query(query)
+            print(f"\n📝 回答 {i}/{len(queries)}: {answer}")
             print("\n" + "="*60)
-            
-            results.append({"query": query, "answer": answer})
-            
-            if i < len(queries):
-                await asyncio.sleep(2)
+            return {"query": query, "answer": answer}
     
-    return results
+    results = await asyncio.gather(*(run_query(i, q) for i, q in enumerate(queries, 1)))
+    ttfts = [r["ttft_ms"] for r in results if r.get("ttft_ms") is not None]
+    if ttfts:
+        print(f"⏱️ 首个token耗时: 平均 {sum(ttfts) / len(ttfts):.0f}ms，最长 {max(ttfts):.0f}ms")
+    return list(results)
 
 # 交互式聊天
-async def interactive_chat(model_name: str = "kimi-latest"):
+async def interactive_chat(model_name: str = "kimi-latest", runtime: MCPAgentRuntime = None,
+                           history: bool = True):
     """
     交互式聊天模式（优化版本 - 复用工具和智能体）
     
     Args:
         model_name: 模型名称
+        runtime: 已启动的运行时；传入时直接复用其连接，否则临时创建一个
+        history: 是否保留多轮对话历史（最近几轮原样保留，更早的对话合并为摘要）
     """
+    if runtime is None:
+        async with MCPAgentRuntime(model_name) as runtime:
+            return await interactive_chat(model_name, runtime, history)
+    
     print("🤖 MCP智能体已启动！输入 'quit' 或 'exit' 退出")
     print("=" * 50)
     
-    # 一次性获取工具和创建智能体
-    tools, client = await get_mcp_tools()  # 保持这个 await
-    if not tools:
+    await runtime.start()
+    if not runtime.tools:
         print("❌ 无法获取MCP工具，退出...")
         return
-    
-    agent = create_agent_with_tools(tools, model_name)
-    if not agent:
+    if not runtime.ready:
         print("❌ 无法创建智能体，退出...")
         return
     
-    print("✅ 智能体准备就绪！")
+    print("✅ 智能体准备就绪！回答输出期间可以继续输入下一个问题，会按顺序处理")
     
-    # 🔧 如果有MCP客户端，在整个聊天过程中保持连接
-    if client:
-        async with client:
-            await _chat_loop(agent, None)  # 传入None因为已经在上下文中
-    else:
-        await _chat_loop(agent, None)
+    session = None
+    if history:
+        session = ChatSession(get_chat_model(runtime.model_name, temperature=0.3))
+        print("🧠 已开启多轮对话，输入 'reset' 清空历史")
+    
+    # 整个聊天过程中 runtime 保持MCP连接
+    await _chat_loop(runtime, session=session)
 
-async def _chat_loop(agent, client):
-    """聊天循环逻辑"""
+async def _chat_loop(runtime: MCPAgentRuntime, reader: StdinReader = None, session: ChatSession = None):
+    """
+    聊天循环逻辑
+    
+    输入由后台线程读取，等待输入时事件循环不会被阻塞（MCP会话和后台任务照常运行）；
+    回答输出期间输入的问题会排队，当前回答结束后依次处理。
+    
+    Args:
+        runtime: 已启动的运行时
+        reader: 输入读取器，默认读取标准输入
+        session: 多轮对话历史；为None时每个问题独立处理
+    """
+    reader = reader if reader is not None else StdinReader()
     while True:
         try:
-            query = input("\n💬 请输入您的问题: ").strip()
+            queued = reader.pending() > 0
+            if not queued:
+                print("\n💬 请输入您的问题: ", end="", flush=True)
+            line = await reader.readline()
+            if line is None:
+                print("\n👋 再见！")
+                break
+            query = line.strip()
             
             if query.lower() in ['quit', 'exit', '退出']:
                 print("👋 再见！")
@@ -344,22 +445,23 @@ async def _chat_loop(agent, client):
                 
             if not query:
                 continue
+            if session is not None and query.lower() in ['reset', '清空']:
+                session.reset()
+                print("🧹 对话历史已清空")
+                continue
+            if queued:
+                print(f"\n📥 处理排队的问题: {query}")
                 
             print("\n🔍 正在处理...")
             
-            # 直接调用agent（因为已经在MCP客户端的上下文中）
-            result = await agent.ainvoke({
-                "messages": [{"role": "user", "content": query}]
-            })
-            
-            # 提取回答
-            if result and "messages" in result:
-                last_message = result["messages"][-1]
-                answer = last_message.content if hasattr(last_message, 'content') else str(last_message)
+            # 边生成边打印回答和工具调用进度
+            if session is None:
+                await print_stream(runtime.agent, query)
             else:
-                answer = str(result)
-                
-            print(f"\n📝 回答: {answer}")
+                messages = await session.messages_for(query)
+                final = await print_stream(runtime.agent, messages)
+                stat = session.add_turn(query, final["answer"], messages, final["total_ms"])
+                print(f"📏 第 {stat['turn']} 轮上下文: {stat['prompt_messages']} 条消息 / {stat['prompt_chars']} 字符")
             print("\n" + "="*50)
             
         except KeyboardInterrupt:
@@ -1,20 +1,38 @@
-from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
 import os
+import sys
 from dotenv import load_dotenv
 import asyncio
-from langchain_core.messages import AIMessage
-from langgraph_tools import add, multiply, subtract, divide, square_root, power, concatenate, to_uppercase, to_lowercase
-from langchain_mcp_adapters.tools import load_mcp_tools
-from mcp.client.sse import sse_client
-from mcp import ClientSession
-from mcp_third_party import get_zhipu_web_search_tools
+
+# langgraph、langchain_openai、MCP客户端和智谱搜索集成都在用到时才导入，
+# 未设置 ZHIPU_API_KEY 时也可以正常导入本模块
 
 # 加载环境变量
 load_dotenv()
 
+# 测试问题 - 包括数学计算、天气查询和Web搜索
+TEST_QUESTIONS = [
+    # 数学工具测试
+    "计算 23 + 45 的结果",
+    "将 'hello world' 转换为大写",
+    "计算 16 的平方根",
+    # 天气工具测试
+    "are there any severe weather alerts in California?",
+    "what's the weather forecast for New York City?",
+    # 智谱Web搜索工具测试
+    "中国最近的航天成就有哪些？",
+    "2024年世界经济论坛的主要议题是什么？",
+    "最新的人工智能研究进展有哪些？",
+    # 组合测试
+    "计算 7 * 8 然后减去 10，并查询一下上海的天气预报",
+]
+
+# 每个问题只给模型绑定最相关的工具数（None 表示绑定全部工具，见 tool_retrieval.py）
+TOOL_TOP_K = 4
+
 # 获取自定义工具
 def get_custom_tools():
+    from langgraph_tools import add, multiply, subtract, divide, square_root, power, concatenate, to_uppercase, to_lowercase, evaluate_expression, elementwise, batch_square_root, aggregate
+
     return [
         add,
         multiply,
@@ -24,19 +42,27 @@ def get_custom_tools():
         power,
         concatenate,
         to_uppercase,
-        to_lowercase
+        to_lowercase,
+        evaluate_expression,
+        elementwise,
+        batch_square_root,
+        aggregate
     ]
 
 async def test_agent_with_all_tools():
     print("====== 开始测试 Agent 与综合工具 ======")
+
+    from agent_langgraph import create_graph
+    from model_factory import get_routed_model
+    from tool_retrieval import ToolIndex, tool_schema_chars
+    from langchain_core.messages import AIMessage
+    from langchain_mcp_adapters.tools import load_mcp_tools
+    from mcp_transport import client_connection, open_streams
+    from mcp import ClientSession
+    from tool_cache import apply_tool_cache, default_tool_cache
     
     # 创建模型
-    model = ChatOpenAI(
-        openai_api_base="https://api.moonshot.cn/v1",
-        openai_api_key=os.getenv("MOONSHOT_API_KEY"),
-        model_name="moonshot-v1-32k",
-        temperature=0.7
-    )
+    model = get_routed_model("moonshot-v1-32k", temperature=0.7)
     
     # 获取自定义工具
     custom_tools = get_custom_tools()
@@ -44,14 +70,16 @@ async def test_agent_with_all_tools():
     try:
         # 1. 连接到本地天气MCP服务器获取天气工具
         print("\n=== 连接本地天气服务器 ===")
-        url = "http://localhost:8000"
-        sse_url = f"{url}/sse"
-        print(f"连接到本地MCP服务器: {sse_url}")
+        # 默认使用 streamable HTTP，WEATHER_MCP_TRANSPORT=sse 可以切换（见 mcp_transport.py）
+        weather_config = client_connection(os.getenv("WEATHER_MCP_TRANSPORT"), "http://localhost:8000",
+                                           [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather.py"),
+                                            "--transport", "stdio"])
+        print(f"连接到本地MCP服务器: {weather_config.get('url') or 'weather.py'}（{weather_config['transport']}）")
         
         weather_tools = []
         try:
             # 连接到MCP服务器
-            async with sse_client(sse_url) as (read, write):
+            async with open_streams(weather_config) as (read, write):
                 async with ClientSession(read, write) as session:
                     # 初始化连接
                     print("初始化本地MCP连接...")
@@ -70,6 +98,7 @@ async def test_agent_with_all_tools():
         zhipu_tools = []
         try:
             print("获取智谱Web搜索工具...")
+            from mcp_third_party import get_zhipu_web_search_tools
             zhipu_tools = await get_zhipu_web_search_tools()
             print(f"获取了 {len(zhipu_tools)} 个智谱Web搜索工具")
         except Exception as e:
@@ -77,33 +106,21 @@ async def test_agent_with_all_tools():
             print("继续使用其他可用工具...")
         
         # 3. 合并所有工具
-        all_tools = custom_tools + weather_tools + zhipu_tools
+        all_tools = apply_tool_cache(custom_tools + weather_tools + zhipu_tools)
         print(f"\n总共整合了 {len(all_tools)} 个工具")
         
-        # 创建agent
+        # 创建agent（每个问题只绑定检索出的最相关的 TOOL_TOP_K 个工具）
         print("创建包含所有工具的Agent...")
-        agent = create_react_agent(model, all_tools)
-        
-        # 测试问题 - 包括数学计算、天气查询和Web搜索
-        test_questions = [
-            # 数学工具测试
-            "计算 23 + 45 的结果",
-            "将 'hello world' 转换为大写",
-            "计算 16 的平方根",
-            # 天气工具测试
-            "are there any severe weather alerts in California?",
-            "what's the weather forecast for New York City?",
-            # 智谱Web搜索工具测试
-            "中国最近的航天成就有哪些？",
-            "2024年世界经济论坛的主要议题是什么？",
-            "最新的人工智能研究进展有哪些？",
-            # 组合测试
-            "计算 7 * 8 然后减去 10，并查询一下上海的天气预报",
-        ]
+        agent = create_graph(model, all_tools, tool_top_k=TOOL_TOP_K)
+        tool_index = ToolIndex(all_tools)
+        full_chars = tool_schema_chars(all_tools)
         
         # 逐个测试问题
-        for i, question in enumerate(test_questions):
+        for i, question in enumerate(TEST_QUESTIONS):
             print(f"\n测试 {i+1}: '{question}'")
+            selected = tool_index.select(question, TOOL_TOP_K)
+            print(f"🔎 绑定工具: {[tool.name for tool in selected]}"
+                  f"（工具定义 {tool_schema_chars(selected)}/{full_chars} 字符）")
             
             try:
                 agent_response = await agent.ainvoke(
@@ -123,6 +140,7 @@ async def test_agent_with_all_tools():
                 import traceback
                 traceback.print_exc()
     
+        print(f"\n工具缓存: {default_tool_cache.stats()}")
         print("\n====== 测试完成 ======")
         
     except Exception as e:
@@ -0,0 +1,329 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 美国州代码 -> 州名（只展开原文中大写的两字母代码，避免把 in/or/me 当成州代码）
+US_STATES: Dict[str, str] = {
+    "AL": "alabama", "AK": "alaska", "AZ": "arizona", "AR": "arkansas", "CA": "california",
+    "CO": "colorado", "CT": "connecticut", "DE": "delaware", "FL": "florida", "GA": "georgia",
+    "HI": "hawaii", "ID": "idaho", "IL": "illinois", "IN": "indiana", "IA": "iowa",
+    "KS": "kansas", "KY": "kentucky", "LA": "louisiana", "ME": "maine", "MD": "maryland",
+    "MA": "massachusetts", "MI": "michigan", "MN": "minnesota", "MS": "mississippi", "MO": "missouri",
+    "MT": "montana", "NE": "nebraska", "NV": "nevada", "NH": "new hampshire", "NJ": "new jersey",
+    "NM": "new mexico", "NY": "new york", "NC": "north carolina", "ND": "north dakota", "OH": "ohio",
+    "OK": "oklahoma", "OR": "oregon", "PA": "pennsylvania", "RI": "rhode island", "SC": "south carolina",
+    "SD": "south dakota", "TN": "tennessee", "TX": "texas", "UT": "utah", "VT": "vermont",
+    "VA": "virginia", "WA": "washington", "WV": "west virginia", "WI": "wisconsin", "WY": "wyoming",
+}
+
+# 同义短语归一（按顺序替换，长短语在前）
+PHRASE_SYNONYMS: List[Tuple[str, str]] = [
+    ("severe weather alerts", "alerts"),
+    ("severe weather warnings", "alerts"),
+    ("weather alerts", "alerts"),
+    ("weather warnings", "alerts"),
+    ("warnings", "alerts"),
+    ("weather forecast", "forecast"),
+    ("nyc", "new york city"),
+    ("天气预警", "alerts"),
+    ("预警", "alerts"),
+    ("天气预报", "forecast"),
+    ("加州", "california"),
+    ("纽约", "new york"),
+]
+
+# 专有名词的缩写，比较问题签名前先展开
+ENTITY_ALIASES: Dict[str, str] = {
+    "nyc": "New York City",
+}
+
+# 不影响问题含义的词
+STOPWORDS = {
+    "what", "whats", "is", "are", "there", "any", "the", "a", "an", "in", "for", "of", "on",
+    "please", "tell", "me", "show", "give", "current", "currently", "right", "now", "today",
+    "do", "does", "can", "you", "i", "to", "about", "like",
+    "请", "帮我", "一下", "吗", "呢", "的", "有哪些", "有没有", "是什么", "是多少",
+}
+
+# 没有调用工具（模型直接回答）时的缓存秒数
+NO_TOOL_TTL = 3600
+# 只用到结果不会变化的工具（数学/字符串）时的缓存秒数
+MAX_ANSWER_TTL = 86400
+
+# 运算符号 -> 运算词（归一化后保留，"3 + 5" 和 "3 * 5" 不能算作同一个问题）
+OPERATOR_SYMBOLS: List[Tuple[str, str]] = [
+    ("**", " pow "), ("^", " pow "), ("+", " plus "), ("*", " times "), ("×", " times "),
+    ("÷", " over "), ("/", " over "), ("%", " mod "),
+]
+
+# 运算词 -> 运算（问题签名中按出现顺序保留）
+OPERATOR_WORDS: Dict[str, str] = {
+    "plus": "+", "add": "+", "sum": "+", "加": "+",
+    "minus": "-", "subtract": "-", "difference": "-", "减": "-",
+    "times": "*", "multiply": "*", "multiplied": "*", "product": "*", "乘": "*",
+    "over": "/", "divide": "/", "divided": "/", "quotient": "/", "除": "/",
+    "pow": "^", "power": "^", "次方": "^", "乘方": "^",
+    "sqrt": "sqrt", "square root": "sqrt", "平方根": "sqrt",
+    "mod": "%",
+}
+
+_WORD = re.compile(r"[a-z0-9.]+|[一-鿿]+")
+# 数字之间（或数字与括号之间）的减号；日期中的 - 也会被当作减号，只会让缓存更严格
+_MINUS = re.compile(r"(?<=[\d)\s])-(?=[\s\d(])")
+_OPERATOR = re.compile("|".join(
+    rf"\b{re.escape(word)}\b" if word.isascii() else re.escape(word)
+    for word in sorted(OPERATOR_WORDS, key=len, reverse=True)
+))
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_QUOTED = re.compile(r"""'([^']*)'|"([^"]*)"|“([^”]*)”|‘([^’]*)’|「([^」]*)」""")
+
+def normalize_question(question: str) -> str:
+    """
+    问题归一化：展开州代码、同义短语归一、转小写、去掉标点和停用词，运算符号转换为运算词
+
+    例如 "alerts in CA?" 和 "Are there any severe weather alerts in California?"
+    都归一化为 "alerts california"，"3 + 5" 归一化为 "3 plus 5"。
+    """
+    text = re.sub(r"\b([A-Z]{2})\b", lambda m: US_STATES.get(m.group(1), m.group(1)), question)
+    text = text.lower().replace("what's", "what is").replace("'", "")
+    text = _MINUS.sub(" minus ", text)
+    for symbol, word in OPERATOR_SYMBOLS:
+        text = text.replace(symbol, word)
+    for phrase, replacement in PHRASE_SYNONYMS:
+        text = text.replace(phrase, f" {replacement} ")
+    tokens = []
+    for token in _WORD.findall(text):
+        if token in STOPWORDS:
+            continue
+        if re.fullmatch(r"[一-鿿]+", token):
+            for word in STOPWORDS:
+                if not word.isascii():
+                    token = token.replace(word, "")
+            if not token:
+                continue
+        tokens.append(token.strip("."))
+    return " ".join(t for t in tokens if t)
+
+def question_signature(question: str) -> Tuple:
+    """
+    问题中必须完全一致的部分：数字（按出现顺序）、运算、引号中的字符串、地名等专有名词
+
+    相似度再高，只要这些不同（例如 16 和 25 的平方根、3 + 5 和 3 * 5、10 除以 2 和 2 除以 10、
+    Miami 和 Boston 的天气）就不算命中。
+    """
+    for alias, name in ENTITY_ALIASES.items():
+        question = re.sub(rf"\b{alias}\b", name, question, flags=re.I)
+    numbers = tuple(float(n) for n in _NUMBER.findall(_MINUS.sub(" - ", question)))
+    operators = tuple(OPERATOR_WORDS[word] for word in _OPERATOR.findall(normalize_question(question)))
+    quoted = frozenset(next(g for g in m.groups() if g is not None) for m in _QUOTED.finditer(question))
+    unquoted = _QUOTED.sub(" ", question)
+    states = frozenset(
+        name for code, name in US_STATES.items()
+        if re.search(rf"\b{code}\b", unquoted) or name in unquoted.lower()
+    )
+    # 除句首外的大写英文单词视为专有名词（州名已经在上面处理）
+    words = re.findall(r"[A-Za-z]+", unquoted)
+    proper = frozenset(
+        w.lower() for i, w in enumerate(words)
+        if i > 0 and w[0].isupper() and w.upper() not in US_STATES
+        and not any(w.lower() in name.split() for name in states)
+        and w.lower() not in STOPWORDS
+    )
+    return numbers, operators, quoted, states, proper
+
+def lexical_vector(text: str) -> Dict[str, float]:
+    """词袋加字符 2/3-gram 的稀疏向量，中英文都适用"""
+    features: Counter = Counter()
+    for token in text.split():
+        features[f"w:{token}"] += 1
+        padded = f" {token} "
+        for n in (2, 3):
+            for i in range(len(padded) - n + 1):
+                features[padded[i:i + n]] += 1
+    return dict(features)
+
+def cosine(a: Any, b: Any) -> float:
+    """两个向量的余弦相似度（词法向量为特征字典，向量模型的输出为数值序列）"""
+    if isinstance(a, dict):
+        dot = sum(value * b.get(key, 0.0) for key, value in a.items())
+        norm_a = math.sqrt(sum(v * v for v in a.values()))
+        norm_b = math.sqrt(sum(v * v for v in b.values()))
+    else:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(y * y for y in b))
+    return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+def load_embedder(model_name: Optional[str] = None) -> Optional[Callable[[str], Sequence[float]]]:
+    """
+    加载本地向量模型（sentence-transformers，可选依赖）
+
+    参数:
+        model_name: 模型名称，默认读取环境变量 ANSWER_CACHE_EMBEDDING_MODEL，
+            例如 "BAAI/bge-small-zh-v1.5"；未设置或未安装时返回None，使用词法相似度
+    """
+    model_name = model_name or os.getenv("ANSWER_CACHE_EMBEDDING_MODEL")
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("⚠️ 未安装 sentence-transformers，回答缓存使用词法相似度")
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda text: model.encode(text, normalize_embeddings=True).tolist()
+
+def tools_used(messages: Sequence[Any]) -> List[str]:
+    """从智能体返回的消息中提取调用过的工具名"""
+    return [m.name for m in messages if getattr(m, "type", None) == "tool" and getattr(m, "name", None)]
+
+def answer_ttl(tool_names: Sequence[str], policies: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[float]:
+    """
+    根据回答用到的工具确定缓存时间：取这些工具结果缓存时间的最小值
+
+    天气预警只缓存几分钟，纯数学计算可以缓存一天；用到未配置缓存策略的工具时不缓存。
+
+    参数:
+        tool_names: 回答过程中调用的工具
+        policies: 工具缓存策略，默认为 tool_cache.DEFAULT_TOOL_CACHE_POLICIES
+
+    返回:
+        缓存秒数；为0时表示不应缓存
+    """
+    from tool_cache import DEFAULT_TOOL_CACHE_POLICIES, DEFAULT_TTL
+
+    policies = policies if policies is not None else DEFAULT_TOOL_CACHE_POLICIES
+    if not tool_names:
+        return NO_TOOL_TTL
+    ttls = []
+    for name in set(tool_names):
+        ttl = policies.get(name, {"ttl": 0}).get("ttl", DEFAULT_TTL)
+        ttls.append(MAX_ANSWER_TTL if ttl is None else ttl)
+    return min(ttls)
+
+class AnswerCache:
+    """
+    智能体回答的语义缓存
+
+    先按归一化后的问题精确查找，再按相似度查找（有本地向量模型时用向量，否则用词法向量）。
+    相似度超过阈值、且数字/引号内容/地名完全一致时才算命中；使用词法向量时还要求
+    去掉停用词后的词集合相同（词法向量分不清 high/low、rain/snow 这类只差一个词的问题）。
+    命中时直接返回之前的回答，不调用LLM和任何工具。每条回答的缓存时间由回答时用到的工具决定（见 answer_ttl）。
+    """
+
+    def __init__(self, threshold: float = 0.85, max_size: int = 1000,
+                 embedder: Optional[Callable[[str], Sequence[float]]] = None):
+        """
+        参数:
+            threshold: 相似度阈值（0~1）
+            max_size: 最多缓存的回答数，超过时淘汰最久未使用的
+            embedder: 文本向量函数，默认尝试 load_embedder()，没有时使用词法向量
+        """
+        self.threshold = threshold
+        self.max_size = max_size
+        self.embedder = embedder if embedder is not None else load_embedder()
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _vector(self, normalized: str) -> Any:
+        if self.embedder is not None:
+            return self.embedder(normalized)
+        return lexical_vector(normalized)
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        查找相似问题的回答
+
+        返回:
+            命中时返回 {"answer", "question", "similarity", "expires_in"}，否则返回None
+        """
+        normalized = normalize_question(question)
+        signature = question_signature(question)
+        words = frozenset(normalized.split())
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e["expires_at"] is not None and e["expires_at"] <= now]:
+                del self._entries[key]
+
+            best, best_score = None, 0.0
+            entry = self._entries.get(normalized)
+            if entry is not None and entry["signature"] == signature:
+                best, best_score = entry, 1.0
+            else:
+                vector = self._vector(normalized)
+                for candidate in self._entries.values():
+                    if candidate["signature"] != signature:
+                        continue
+                    if self.embedder is None and candidate["words"] != words:
+                        continue
+                    score = cosine(vector, candidate["vector"])
+                    if score > best_score:
+                        best, best_score = candidate, score
+
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best["normalized"])
+            self.hits += 1
+            return {
+                "answer": best["answer"],
+                "question": best["question"],
+                "similarity": best_score,
+                "expires_in": None if best["expires_at"] is None else best["expires_at"] - now,
+            }
+
+    def store(self, question: str, answer: str, tool_names: Sequence[str] = ()) -> Optional[float]:
+        """
+        缓存一条回答
+
+        参数:
+            question: 原始问题
+            answer: 智能体的回答
+            tool_names: 回答过程中调用的工具，用于确定缓存时间
+
+        返回:
+            缓存秒数；不缓存时返回0
+        """
+        ttl = answer_ttl(tool_names)
+        if not answer or ttl == 0:
+            return 0
+        normalized = normalize_question(question)
+        with self._lock:
+            self._entries[normalized] = {
+                "question": question,
+                "normalized": normalized,
+                "signature": question_signature(question),
+                "words": frozenset(normalized.split()),
+                "vector": self._vector(normalized),
+                "answer": answer,
+                "expires_at": None if ttl is None else time.monotonic() + ttl,
+            }
+            self._entries.move_to_end(normalized)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return ttl
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+# 进程内共享的默认回答缓存
+default_answer_cache = AnswerCache()
@@ -0,0 +1,68 @@
+import sys
+import asyncio
+import threading
+from typing import Optional, TextIO
+
+class StdinReader:
+    """
+    非阻塞的标准输入读取器
+
+    在后台线程中逐行读取标准输入，通过 call_soon_threadsafe 放入 asyncio 队列，
+    事件循环不会被 input() 阻塞，MCP 会话的心跳、后台任务和流式输出都可以继续运行。
+    用户在上一个回答还在输出时输入的内容会排队，之后按顺序读出。
+
+    用法:
+        async with StdinReader() as reader:
+            line = await reader.readline()  # 输入结束（EOF）时返回None
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """
+        参数:
+            stream: 要读取的文本流，默认为 sys.stdin
+        """
+        self.stream = stream if stream is not None else sys.stdin
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StdinReader":
+        """启动读取线程（需要在事件循环中调用）"""
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            # 守护线程：阻塞在 readline 上的线程无法中断，程序退出时直接丢弃
+            self._thread = threading.Thread(target=self._run, name="stdin-reader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _put(self, line: Optional[str]) -> bool:
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, line)
+            return True
+        except RuntimeError:
+            return False  # 事件循环已经关闭
+
+    def _run(self) -> None:
+        try:
+            for line in iter(self.stream.readline, ""):
+                if not self._put(line.rstrip("\r\n")):
+                    return
+        except (OSError, ValueError):
+            pass  # 标准输入被关闭
+        self._put(None)
+
+    async def readline(self) -> Optional[str]:
+        """读取下一行（不含换行符），输入结束时返回None"""
+        self.start()
+        return await self._queue.get()
+
+    def pending(self) -> int:
+        """已经输入、还没有被读取的行数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def __aenter__(self) -> "StdinReader":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
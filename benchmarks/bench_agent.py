@@ -0,0 +1,167 @@
+"""
+智能体端到端离线基准测试
+
+用 fake_llm.ScriptedChatModel 代替真实的LLM（按脚本发出固定的工具调用和回答），
+用 benchmarks/mock_mcp_server.py 代替天气和智谱Web搜索服务器，重放
+agent_langgraph.default_task_config 和 agent_with_diverse_tools.TEST_QUESTIONS 中的问题，
+不访问任何网络。输出:
+    - 启动各阶段耗时（连接MCP服务器、加载本地工具、创建模型、构建状态图）
+    - 每个问题的总耗时，以及其中模型、工具和框架开销各占多少
+    - 不同并发度下的吞吐量
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_agent
+    python -m benchmarks.bench_agent --latency-ms 300 --token-ms 5 --tool-delay-ms 50
+    python -m benchmarks.bench_agent --suite diverse --concurrency 1 4 16 --fast-path
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List
+
+MOCK_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_mcp_server.py")
+
+def load_suites() -> Dict[str, List[str]]:
+    """基准测试使用的问题集"""
+    from agent_langgraph import default_task_config
+    from agent_with_diverse_tools import TEST_QUESTIONS
+
+    return {
+        "default": list(default_task_config.questions),
+        "diverse": list(TEST_QUESTIONS),
+    }
+
+def mock_servers_config(tool_delay_ms: float) -> Dict[str, Dict[str, Any]]:
+    """指向本地模拟服务器的 stdio 配置"""
+    env = dict(os.environ, MOCK_TOOL_DELAY_MS=str(tool_delay_ms))
+    return {
+        name: {"command": sys.executable, "args": [MOCK_SERVER, name], "env": env, "transport": "stdio"}
+        for name in ("weather", "zhipu-web-search")
+    }
+
+async def build_agent(args: argparse.Namespace, exit_stack: AsyncExitStack) -> Dict[str, Any]:
+    """按 agent_langgraph 的流程构建智能体，记录每个阶段的耗时"""
+    from agent_langgraph import AgentConfig, parse_tools_config, load_mcp_tools, load_local_tools, create_graph
+    from fake_llm import ScriptedChatModel
+
+    stages = {}
+
+    started = time.perf_counter()
+    mcp_tools = await load_mcp_tools(mock_servers_config(args.tool_delay_ms), exit_stack)
+    stages["mcp_connect"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _, local_tools_names = parse_tools_config(AgentConfig().tools)
+    tools = mcp_tools + load_local_tools(local_tools_names)
+    stages["local_tools"] = time.perf_counter() - started
+
+    if args.cache_tools:
+        from tool_cache import apply_tool_cache
+
+        started = time.perf_counter()
+        tools = apply_tool_cache(tools)
+        stages["tool_cache"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model = ScriptedChatModel(latency_ms=args.latency_ms, token_ms=args.token_ms)
+    stages["model"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    graph = create_graph(model, tools, fast_path=args.fast_path, verbose=False)
+    tool_node = graph.builder.nodes["tools"].runnable  # 用于汇总工具耗时
+    stages["graph_build"] = time.perf_counter() - started
+
+    return {"graph": graph, "model": model, "tool_node": tool_node, "stages": stages, "tools": len(tools)}
+
+async def run_sequential(agent: Dict[str, Any], questions: List[str]) -> List[Dict[str, Any]]:
+    """逐个执行问题，把每个问题的耗时拆分为模型、工具和框架开销"""
+    graph, model, tool_node = agent["graph"], agent["model"], agent["tool_node"]
+    results = []
+    for question in questions:
+        model_calls, tool_wall_ms = len(model.calls), tool_node.timing_summary()["wall_ms"]
+        started = time.perf_counter()
+        response = await graph.ainvoke({"messages": [{"role": "user", "content": question}]})
+        total_ms = (time.perf_counter() - started) * 1000
+        model_ms = sum(c["ms"] for c in model.calls[model_calls:])
+        tool_ms = tool_node.timing_summary()["wall_ms"] - tool_wall_ms
+        results.append({
+            "question": question,
+            "total_ms": total_ms,
+            "model_ms": model_ms,
+            "tool_ms": tool_ms,
+            "overhead_ms": max(total_ms - model_ms - tool_ms, 0.0),
+            "model_calls": len(model.calls) - model_calls,
+            "messages": len(response["messages"]),
+        })
+    return results
+
+async def run_concurrent(agent: Dict[str, Any], questions: List[str], concurrency: int, rounds: int) -> Dict[str, Any]:
+    """以指定并发度执行 rounds 轮问题集，返回吞吐量和延迟分布"""
+    graph = agent["graph"]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(question: str):
+        async with semaphore:
+            started = time.perf_counter()
+            await graph.ainvoke({"messages": [{"role": "user", "content": question}]})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q) for _ in range(rounds) for q in questions))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000,
+    }
+
+async def main(args: argparse.Namespace):
+    suites = load_suites()
+    questions = [q for name in args.suite for q in suites[name]]
+
+    async with AsyncExitStack() as exit_stack:
+        agent = await build_agent(args, exit_stack)
+        print(f"\n模型延迟: {args.latency_ms} ms + 每片段 {args.token_ms} ms，工具延迟: {args.tool_delay_ms} ms，"
+              f"工具数: {agent['tools']}，快速路径: {'开' if args.fast_path else '关'}")
+
+        print("\n=== 启动阶段 ===")
+        for stage, seconds in agent["stages"].items():
+            print(f"{stage:<14} {seconds * 1000:>9.1f} ms")
+
+        await run_sequential(agent, questions[:1])  # 预热
+        results = await run_sequential(agent, questions)
+        print(f"\n=== 逐个执行 ({len(questions)} 个问题) ===")
+        print(f"{'总耗时':>8} {'模型':>8} {'工具':>8} {'开销':>8} {'模型调用':>6}  问题")
+        for r in results:
+            print(f"{r['total_ms']:>9.1f} {r['model_ms']:>9.1f} {r['tool_ms']:>9.1f} {r['overhead_ms']:>9.1f} "
+                  f"{r['model_calls']:>8}  {r['question'][:40]}")
+        total = sum(r["total_ms"] for r in results)
+        overhead = sum(r["overhead_ms"] for r in results)
+        print(f"合计 {total:.1f} ms，其中框架开销 {overhead:.1f} ms ({overhead / total:.1%})")
+
+        print(f"\n=== 吞吐量 (每个并发度 {args.rounds} 轮) ===")
+        print(f"{'并发度':>6} {'吞吐量(问题/秒)':>16} {'p50(ms)':>9} {'p95(ms)':>9}")
+        for level in args.concurrency:
+            r = await run_concurrent(agent, questions, level, args.rounds)
+            print(f"{r['concurrency']:>6} {r['throughput']:>16.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="智能体端到端离线基准测试")
+    parser.add_argument("--suite", nargs="+", choices=["default", "diverse"], default=["default", "diverse"],
+                        help="要重放的问题集")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟模型每次调用的首个片段延迟（毫秒）")
+    parser.add_argument("--token-ms", type=float, default=0, help="模拟模型每个输出片段的延迟（毫秒）")
+    parser.add_argument("--tool-delay-ms", type=float, default=0, help="模拟MCP工具的处理延迟（毫秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="要测试的并发度")
+    parser.add_argument("--rounds", type=int, default=5, help="每个并发度下重放问题集的轮数")
+    parser.add_argument("--fast-path", action="store_true", help="启用简单问题的快速路径")
+    parser.add_argument("--cache-tools", action="store_true", help="启用工具结果缓存（重放时会大量命中）")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,101 @@
+"""
+智能体入口模块的导入耗时基准测试
+
+在全新的解释器中用 `python -X importtime -c "import <模块>"` 导入各入口模块，
+重复多次取中位数，输出每个模块的总导入耗时和最重的几个依赖。
+加上 --check 时，超过 IMPORT_BUDGETS_MS 中预算的模块会使脚本以非0状态退出，
+可以放在CI中防止有人在模块顶层重新导入 langgraph / langchain_openai 等重依赖。
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --runs 10 --check
+    python -m benchmarks.bench_import_time --modules agent_langgraph --top 20
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 每个入口模块允许的导入耗时（毫秒，中位数）；入口模块只应导入标准库和 dotenv
+IMPORT_BUDGETS_MS: Dict[str, float] = {
+    "agent_langgraph": 150,
+    "agent_with_diverse_tools": 150,
+    "mcp_third_party": 150,
+}
+
+def measure_import(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    在新的解释器中导入一个模块
+
+    返回:
+        (模块的累计导入耗时毫秒数, [(顶层依赖名, 累计毫秒数), ...])
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+
+    total_ms = 0.0
+    # importtime 按导入完成的顺序输出，缩进表示嵌套层级：
+    # "import time: self [us] | cumulative | imported package"
+    children: List[Tuple[str, float]] = []
+    pending: List[Tuple[str, float]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        ms = int(cumulative) / 1000
+        if depth == 0:
+            if name == module:
+                total_ms = ms
+                children = pending
+            pending = []
+        elif depth == 1:
+            pending.append((name, ms))
+    return total_ms, sorted(children, key=lambda c: c[1], reverse=True)
+
+def main(modules: List[str], runs: int, top: int, check: bool) -> int:
+    over_budget = []
+    print(f"{'模块':<28} {'中位数(ms)':>10} {'最小(ms)':>9} {'预算(ms)':>9}")
+    heaviest: Dict[str, List[Tuple[str, float]]] = {}
+    for module in modules:
+        samples = []
+        for _ in range(runs):
+            total_ms, children = measure_import(module)
+            samples.append(total_ms)
+        heaviest[module] = children
+        median = statistics.median(samples)
+        budget = IMPORT_BUDGETS_MS.get(module)
+        flag = ""
+        if budget is not None and median > budget:
+            over_budget.append(module)
+            flag = " ❌"
+        budget_text = f"{budget:.0f}" if budget is not None else "-"
+        print(f"{module:<28} {median:>10.1f} {min(samples):>9.1f} {budget_text:>9}{flag}")
+
+    for module in modules:
+        print(f"\n{module} 最重的 {top} 个直接依赖（最后一次运行）:")
+        for name, ms in heaviest[module][:top]:
+            print(f"  {ms:>8.1f} ms  {name}")
+
+    if check and over_budget:
+        print(f"\n❌ 导入耗时超出预算: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="入口模块导入耗时基准测试")
+    parser.add_argument("--modules", nargs="+", default=list(IMPORT_BUDGETS_MS), help="要测试的模块")
+    parser.add_argument("--runs", type=int, default=5, help="每个模块的导入次数")
+    parser.add_argument("--top", type=int, default=5, help="显示最重的几个直接依赖")
+    parser.add_argument("--check", action="store_true", help="超出预算时以非0状态退出")
+    args = parser.parse_args()
+    sys.exit(main(args.modules, args.runs, args.top, args.check))
@@ -0,0 +1,71 @@
+"""
+CustomMCPClient JSON-RPC 传输吞吐量基准测试
+
+对本地 echo MCP 服务器分别以串行（同一时间只有一个请求在途）和不同并发度
+（多个 tools/call 在同一个 stdio 通道上流水线执行）发送请求，输出吞吐量和延迟。
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_jsonrpc_transport --calls 2000
+    python -m benchmarks.bench_jsonrpc_transport --calls 500 --delay-ms 10
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from test_mcp_simple import CustomMCPClient
+
+ECHO_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "echo_mcp_server.py")
+
+async def run_calls(client: CustomMCPClient, calls: int, concurrency: int) -> dict:
+    """以指定并发度发送 calls 个 tools/call 请求"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.call_tool("echo", "echo", {"text": str(i)})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": calls / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+async def main(calls: int, levels: list, delay_ms: float):
+    client = CustomMCPClient({
+        "echo": {
+            "command": sys.executable,
+            "args": [ECHO_SERVER],
+            "env": {"ECHO_DELAY_MS": str(delay_ms)},
+            "transport": "stdio"
+        }
+    })
+    try:
+        if not (await client.start_servers())["echo"]:
+            return
+        await run_calls(client, 50, 1)  # 预热
+
+        print(f"\n工具延迟: {delay_ms} ms，每个并发度 {calls} 次调用")
+        print(f"{'并发度':>6} {'吞吐量(次/秒)':>14} {'p50(ms)':>9} {'p95(ms)':>9}")
+        for level in levels:
+            r = await run_calls(client, calls, level)
+            print(f"{r['concurrency']:>6} {r['throughput']:>14.0f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}")
+    finally:
+        await client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CustomMCPClient 传输吞吐量基准测试")
+    parser.add_argument("--calls", type=int, default=2000, help="每个并发度下的调用次数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64], help="要测试的并发度")
+    parser.add_argument("--delay-ms", type=float, default=0, help="echo 工具模拟的处理延迟（毫秒）")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency, args.delay_ms))
@@ -0,0 +1,135 @@
+"""
+MCP 传输方式基准测试：streamable HTTP vs SSE vs stdio（见 mcp_transport.py）
+
+对每种传输方式启动一个本地服务器（默认为 echo 服务器，测得的基本都是传输和协议开销；
+--server weather 使用 weather.py），建立若干个会话，每个会话串行发出若干次工具调用，输出
+建立会话的耗时、每次调用的延迟分位数和每个会话使用的 TCP 连接数（读取 /proc/net/tcp，
+只在 Linux 上可用；stdio 通过管道通信，不使用 TCP 连接）。
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_mcp_transport
+    python -m benchmarks.bench_mcp_transport --sessions 5 --calls 200
+    python -m benchmarks.bench_mcp_transport --server weather --calls 20
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+from typing import Any, Dict, List, Optional, Set
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = {
+    "echo": (os.path.join(ROOT, "benchmarks", "echo_mcp_server.py"), "echo", {"text": "hello"}),
+    "weather": (os.path.join(ROOT, "weather.py"), "get_alerts", {"state": "CA"}),
+}
+# 客户端传输方式 -> 服务器的 --transport
+SERVER_MODES = {"streamable_http": "streamable-http", "sse": "sse", "stdio": "stdio"}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def client_ports(port: int) -> Optional[Set[int]]:
+    """当前连接到 port 的已建立 TCP 连接的本地端口（客户端一侧），不是 Linux 时返回None"""
+    ports = set()
+    for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(path) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            return None
+        for line in lines:
+            fields = line.split()
+            local, remote, state = fields[1], fields[2], fields[3]
+            if state == "01" and int(remote.rsplit(":", 1)[1], 16) == port:
+                ports.add(int(local.rsplit(":", 1)[1], 16))
+    return ports
+
+async def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"服务器没有在 {timeout} 秒内监听端口 {port}")
+
+async def run_transport(transport: str, server: str, sessions: int, calls: int) -> Dict[str, Any]:
+    """用一种传输方式建立 sessions 个会话，每个会话串行调用 calls 次"""
+    from mcp import ClientSession
+    from mcp_transport import client_connection, open_streams
+
+    script, tool, arguments = SERVERS[server]
+    command = [sys.executable, script, "--transport", "stdio"]
+    process = None
+    port = None
+    if transport != "stdio":
+        port = free_port()
+        process = subprocess.Popen([sys.executable, script, "--transport", SERVER_MODES[transport],
+                                    "--port", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        await wait_for_port(port)
+    config = client_connection(transport, f"http://127.0.0.1:{port}", command)
+
+    setup_ms: List[float] = []
+    latencies: List[float] = []
+    connections: List[int] = []
+    try:
+        for session_no in range(sessions + 1):  # 第一个会话用于预热，不计入结果
+            started = time.perf_counter()
+            seen: Set[int] = set()
+            async with open_streams(config) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    setup = (time.perf_counter() - started) * 1000
+                    session_latencies = []
+                    for _ in range(calls):
+                        call_started = time.perf_counter()
+                        await session.call_tool(tool, arguments)
+                        session_latencies.append((time.perf_counter() - call_started) * 1000)
+                        if port is not None:
+                            seen |= client_ports(port) or set()
+            if session_no:
+                setup_ms.append(setup)
+                latencies.extend(session_latencies)
+                connections.append(len(seen))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    return {
+        "transport": transport,
+        "setup_ms": statistics.mean(setup_ms),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        "mean_ms": statistics.mean(latencies),
+        "connections": statistics.mean(connections) if port is not None and client_ports(port) is not None else None,
+    }
+
+async def main(args: argparse.Namespace):
+    print(f"\n服务器: {args.server}，每种传输 {args.sessions} 个会话 x {args.calls} 次调用")
+    results = [await run_transport(transport, args.server, args.sessions, args.calls)
+               for transport in args.transport]
+    print(f"\n{'传输方式':<16} {'建立会话(ms)':>12} {'p50(ms)':>9} {'p95(ms)':>9} {'平均(ms)':>9} {'每会话TCP连接':>14}")
+    for r in results:
+        connections = f"{r['connections']:.1f}" if r["connections"] is not None else "-"
+        print(f"{r['transport']:<16} {r['setup_ms']:>12.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['mean_ms']:>9.2f} {connections:>14}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP 传输方式的调用延迟和连接数对比")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="echo", help="要测试的服务器")
+    parser.add_argument("--transport", nargs="+", choices=list(SERVER_MODES), default=list(SERVER_MODES),
+                        help="要测试的传输方式")
+    parser.add_argument("--sessions", type=int, default=3, help="每种传输方式建立的会话数")
+    parser.add_argument("--calls", type=int, default=100, help="每个会话的调用次数")
+    args = parser.parse_args()
+    asyncio.run(main(args))
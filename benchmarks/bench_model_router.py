@@ -0,0 +1,107 @@
+"""
+模型路由基准测试：单一模型 vs 故障切换 + 对冲请求（见 model_router.py）
+
+主模型为带长尾延迟的离线模拟模型（以 --tail-rate 的概率额外延迟 --tail-ms，还可以用
+--fail-rate 模拟出错），备用模型为延迟稍高但稳定的模拟模型。分别用 单一主模型、只切换（不对冲）
+和 切换+对冲 三种方式回答问题集，输出每个问题的耗时分位数、失败数和各模型的请求/对冲统计。
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_model_router
+    python -m benchmarks.bench_model_router --tail-rate 0.1 --tail-ms 3000 --fail-rate 0.05 --rounds 5
+"""
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from typing import Any, Dict, List
+from benchmarks.bench_agent import load_suites
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+async def run_mode(model: Any, tools: List[Any], questions: List[str], concurrency: int) -> Dict[str, Any]:
+    """用一种模型配置回答全部问题，返回每个问题的耗时和失败数"""
+    from agent_langgraph import create_graph
+
+    graph = create_graph(model, tools, verbose=False)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failed = 0
+
+    async def one(question: str) -> None:
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await graph.ainvoke({"messages": [{"role": "user", "content": question}]})
+            except Exception:
+                failed += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(question) for question in questions))
+    return {"latencies": latencies, "failed": failed, "elapsed_s": time.perf_counter() - started}
+
+async def main(args: argparse.Namespace):
+    from agent_langgraph import AgentConfig, parse_tools_config, load_local_tools
+    from fake_llm import ScriptedChatModel
+    from model_router import LatencyTracker, ModelRouter, format_router_stats
+
+    suites = load_suites()
+    questions = [q for name in args.suite for q in suites[name]]
+    # 只用本地工具，耗时差异只来自模型
+    tools = load_local_tools(parse_tools_config(AgentConfig().tools)[1])
+
+    def primary() -> ScriptedChatModel:
+        return ScriptedChatModel(latency_ms=args.latency_ms, tail_rate=args.tail_rate, tail_ms=args.tail_ms,
+                                 fail_rate=args.fail_rate)
+
+    def fallback() -> ScriptedChatModel:
+        return ScriptedChatModel(latency_ms=args.fallback_latency_ms)
+
+    modes = {
+        "单一模型": lambda tracker: primary(),
+        "仅切换": lambda tracker: ModelRouter(candidates=[primary(), fallback()], names=["fake:primary", "fake:fallback"],
+                                            hedge=False, tracker=tracker),
+        "切换+对冲": lambda tracker: ModelRouter(candidates=[primary(), fallback()], names=["fake:primary", "fake:fallback"],
+                                             tracker=tracker),
+    }
+    print(f"\n问题数: {len(questions)} x {args.rounds} 轮，并发 {args.concurrency}，主模型 {args.latency_ms:.0f}ms"
+          f"（{args.tail_rate:.0%} 的调用额外 {args.tail_ms:.0f}ms，出错率 {args.fail_rate:.0%}），"
+          f"备用模型 {args.fallback_latency_ms:.0f}ms")
+
+    results = {}
+    trackers = {}
+    for name, make_model in modes.items():
+        random.seed(args.seed)
+        trackers[name] = LatencyTracker()
+        model = make_model(trackers[name])
+        await run_mode(model, tools, questions, args.concurrency)  # 预热，积累延迟样本
+        results[name] = await run_mode(model, tools, questions * args.rounds, args.concurrency)
+
+    print(f"\n{'方式':<10} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'最长(ms)':>10} {'失败':>6} {'总耗时(s)':>10}")
+    for name, result in results.items():
+        latencies = result["latencies"]
+        print(f"{name:<10} {statistics.median(latencies):>9.0f} {percentile(latencies, 0.95):>9.0f} "
+              f"{percentile(latencies, 0.99):>9.0f} {max(latencies):>10.0f} {result['failed']:>6} "
+              f"{result['elapsed_s']:>10.1f}")
+    for name in ("仅切换", "切换+对冲"):
+        print(f"\n{name}:\n{format_router_stats(trackers[name].stats())}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模型故障切换和对冲请求的尾延迟对比（离线模拟模型）")
+    parser.add_argument("--suite", nargs="+", choices=["default", "diverse"], default=["default", "diverse"],
+                        help="要重放的问题集")
+    parser.add_argument("--rounds", type=int, default=5, help="问题集重复的轮数")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时处理的问题数")
+    parser.add_argument("--latency-ms", type=float, default=100, help="主模型每次调用的延迟")
+    parser.add_argument("--tail-rate", type=float, default=0.1, help="主模型出现长尾延迟的概率")
+    parser.add_argument("--tail-ms", type=float, default=2000, help="长尾调用额外的延迟")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="主模型调用出错的概率")
+    parser.add_argument("--fallback-latency-ms", type=float, default=150, help="备用模型每次调用的延迟")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（三种方式使用相同的延迟序列）")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,102 @@
+"""
+工具检索基准测试：每个问题只绑定最相关的 k 个工具 vs 绑定全部工具
+
+用与 bench_agent 相同的工具集（全部本地工具 + 模拟的天气和Web搜索服务器），分别以
+绑定全部工具和 tool_top_k=k 两种方式回答问题集，输出每次模型调用的工具定义大小、
+输入 token 数（真实模型返回 usage 时）、每个问题的耗时，以及检索是否漏掉了需要的工具
+（以全部绑定时实际调用的工具为准）。
+
+运行方式（在仓库根目录）:
+    python -m benchmarks.bench_tool_retrieval
+    python -m benchmarks.bench_tool_retrieval --k 3
+    python -m benchmarks.bench_tool_retrieval --llm moonshot-v1-8k   # 真实模型，测量 token 和延迟
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional
+from benchmarks.bench_agent import load_suites, mock_servers_config
+
+async def run_mode(model: Any, tools: List[Any], questions: List[str], tool_top_k: Optional[int]) -> List[Dict[str, Any]]:
+    """以一种绑定方式逐个回答问题"""
+    from agent_langgraph import create_graph
+    from answer_cache import tools_used
+    from tool_retrieval import ToolIndex, tool_schema_chars
+
+    graph = create_graph(model, tools, tool_top_k=tool_top_k, verbose=False)
+    index = ToolIndex(tools) if tool_top_k else None
+    results = []
+    for question in questions:
+        bound = index.select(question, tool_top_k) if index is not None else tools
+        started = time.perf_counter()
+        response = await graph.ainvoke({"messages": [{"role": "user", "content": question}]})
+        ai_messages = [m for m in response["messages"] if m.type == "ai"]
+        input_tokens = [m.usage_metadata["input_tokens"] for m in ai_messages if getattr(m, "usage_metadata", None)]
+        results.append({
+            "question": question,
+            "ms": (time.perf_counter() - started) * 1000,
+            "bound": [tool.name for tool in bound],
+            "schema_chars": tool_schema_chars(bound),
+            "model_calls": len(ai_messages),
+            "input_tokens": sum(input_tokens) / len(input_tokens) if input_tokens else None,
+            "used": sorted(set(tools_used(response["messages"]))),
+        })
+    return results
+
+async def main(args: argparse.Namespace):
+    from agent_langgraph import AgentConfig, parse_tools_config, load_mcp_tools, load_local_tools
+    from model_factory import get_chat_model
+    from tool_retrieval import tool_schema_chars
+
+    suites = load_suites()
+    questions = [q for name in args.suite for q in suites[name]]
+    model_kwargs = {}
+    if args.llm.startswith("fake"):
+        from fake_llm import register_fake_models
+
+        register_fake_models()
+        model_kwargs = {"latency_ms": args.latency_ms}
+
+    async with AsyncExitStack() as exit_stack:
+        tools = await load_mcp_tools(mock_servers_config(0), exit_stack)
+        tools += load_local_tools(parse_tools_config(AgentConfig().tools)[1])
+        print(f"\n工具数: {len(tools)}，全部工具定义 {tool_schema_chars(tools)} 字符，模型: {args.llm}，k={args.k}")
+
+        modes = {}
+        for name, top_k in (("全部绑定", None), (f"top-{args.k}", args.k)):
+            model = get_chat_model(args.llm, temperature=0, **model_kwargs)
+            await run_mode(model, tools, questions[:1], top_k)  # 预热
+            modes[name] = await run_mode(model, tools, questions, top_k)
+
+    full, top = modes.values()
+    print(f"\n{'工具数':>6} {'定义字符':>10} {'耗时(ms)':>10} {'全部耗时':>10}  {'漏选':<6} 问题")
+    missed = 0
+    for f, t in zip(full, top):
+        missing = sorted(set(f["used"]) - set(t["bound"]))
+        missed += bool(missing)
+        print(f"{len(t['bound']):>6} {t['schema_chars']:>10} {t['ms']:>10.1f} {f['ms']:>10.1f}  "
+              f"{','.join(missing) or '-':<6} {t['question'][:40]}")
+
+    print(f"\n=== 汇总 ({len(questions)} 个问题) ===")
+    print(f"{'方式':<10} {'平均工具数':>10} {'平均定义字符':>12} {'平均输入token':>14} {'平均耗时(ms)':>12} {'p95(ms)':>9}")
+    for name, results in modes.items():
+        tokens = [r["input_tokens"] for r in results if r["input_tokens"] is not None]
+        latencies = sorted(r["ms"] for r in results)
+        print(f"{name:<10} {statistics.mean(len(r['bound']) for r in results):>10.1f} "
+              f"{statistics.mean(r['schema_chars'] for r in results):>12.0f} "
+              f"{(f'{statistics.mean(tokens):.0f}' if tokens else '-'):>14} "
+              f"{statistics.mean(latencies):>12.1f} {latencies[max(int(len(latencies) * 0.95) - 1, 0)]:>9.1f}")
+    reduction = 1 - statistics.mean(r["schema_chars"] for r in top) / statistics.mean(r["schema_chars"] for r in full)
+    print(f"工具定义缩小 {reduction:.0%}，漏选需要的工具: {missed}/{len(questions)} 个问题")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="工具检索（top-k 绑定）与全部绑定的对比")
+    parser.add_argument("--suite", nargs="+", choices=["default", "diverse"], default=["default", "diverse"],
+                        help="要重放的问题集")
+    parser.add_argument("--k", type=int, default=4, help="每个问题绑定的工具数")
+    parser.add_argument("--llm", default="fake", help="模型名称，默认为离线模拟模型")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟模型每次调用的延迟（仅 fake）")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,28 @@
+import os
+import sys
+import asyncio
+from mcp.server.fastmcp import FastMCP
+
+# 用于基准测试的本地 MCP 服务器：工具直接返回输入，测得的耗时基本都是传输和协议开销。
+# 设置 ECHO_DELAY_MS 可以模拟工具本身的 I/O 延迟（例如请求外部 API）
+mcp = FastMCP("echo", log_level="WARNING")
+ECHO_DELAY = float(os.getenv("ECHO_DELAY_MS", "0")) / 1000
+
+@mcp.tool()
+async def echo(text: str) -> str:
+    """Return the input text unchanged.
+
+    Args:
+        text: Text to echo back
+    """
+    if ECHO_DELAY:
+        await asyncio.sleep(ECHO_DELAY)
+    return text
+
+if __name__ == "__main__":
+    # 默认使用 stdio；--transport 可以选择 HTTP 传输（见 mcp_transport.py）
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from mcp_transport import parse_server_args, run_server
+
+    args = parse_server_args("echo MCP 服务器（基准测试用）", default_transport="stdio")
+    run_server(mcp, args.transport, args.host, args.port)
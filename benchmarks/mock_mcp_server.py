@@ -0,0 +1,67 @@
+import os
+import sys
+import asyncio
+from mcp.server.fastmcp import FastMCP
+
+# 用于离线基准测试的本地 MCP 服务器，代替 weather.py 和智谱Web搜索：
+# 工具名和参数与真实服务器一致，返回固定的文本，不访问任何外部 API。
+# 第一个命令行参数选择要模拟的服务器（weather / zhipu-web-search），
+# 设置 MOCK_TOOL_DELAY_MS 可以模拟外部 API 的延迟
+SERVER_NAME = sys.argv[1] if len(sys.argv) > 1 else "weather"
+TOOL_DELAY = float(os.getenv("MOCK_TOOL_DELAY_MS", "0")) / 1000
+
+mcp = FastMCP(SERVER_NAME, log_level="WARNING")
+
+async def _delay() -> None:
+    if TOOL_DELAY:
+        await asyncio.sleep(TOOL_DELAY)
+
+if SERVER_NAME == "weather":
+    @mcp.tool()
+    async def get_alerts(state: str) -> str:
+        """Get weather alerts for a US state.
+
+        Args:
+            state: Two-letter US state code (e.g. CA, NY)
+        """
+        await _delay()
+        return f"""
+Event: Heat Advisory
+Area: {state} Central Valley
+Severity: Moderate
+Description: Hot temperatures up to 105 expected.
+Instructions: Drink plenty of fluids and stay out of the sun.
+"""
+
+    @mcp.tool()
+    async def get_forecast(latitude: float, longitude: float) -> str:
+        """Get weather forecast for a location.
+
+        Args:
+            latitude: Latitude of the location
+            longitude: Longitude of the location
+        """
+        await _delay()
+        return "\n---\n".join(f"""
+{period}:
+Temperature: {temperature}°F
+Wind: 5 to 10 mph SW
+Forecast: Partly sunny near {latitude:.2f}, {longitude:.2f}.
+""" for period, temperature in [("Today", 78), ("Tonight", 64), ("Tomorrow", 80)])
+
+elif SERVER_NAME == "zhipu-web-search":
+    @mcp.tool()
+    async def webSearchPro(search_query: str) -> str:
+        """Search the web and return summarized results.
+
+        Args:
+            search_query: Search query
+        """
+        await _delay()
+        return "\n".join(f"[{i}] 关于“{search_query}”的模拟搜索结果 {i}" for i in range(1, 4))
+
+else:
+    raise SystemExit(f"未知的模拟服务器: {SERVER_NAME}")
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,268 @@
+"""
+大批量问题的批处理运行器
+
+从 JSONL 文件逐行读取问题，在有界的并发池中交给智能体回答，每个结果完成后立即追加写入
+输出 JSONL 文件，并定期保存检查点。进程崩溃或被中断后重新运行同一条命令，会从检查点继续，
+已经写入的结果不会重复处理。内存中只保留正在处理的问题，与问题总数无关。
+
+输入文件每行一个问题，可以是 {"id": ..., "question": ...}、{"question": ...} 或一个 JSON 字符串，
+没有 id 时使用行号。输出文件每行一个结果:
+    {"id", "line", "question", "answer", "success", "error", "cached", "tools", "stopped_by", "routed_to", "total_ms"}
+routed_to 为回答实际使用的模型（配置了备用模型时可能不是主模型，见 model_router.py）。
+
+运行方式:
+    python bulk_runner.py questions.jsonl results.jsonl --concurrency 8
+    python bulk_runner.py questions.jsonl results.jsonl --llm fake --no-resume
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+from agent_langgraph import AgentConfig, build_agent
+
+# 检查点的保存间隔：每完成这么多个结果，或者距离上次保存超过这么多秒
+CHECKPOINT_EVERY = 50
+CHECKPOINT_INTERVAL = 5.0
+
+def read_questions(path: str, start_line: int = 0) -> Iterator[Tuple[int, Any, Optional[str], Optional[str]]]:
+    """
+    逐行读取问题文件（不会一次读入整个文件）
+
+    参数:
+        path: JSONL 文件路径
+        start_line: 从第几行开始（行号从0开始）
+
+    返回:
+        (行号, id, 问题, 错误信息) 的迭代器；空行的问题为None，无法解析的行带错误信息
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if line_no < start_line:
+                continue
+            line = line.strip()
+            if not line:
+                yield line_no, None, None, None
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, line_no, None, f"无效的JSON: {e}"
+                continue
+            if isinstance(item, str):
+                yield line_no, line_no, item, None
+            elif isinstance(item, dict) and isinstance(item.get("question"), str):
+                yield line_no, item.get("id", line_no), item["question"], None
+            else:
+                yield line_no, line_no, None, "缺少 question 字段"
+
+class Checkpoint:
+    """
+    批处理进度
+
+    next_line 之前的行都已完成，done 中是 next_line 之后已完成的行（并发执行时结果不按顺序完成，
+    这个集合的大小不超过并发度）。output_bytes 是保存检查点时输出文件的大小，恢复时把输出文件
+    截断到这个位置，检查点之后写入的结果会重新处理，保证每个问题恰好有一个结果。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.next_line = 0
+        self.done: Set[int] = set()
+        self.output_bytes = 0
+        self.stats = {"succeeded": 0, "failed": 0}
+
+    def load(self) -> bool:
+        """读取检查点文件，不存在时返回False"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.next_line = data["next_line"]
+        self.done = set(data["done"])
+        self.output_bytes = data["output_bytes"]
+        self.stats = data.get("stats", self.stats)
+        return True
+
+    def save(self, output_bytes: int) -> None:
+        """原子地写入检查点（先写临时文件再替换）"""
+        self.output_bytes = output_bytes
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "next_line": self.next_line,
+                "done": sorted(self.done),
+                "output_bytes": output_bytes,
+                "stats": self.stats,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, line_no: int) -> bool:
+        return line_no < self.next_line or line_no in self.done
+
+    def mark_done(self, line_no: int) -> None:
+        self.done.add(line_no)
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+
+async def answer_question(graph: Any, question: str, answer_cache: Any = None) -> Dict[str, Any]:
+    """回答单个问题，返回结果记录（不打印、不抛出异常）"""
+    from answer_cache import tools_used
+    from model_router import routed_models
+
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"answer": None, "success": False, "error": None, "cached": False, "tools": [],
+                              "stopped_by": None, "routed_to": []}
+    try:
+        cached = answer_cache.lookup(question) if answer_cache is not None else None
+        if cached is not None:
+            result.update(answer=cached["answer"], success=True, cached=True)
+        else:
+            response = await graph.ainvoke({"messages": [{"role": "user", "content": question}]})
+            last_message = response["messages"][-1]
+            answer = last_message.content
+            tools = tools_used(response["messages"])
+            stopped_by = last_message.response_metadata.get("stopped_by")
+            result.update(answer=answer, success=True, tools=tools, stopped_by=stopped_by,
+                          routed_to=routed_models(response["messages"]))
+            if answer_cache is not None and stopped_by is None:  # 部分回答不缓存
+                answer_cache.store(question, answer, tools)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["total_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+async def run_bulk(input_path: str, output_path: str, agent_config: AgentConfig, concurrency: int = 8,
+                   checkpoint_path: Optional[str] = None, resume: bool = True,
+                   progress_every: int = 100) -> Dict[str, Any]:
+    """
+    批量回答问题文件中的问题
+
+    参数:
+        input_path: 输入的问题 JSONL 文件
+        output_path: 输出的结果 JSONL 文件（逐条追加写入）
+        agent_config: 智能体配置（工具、模型、缓存等，与 run_agent 相同）
+        concurrency: 同时处理的问题数
+        checkpoint_path: 检查点文件，默认为 output_path + ".ckpt"
+        resume: 是否从检查点继续；为False时从头开始并覆盖输出文件
+        progress_every: 每完成多少个问题打印一次进度
+
+    返回:
+        本次运行的统计信息
+    """
+    from answer_cache import default_answer_cache
+
+    checkpoint = Checkpoint(checkpoint_path or f"{output_path}.ckpt")
+    resumed = resume and checkpoint.load()
+    if resumed:
+        print(f"↩️ 从检查点继续: 已完成 {checkpoint.next_line + len(checkpoint.done)} 行"
+              f"（成功 {checkpoint.stats['succeeded']}，失败 {checkpoint.stats['failed']}）")
+        output = open(output_path, "r+b" if os.path.exists(output_path) else "wb")
+        output.truncate(checkpoint.output_bytes)  # 丢弃检查点之后写入的结果，它们会被重新处理
+        output.seek(checkpoint.output_bytes)
+    else:
+        output = open(output_path, "wb")
+
+    answer_cache = default_answer_cache if agent_config.answer_cache else None
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    run_stats = {"processed": 0, "succeeded": 0, "failed": 0}
+    last_save = {"count": 0, "time": time.monotonic()}
+    started = time.perf_counter()
+
+    def save_checkpoint(force: bool = False) -> None:
+        if not force and run_stats["processed"] - last_save["count"] < CHECKPOINT_EVERY \
+                and time.monotonic() - last_save["time"] < CHECKPOINT_INTERVAL:
+            return
+        output.flush()
+        os.fsync(output.fileno())
+        checkpoint.save(output.tell())
+        last_save.update(count=run_stats["processed"], time=time.monotonic())
+
+    def write_result(record: Dict[str, Any]) -> None:
+        # 单线程事件循环中写入，不需要加锁；写完一整行后才标记完成
+        output.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        key = "succeeded" if record["success"] else "failed"
+        run_stats["processed"] += 1
+        run_stats[key] += 1
+        checkpoint.stats[key] += 1
+        checkpoint.mark_done(record["line"])
+        if progress_every and run_stats["processed"] % progress_every == 0:
+            elapsed = time.perf_counter() - started
+            print(f"📊 已完成 {run_stats['processed']} 个（失败 {run_stats['failed']}），"
+                  f"{run_stats['processed'] / elapsed:.1f} 个/秒", flush=True)
+        save_checkpoint()
+
+    async def producer() -> None:
+        for line_no, item_id, question, error in read_questions(input_path, checkpoint.next_line):
+            if checkpoint.is_done(line_no):
+                continue
+            if question is None and error is None:
+                checkpoint.mark_done(line_no)  # 空行
+                continue
+            await queue.put((line_no, item_id, question, error))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker(graph: Any) -> None:
+        while (item := await queue.get()) is not None:
+            line_no, item_id, question, error = item
+            record = {"id": item_id, "line": line_no, "question": question}
+            if error is not None:
+                record.update(answer=None, success=False, error=error, cached=False, tools=[], stopped_by=None,
+                              total_ms=0.0)
+            else:
+                record.update(await answer_question(graph, question, answer_cache))
+            write_result(record)
+
+    try:
+        async with AsyncExitStack() as exit_stack:
+            graph = await build_agent(agent_config, exit_stack, verbose=False)  # 不逐步打印工具耗时
+            if graph is None:
+                return {"success": False, "error": "没有加载到任何工具"}
+            print(f"🚀 开始批处理: {input_path} -> {output_path}，并发度 {concurrency}")
+            await asyncio.gather(producer(), *(worker(graph) for _ in range(concurrency)))
+    finally:
+        save_checkpoint(force=True)
+        output.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "success": True,
+        "resumed": resumed,
+        "processed": run_stats["processed"],
+        "succeeded": run_stats["succeeded"],
+        "failed": run_stats["failed"],
+        "total_succeeded": checkpoint.stats["succeeded"],
+        "total_failed": checkpoint.stats["failed"],
+        "elapsed_s": elapsed,
+        "throughput": run_stats["processed"] / elapsed if elapsed else 0.0,
+        "output": output_path,
+    }
+    print(f"\n=== 批处理完成 ===")
+    print(f"本次处理 {summary['processed']} 个（成功 {summary['succeeded']}，失败 {summary['failed']}），"
+          f"耗时 {elapsed:.1f}s，{summary['throughput']:.1f} 个/秒")
+    print(f"累计: 成功 {summary['total_succeeded']}，失败 {summary['total_failed']}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从JSONL文件批量回答问题，支持断点续跑")
+    parser.add_argument("input", help="问题文件（JSONL）")
+    parser.add_argument("output", help="结果文件（JSONL）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时处理的问题数")
+    parser.add_argument("--llm", default=AgentConfig.llm, help="模型名称（fake 为离线模拟模型）")
+    parser.add_argument("--tools", nargs="+", help="可用工具列表，默认与 AgentConfig 相同")
+    parser.add_argument("--checkpoint", help="检查点文件，默认为 <output>.ckpt")
+    parser.add_argument("--no-resume", action="store_true", help="忽略检查点，从头开始并覆盖输出文件")
+    parser.add_argument("--answer-cache", action="store_true", help="使用回答缓存（相似的问题直接复用之前的回答）")
+    args = parser.parse_args()
+
+    if args.llm.startswith("fake"):
+        from fake_llm import register_fake_models
+
+        register_fake_models()
+    config = AgentConfig(llm=args.llm, tools=args.tools, stream=False, answer_cache=args.answer_cache)
+    asyncio.run(run_bulk(args.input, args.output, config, concurrency=args.concurrency,
+                         checkpoint_path=args.checkpoint, resume=not args.no_resume))
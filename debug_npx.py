@@ -2,6 +2,7 @@ import shutil
 import os
 import subprocess
 import asyncio
+import time
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
@@ -71,6 +72,28 @@ def test_npx_call():
     
     return None
 
+async def wait_for_tools(client, deadline: float = 60.0, initial_delay: float = 0.5, max_delay: float = 8.0):
+    """
+    探测 MCP 服务器是否就绪：get_tools 会发送 initialize 并等待响应，
+    失败时按指数退避重试，直到成功或超过 deadline
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    delay = initial_delay
+    
+    while True:
+        remaining = end - loop.time()
+        if remaining <= 0:
+            raise TimeoutError(f"MCP 服务器在 {deadline} 秒内未就绪")
+        try:
+            return await asyncio.wait_for(client.get_tools(), timeout=remaining)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"MCP 服务器在 {deadline} 秒内未就绪")
+        except Exception as e:
+            print(f"⏳ 服务器尚未就绪（{e}），{delay:.1f} 秒后重试...")
+            await asyncio.sleep(min(delay, max(end - loop.time(), 0)))
+            delay = min(delay * 2, max_delay)
+
 async def test_mcp_with_working_npx():
     """使用能工作的 npx 方式测试 MCP"""
     
@@ -99,11 +122,10 @@ async def test_mcp_with_working_npx():
         print("🚀 创建 MCP 客户端...")
         client = MultiServerMCPClient(config)
         
-        print("⏳ 等待服务器启动（30秒）...")
-        await asyncio.sleep(30)
-        
-        print("🔧 尝试获取工具...")
-        tools = client.get_tools()
+        print("🔧 等待服务器就绪并获取工具...")
+        started = time.monotonic()
+        tools = await wait_for_tools(client)
+        print(f"⏱️ 服务器就绪耗时 {time.monotonic() - started:.1f} 秒")
         
         print(f"✅ 成功！获取到 {len(tools)} 个工具:")
         for tool in tools:
@@ -0,0 +1,244 @@
+import re
+import time
+import json
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, AsyncIterator, List, Optional, Sequence, Tuple, Union
+from pydantic import Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# 工具参数可以是固定的字典，也可以是根据问题的正则匹配结果生成参数的函数
+ToolArgs = Union[Dict[str, Any], Callable[[re.Match], Dict[str, Any]]]
+
+@dataclass
+class ScriptRule:
+    """
+    脚本规则：问题匹配 pattern 时，模型依次发出 steps 中的工具调用，最后给出 answer
+
+    steps 中每一项是一步里并行发出的工具调用列表 [(工具名, 参数), ...]；
+    answer 中 {results} 为本轮所有工具输出，{question} 为原问题。
+    """
+    pattern: str
+    steps: List[List[Tuple[str, ToolArgs]]]
+    answer: str
+
+# 部分城市的坐标（get_forecast 需要经纬度）
+CITY_COORDINATES: Dict[str, Tuple[float, float]] = {
+    "new york": (40.7128, -74.006),
+    "miami": (25.7617, -80.1918),
+    "上海": (31.2304, 121.4737),
+    "北京": (39.9042, 116.4074),
+    "成都": (30.5728, 104.0668),
+}
+
+_STATE_CODES = {
+    "california": "CA", "new york": "NY", "texas": "TX", "florida": "FL", "加州": "CA",
+}
+
+def _state(m: re.Match) -> Dict[str, Any]:
+    name = m["state"].lower()
+    return {"state": _STATE_CODES.get(name, name.upper())}
+
+def _city(m: re.Match) -> Dict[str, Any]:
+    latitude, longitude = CITY_COORDINATES[m["city"].lower()]
+    return {"latitude": latitude, "longitude": longitude}
+
+def _search(m: re.Match) -> Dict[str, Any]:
+    return {"search_query": m.string}
+
+_CITIES = "|".join(re.escape(city) for city in CITY_COORDINATES)
+# 州名不区分大小写，两字母州代码必须大写（避免匹配到 in/or 等单词）
+_STATES = "(?i:" + "|".join(re.escape(state) for state in _STATE_CODES) + r")|\b[A-Z]{2}\b"
+_QUOTED = r"""['"“‘](?P<text>[^'"”’]*)['"”’]"""
+
+# 覆盖 agent_langgraph / agent_with_diverse_tools / mcp_client 中测试问题的默认脚本，按顺序匹配
+DEFAULT_SCRIPT: List[ScriptRule] = [
+    ScriptRule(r"(?P<a>\d+)\s*\*\s*(?P<b>\d+)\s*然后减去\s*(?P<c>\d+).*?(?P<city>" + _CITIES + ")",
+               [[("multiply", lambda m: {"a": float(m["a"]), "b": float(m["b"])}), ("get_forecast", _city)],
+                [("subtract", lambda m: {"a": float(m["a"]) * float(m["b"]), "b": float(m["c"])})]],
+               "计算和天气查询结果: {results}"),
+    ScriptRule(r"(?P<expr>[\d(][\d\s+\-*/().]*[+\-*/][\d\s+\-*/().]*[\d)])",
+               [[("evaluate_expression", lambda m: {"expression": m["expr"].strip()})]],
+               "计算结果是 {results}"),
+    ScriptRule(r"(?P<n>\d+(?:\.\d+)?)\s*的平方根|square root of (?P<n2>\d+(?:\.\d+)?)",
+               [[("square_root", lambda m: {"number": float(m["n"] or m["n2"])})]],
+               "平方根是 {results}"),
+    ScriptRule(_QUOTED + r".*(?:大写|upper)", [[("to_uppercase", lambda m: {"text": m["text"]})]],
+               "转换为大写后的结果是: {results}"),
+    ScriptRule(_QUOTED + r".*(?:小写|lower)", [[("to_lowercase", lambda m: {"text": m["text"]})]],
+               "转换为小写后的结果是: {results}"),
+    ScriptRule(r"(?i:alert|flood|预警).*?(?P<state>" + _STATES + ")", [[("get_alerts", _state)]],
+               "预警信息如下: {results}"),
+    ScriptRule(r"(?P<city>(?i:" + _CITIES + "))", [[("get_forecast", _city)]],
+               "天气预报如下: {results}"),
+    ScriptRule(r"最新|最近|有哪些|是什么|进展|趋势|搜索|查询", [[("webSearchPro", _search)]],
+               "根据搜索结果: {results}"),
+]
+
+FALLBACK_ANSWER = "这是离线模拟模型的回答: {question}"
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    可编排的离线聊天模型，用于基准测试和离线调试
+
+    按脚本规则匹配最后一条用户消息，依次发出预先设定的工具调用，工具结果返回后
+    给出最终回答，不访问任何网络。支持 bind_tools（与 ChatOpenAI 一样转换工具定义，
+    因此绑定工具的开销也会被计入）、流式输出，以及用 latency_ms / token_ms 模拟模型延迟、
+    用 tail_rate / tail_ms 模拟长尾延迟、用 fail_rate 模拟提供方出错。
+    每次调用的耗时、输入大小和工具调用数记录在 calls 中。
+    """
+
+    rules: List[Any] = Field(default_factory=lambda: list(DEFAULT_SCRIPT))
+    latency_ms: float = 0.0  # 首个输出片段之前的延迟
+    token_ms: float = 0.0  # 每个输出片段的延迟
+    chunk_chars: int = 8  # 流式输出时每个片段的字符数
+    tail_rate: float = 0.0  # 以这个概率在首个片段之前额外延迟 tail_ms（模拟长尾延迟）
+    tail_ms: float = 0.0
+    fail_rate: float = 0.0  # 以这个概率调用失败（模拟提供方出错）
+    calls: List[Dict[str, Any]] = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _match(self, question: str) -> Tuple[Optional[ScriptRule], Optional[re.Match]]:
+        for rule in self.rules:
+            m = re.search(rule.pattern, question)
+            if m:
+                return rule, m
+        return None, None
+
+    def plan(self, messages: Sequence[BaseMessage], tools: Optional[Sequence[Dict[str, Any]]] = None) -> AIMessage:
+        """根据对话状态决定下一条回复：下一步的工具调用，或者最终回答"""
+        human = [i for i, m in enumerate(messages) if m.type == "human"]
+        question = str(messages[human[-1]].content) if human else ""
+        turn = messages[human[-1] + 1:] if human else []
+        step = sum(1 for m in turn if m.type == "ai" and getattr(m, "tool_calls", None))
+        results = [str(m.content) for m in turn if m.type == "tool"]
+        available = {tool["function"]["name"] for tool in tools or []}
+
+        rule, m = self._match(question)
+        if rule is not None and step < len(rule.steps):
+            tool_calls = [
+                {"name": name, "args": args(m) if callable(args) else dict(args),
+                 "id": f"call_{step}_{i}", "type": "tool_call"}
+                for i, (name, args) in enumerate(rule.steps[step]) if name in available
+            ]
+            if tool_calls:
+                return AIMessage(content="", tool_calls=tool_calls)
+
+        template = rule.answer if rule is not None else FALLBACK_ANSWER
+        return AIMessage(content=template.format(results="; ".join(results) or "无", question=question))
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ])]
+        text = str(message.content)
+        return [AIMessageChunk(content=text[i:i + self.chunk_chars])
+                for i in range(0, len(text), self.chunk_chars)] or [AIMessageChunk(content="")]
+
+    def _record(self, messages: Sequence[BaseMessage], message: AIMessage, started: float,
+                tools: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        self.calls.append({
+            "ms": (time.perf_counter() - started) * 1000,
+            "input_messages": len(messages),
+            "input_chars": sum(len(str(m.content)) for m in messages),
+            "bound_tools": len(tools or []),
+            "tool_schema_chars": len(json.dumps(tools, ensure_ascii=False)) if tools else 0,
+            "tool_calls": len(message.tool_calls),
+        })
+
+    def _first_delay(self) -> float:
+        """首个片段之前的延迟（秒），按 fail_rate 的概率抛出异常"""
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise RuntimeError("模拟的模型调用错误")
+        tail = self.tail_ms if self.tail_rate and random.random() < self.tail_rate else 0.0
+        return (self.latency_ms + tail) / 1000
+
+    def _delay(self, message: AIMessage) -> float:
+        return self._first_delay() + self.token_ms * len(self._chunks(message)) / 1000
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        started = time.perf_counter()
+        message = self.plan(messages, kwargs.get("tools"))
+        delay = self._delay(message)
+        if delay:
+            time.sleep(delay)
+        self._record(messages, message, started, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        started = time.perf_counter()
+        message = self.plan(messages, kwargs.get("tools"))
+        delay = self._delay(message)
+        if delay:
+            await asyncio.sleep(delay)
+        self._record(messages, message, started, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        message = self.plan(messages, kwargs.get("tools"))
+        delay = self._first_delay()
+        if delay:
+            time.sleep(delay)
+        for chunk in self._chunks(message):
+            if self.token_ms:
+                time.sleep(self.token_ms / 1000)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+        self._record(messages, message, started, kwargs.get("tools"))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        message = self.plan(messages, kwargs.get("tools"))
+        delay = self._first_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        for chunk in self._chunks(message):
+            if self.token_ms:
+                await asyncio.sleep(self.token_ms / 1000)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+        self._record(messages, message, started, kwargs.get("tools"))
+
+    def model_stats(self) -> Dict[str, Any]:
+        """汇总所有调用的耗时和输入大小"""
+        total_ms = sum(c["ms"] for c in self.calls)
+        return {
+            "calls": len(self.calls),
+            "total_ms": total_ms,
+            "avg_input_chars": sum(c["input_chars"] for c in self.calls) / len(self.calls) if self.calls else 0,
+        }
+
+def fake_chat_model(model_name: str, **kwargs: Any) -> ScriptedChatModel:
+    """model_factory 的模型工厂：忽略模型名，按 kwargs 创建 ScriptedChatModel"""
+    return ScriptedChatModel(**kwargs)
+
+def register_fake_models(prefix: str = "fake") -> None:
+    """
+    让 model_factory.get_chat_model 对以 prefix 开头的模型名返回离线模拟模型
+
+    用于测试、基准测试和 bulk_runner --llm fake，生产代码中不需要调用。
+    """
+    from model_factory import register_model_factory
+
+    register_model_factory(prefix, fake_chat_model)
@@ -0,0 +1,144 @@
+import re
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import BaseTool
+
+# 数字和带引号的字符串
+_NUM = r"-?\d+(?:\.\d+)?"
+_QUOTED = r"""(?:'(?P<s1>[^']*)'|"(?P<s2>[^"]*)"|“(?P<s3>[^”]*)”|‘(?P<s4>[^’]*)’|「(?P<s5>[^」]*)」)"""
+
+# 问题首尾的客套话，去掉后剩余部分必须被某个模式完整匹配
+_PREFIX = re.compile(r"^(?:请\s*)?(?:帮我\s*)?(?:计算|算一下|算|求|what\s+is|what's|calculate|compute)\s*", re.I)
+_SUFFIX = re.compile(r"\s*(?P<trigger>的结果|的值|是多少|等于多少|等于几|多少|=)?\s*[?？。.!！]*$")
+# 没有 "计算"、"=" 这类明确的触发词时，运算符两侧必须有空格才按算术处理（"2024-06-01" 是日期，不是减法）
+_SPACED_OPERATOR = re.compile(r"\s[+\-*/×÷^]\s")
+
+_OPS = {"+": "add", "-": "subtract", "*": "multiply", "×": "multiply", "/": "divide", "÷": "divide"}
+
+@dataclass
+class FastPathMatch:
+    """快速路径匹配结果"""
+    tool: str  # 要调用的本地工具名
+    args: Dict[str, Any]  # 工具参数
+    template: str  # 回答模板，{result} 为工具结果
+
+def _num(text: str) -> float:
+    return float(text)
+
+def _fmt(value: Any) -> str:
+    """整数值的浮点数去掉小数部分（56.0 -> 56）"""
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(value)
+
+def _quoted(match: re.Match) -> str:
+    return next(match.group(g) for g in ("s1", "s2", "s3", "s4", "s5") if match.group(g) is not None)
+
+def _sqrt(m: re.Match) -> FastPathMatch:
+    return FastPathMatch("square_root", {"number": _num(m["n"])}, f"{m['n']} 的平方根是 {{result}}")
+
+def _power(m: re.Match) -> FastPathMatch:
+    return FastPathMatch("power", {"base": _num(m["a"]), "exponent": _num(m["b"])},
+                         f"{m['a']} 的 {m['b']} 次方是 {{result}}")
+
+def _binary(m: re.Match) -> FastPathMatch:
+    return FastPathMatch(_OPS[m["op"]], {"a": _num(m["a"]), "b": _num(m["b"])},
+                         f"{m['a']} {m['op']} {m['b']} = {{result}}")
+
+def _expression(m: re.Match) -> FastPathMatch:
+    expression = m["expr"].strip()
+    return FastPathMatch("evaluate_expression", {"expression": expression}, f"{expression} = {{result}}")
+
+def _upper(m: re.Match) -> FastPathMatch:
+    return FastPathMatch("to_uppercase", {"text": _quoted(m)}, "转换为大写后的结果是: {result}")
+
+def _lower(m: re.Match) -> FastPathMatch:
+    return FastPathMatch("to_lowercase", {"text": _quoted(m)}, "转换为小写后的结果是: {result}")
+
+# (模式, 构造匹配结果的函数)；模式需要完整匹配去掉首尾客套话后的问题
+_PATTERNS: List[tuple] = [
+    (rf"(?P<n>{_NUM})\s*的\s*平方根", _sqrt),
+    (rf"(?:the\s+)?(?:square\s+root\s+of|sqrt)\s*\(?\s*(?P<n>{_NUM})\s*\)?", _sqrt),
+    (rf"√\s*(?P<n>{_NUM})", _sqrt),
+    (rf"(?P<a>{_NUM})\s*的\s*(?P<b>{_NUM})\s*次方", _power),
+    (rf"(?P<a>{_NUM})\s*(?:\^|\*\*)\s*(?P<b>{_NUM})", _power),
+    (rf"(?P<a>{_NUM})\s*(?P<op>[+\-*/×÷])\s*(?P<b>{_NUM})", _binary),
+    # 多个运算符的算术表达式交给 evaluate_expression 一次算完
+    (r"(?P<expr>[\d\s.+\-*/×÷^()（）√]*[+\-*/×÷^√][\d\s.+\-*/×÷^()（）√]*)", _expression),
+    (rf"(?:将|把)\s*{_QUOTED}\s*(?:转换|转|变)(?:为|成)\s*大写(?:字母)?", _upper),
+    (rf"(?:将|把)\s*{_QUOTED}\s*(?:转换|转|变)(?:为|成)\s*小写(?:字母)?", _lower),
+    (rf"(?:convert\s+)?{_QUOTED}\s+(?:to|in)\s+upper\s*case", _upper),
+    (rf"(?:convert\s+)?{_QUOTED}\s+(?:to|in)\s+lower\s*case", _lower),
+]
+_COMPILED: List[tuple] = [(re.compile(p, re.I), build) for p, build in _PATTERNS]
+# 需要触发词或带空格的运算符的模式
+_NEEDS_TRIGGER = (_binary, _expression)
+
+def match_fast_path(question: str) -> Optional[FastPathMatch]:
+    """
+    识别可以直接用本地工具回答的简单问题
+
+    只有当整个问题都能被某个模式完整匹配时才返回结果，否则返回None，
+    由完整的 ReAct 流程处理。加减乘除和算术表达式还要求问题中有 "计算"、"多少"、"=" 等触发词，
+    或者至少一个两侧有空格的运算符。
+
+    参数:
+        question: 用户问题
+
+    返回:
+        匹配结果，没有把握时返回None
+    """
+    text = question.strip()
+    prefix = _PREFIX.match(text)
+    text = text[prefix.end():] if prefix else text
+    suffix = _SUFFIX.search(text)
+    triggered = prefix is not None or suffix["trigger"] is not None
+    text = text[:suffix.start()]
+    for pattern, build in _COMPILED:
+        m = pattern.fullmatch(text)
+        if m:
+            if build in _NEEDS_TRIGGER and not triggered and not _SPACED_OPERATOR.search(text):
+                return None
+            return build(m)
+    return None
+
+def make_fast_path_node(tools: List[BaseTool]) -> Callable:
+    """
+    创建快速路径节点
+
+    节点识别最后一条用户消息中的简单算术/字符串意图，直接调用本地工具并给出回答，
+    不经过LLM；无法识别、工具不可用或工具报错时不返回任何消息，交给模型处理。
+    """
+    tools_by_name = {tool.name: tool for tool in tools}
+
+    async def fast_path(state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        if not messages or messages[-1].type != "human":
+            return {"messages": []}
+
+        match = match_fast_path(str(messages[-1].content))
+        if match is None or match.tool not in tools_by_name:
+            return {"messages": []}
+
+        try:
+            result = await tools_by_name[match.tool].ainvoke(match.args)
+        except Exception:
+            return {"messages": []}
+
+        call_id = f"fast_path_{uuid.uuid4().hex[:8]}"
+        return {"messages": [
+            AIMessage(content="", tool_calls=[{"name": match.tool, "args": match.args, "id": call_id}]),
+            ToolMessage(content=str(result), name=match.tool, tool_call_id=call_id),
+            AIMessage(content=match.template.format(result=_fmt(result))),
+        ]}
+
+    return fast_path
+
+def route_after_fast_path(state: Dict[str, Any]) -> str:
+    """快速路径已经给出回答时结束，否则进入模型调用"""
+    last = state["messages"][-1]
+    if last.type == "ai" and not getattr(last, "tool_calls", None):
+        return "__end__"
+    return "call_model"
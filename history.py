@@ -0,0 +1,153 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# 单条工具输出保留的最大字符数（例如一次返回几十条天气预警的 get_alerts）
+DEFAULT_MAX_TOOL_CHARS = 2000
+
+SUMMARY_PROMPT = (
+    "下面是一段对话的早期内容摘要和之后的若干轮对话。请把它们合并成一段新的摘要，"
+    "保留用户关心的主题、地点、数字结论和尚未解决的问题，省略寒暄和重复内容，"
+    "不超过{max_chars}个字。\n\n已有摘要:\n{summary}\n\n新的对话:\n{turns}"
+)
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """超过 max_chars 时保留开头和结尾，中间用省略标记代替"""
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return f"{text[:head]}\n...[省略 {len(text) - max_chars} 个字符]...\n{text[-tail:]}"
+
+def truncate_tool_messages(messages: Sequence[BaseMessage], max_chars: int = DEFAULT_MAX_TOOL_CHARS) -> List[BaseMessage]:
+    """
+    截断过长的工具输出，其他消息原样返回
+
+    只创建被截断消息的副本，不修改图状态中的原消息。
+    """
+    compacted = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and isinstance(message.content, str) and len(message.content) > max_chars:
+            message = message.model_copy(update={"content": truncate_text(message.content, max_chars)})
+        compacted.append(message)
+    return compacted
+
+def make_pre_model_hook(max_tool_chars: int = DEFAULT_MAX_TOOL_CHARS):
+    """
+    create_react_agent 的 pre_model_hook：发给模型的消息中截断过长的工具输出
+
+    通过 llm_input_messages 返回，图状态中保存的仍是完整消息。
+    """
+    def pre_model_hook(state: Dict[str, Any]) -> Dict[str, Any]:
+        return {"llm_input_messages": truncate_tool_messages(state["messages"], max_tool_chars)}
+    return pre_model_hook
+
+def message_chars(messages: Sequence[BaseMessage]) -> int:
+    """消息列表的总字符数（近似衡量提示词大小）"""
+    return sum(len(m.content) if isinstance(m.content, str) else len(str(m.content)) for m in messages)
+
+class ChatSession:
+    """
+    有界内存的多轮对话历史
+
+    最近 window_turns 轮对话原样保留（只保存用户问题和最终回答，不保存中间的工具调用），
+    更早的对话在后台合并为一段摘要，作为系统消息放在最前面。这样无论对话进行多少轮，
+    每一轮发给模型的上下文大小基本不变。
+    """
+
+    def __init__(self, model: Any = None, window_turns: int = 6, max_summary_chars: int = 1500,
+                 max_answer_chars: int = 2000):
+        """
+        参数:
+            model: 用于生成摘要的聊天模型；为None时使用截取式摘要（不调用模型）
+            window_turns: 原样保留的最近对话轮数
+            max_summary_chars: 摘要的最大字符数
+            max_answer_chars: 历史中每个回答保留的最大字符数
+        """
+        self.model = model
+        self.window_turns = window_turns
+        self.max_summary_chars = max_summary_chars
+        self.max_answer_chars = max_answer_chars
+        self.summary = ""
+        self.turns: List[List[BaseMessage]] = []
+        self.stats: List[Dict[str, Any]] = []
+        self._evicted: List[List[BaseMessage]] = []
+        self._summary_task: Optional[asyncio.Task] = None
+
+    async def messages_for(self, query: str) -> List[BaseMessage]:
+        """构建本轮发给智能体的消息：摘要 + 最近几轮对话 + 当前问题"""
+        if self._summary_task is not None:
+            await self._summary_task  # 通常在用户输入期间就已完成
+            self._summary_task = None
+
+        messages: List[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"之前对话的摘要:\n{self.summary}"))
+        for turn in self.turns:
+            messages.extend(turn)
+        messages.append(HumanMessage(content=query))
+        return messages
+
+    def add_turn(self, query: str, answer: Optional[str], prompt_messages: Sequence[BaseMessage],
+                 latency_ms: float) -> Dict[str, Any]:
+        """
+        记录一轮对话，超出窗口的旧对话在后台合并进摘要
+
+        参数:
+            query: 用户问题
+            answer: 最终回答（失败时为None，不记入历史）
+            prompt_messages: 本轮发给智能体的消息，用于统计上下文大小
+            latency_ms: 本轮耗时
+
+        返回:
+            本轮的统计信息
+        """
+        stat = {
+            "turn": len(self.stats) + 1,
+            "prompt_messages": len(prompt_messages),
+            "prompt_chars": message_chars(prompt_messages),
+            "latency_ms": latency_ms,
+        }
+        self.stats.append(stat)
+
+        if answer is not None:
+            self.turns.append([
+                HumanMessage(content=query),
+                AIMessage(content=truncate_text(answer, self.max_answer_chars)),
+            ])
+        if len(self.turns) > self.window_turns:
+            self._evicted.extend(self.turns[:-self.window_turns])
+            self.turns = self.turns[-self.window_turns:]
+            if self._summary_task is None or self._summary_task.done():
+                self._summary_task = asyncio.create_task(self._summarize())
+        return stat
+
+    async def _summarize(self) -> None:
+        while self._evicted:
+            turns, self._evicted = self._evicted, []
+            text = "\n".join(f"{'用户' if isinstance(m, HumanMessage) else '助手'}: {m.content}"
+                             for turn in turns for m in turn)
+            summary = None
+            if self.model is not None:
+                try:
+                    prompt = SUMMARY_PROMPT.format(max_chars=self.max_summary_chars,
+                                                   summary=self.summary or "（无）", turns=text)
+                    response = await self.model.ainvoke([HumanMessage(content=prompt)])
+                    summary = str(response.content).strip()
+                except Exception:
+                    summary = None
+            if not summary:
+                # 截取式摘要：保留每轮的问题和回答开头，超出长度时丢弃最早的内容
+                lines = [f"{'用户' if isinstance(m, HumanMessage) else '助手'}: {str(m.content)[:150]}"
+                         for turn in turns for m in turn]
+                summary = "\n".join(filter(None, [self.summary] + lines))
+            self.summary = summary[-self.max_summary_chars:]
+
+    def reset(self) -> None:
+        """清空历史"""
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+        self.summary = ""
+        self.turns = []
+        self._evicted = []
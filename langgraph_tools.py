@@ -1,6 +1,16 @@
 from langchain_core.tools import tool
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
+import re
+import ast
 import math
+import operator
+from functools import lru_cache
+
+# NumPy 为可选依赖，没有安装时批量工具使用纯Python实现
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # 基础数学工具
 @tool
@@ -90,6 +100,204 @@ def power(base: float, exponent: float) -> float:
     """
     return math.pow(base, exponent)
 
+# 表达式求值工具（一次调用完成多步运算）
+_MAX_EXPRESSION_LENGTH = 500
+_MAX_EXPONENT = 1000
+
+# 把常见的中文/数学符号替换成 Python 运算符
+_EXPRESSION_REPLACEMENTS = {
+    "×": "*", "÷": "/", "^": "**", "（": "(", "）": ")", "√": "sqrt", "，": ",",
+}
+# 两个数字（或括号）之间单独的 x 表示乘号，例如 "3 x 4"、"(1+2)x3"
+_TIMES_X = re.compile(r"(?<=[\d.)])\s*[xX]\s*(?=[\d.(])")
+
+def _checked_power(base: float, exponent: float) -> float:
+    if abs(exponent) > _MAX_EXPONENT:
+        raise ValueError(f"指数过大: {exponent}")
+    return power.func(base, exponent)
+
+# 允许的运算，复用上面定义的基础数学工具
+_BINARY_OPS = {
+    ast.Add: lambda a, b: add.func(a, b),
+    ast.Sub: lambda a, b: subtract.func(a, b),
+    ast.Mult: lambda a, b: multiply.func(a, b),
+    ast.Div: lambda a, b: divide.func(a, b),
+    ast.Pow: _checked_power,
+}
+_UNARY_OPS = {
+    ast.UAdd: lambda a: a,
+    ast.USub: lambda a: -a,
+}
+_FUNCTIONS = {
+    "sqrt": lambda x: square_root.func(x),
+    "pow": _checked_power,
+}
+_FUNCTION_ARITY = {"sqrt": 1, "pow": 2}
+
+def _compile_node(node: ast.AST):
+    """把语法树节点编译成求值函数，遇到白名单以外的语法直接报错"""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = float(node.value)
+        return lambda: value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op, left, right = _BINARY_OPS[type(node.op)], _compile_node(node.left), _compile_node(node.right)
+        return lambda: op(left(), right())
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        op, operand = _UNARY_OPS[type(node.op)], _compile_node(node.operand)
+        return lambda: op(operand())
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCTIONS and not node.keywords):
+        name = node.func.id
+        if len(node.args) != _FUNCTION_ARITY[name]:
+            raise ValueError(f"{name} 需要 {_FUNCTION_ARITY[name]} 个参数，实际为 {len(node.args)} 个")
+        func, args = _FUNCTIONS[name], [_compile_node(arg) for arg in node.args]
+        return lambda: func(*(arg() for arg in args))
+    raise ValueError(f"表达式中包含不支持的内容: {ast.dump(node)[:50]}")
+
+@lru_cache(maxsize=256)
+def _compile_expression(expression: str):
+    """解析并编译表达式，结果按表达式文本缓存"""
+    if len(expression) > _MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"表达式过长（超过{_MAX_EXPRESSION_LENGTH}个字符）")
+    expression = re.sub(r"√\s*(\d+(?:\.\d+)?)", r"sqrt(\1)", expression)
+    expression = _TIMES_X.sub(" * ", expression)
+    for old, new in _EXPRESSION_REPLACEMENTS.items():
+        expression = expression.replace(old, new)
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError(f"无法解析表达式: {expression}")
+    return _compile_node(tree)
+
+@tool
+def evaluate_expression(expression: str) -> float:
+    """
+    计算一个完整的算术表达式，一次调用完成多步运算。
+    
+    支持 + - * / 和乘方（** 或 ^）、括号、负数，以及 sqrt(x)、pow(x, y) 函数，
+    也支持 × ÷ √、数字之间的 x（乘号）和中文括号。例如 "(3 + 5) * 12"、"sqrt(16) + 2^3"、"3 x 4"。
+    
+    参数:
+        expression: 算术表达式
+    
+    返回:
+        表达式的计算结果（超出浮点数范围时报错）
+    """
+    try:
+        result = _compile_expression(expression)()
+    except OverflowError:
+        result = math.inf
+    if not math.isfinite(result):
+        raise ValueError(f"计算结果超出浮点数范围: {expression}")
+    return result
+
+# 批量数学工具（一次调用处理整列数字）
+_ELEMENTWISE_OPS = {
+    "add": (operator.add, "add"),
+    "subtract": (operator.sub, "subtract"),
+    "multiply": (operator.mul, "multiply"),
+    "divide": (operator.truediv, "divide"),
+    "power": (math.pow, "power"),
+}
+
+_AGGREGATE_OPS = {
+    "sum": (math.fsum, "sum"),
+    "mean": (lambda xs: math.fsum(xs) / len(xs), "mean"),
+    "min": (min, "min"),
+    "max": (max, "max"),
+    "product": (math.prod, "prod"),
+}
+
+def _finite(values: List[float], operation: str) -> List[float]:
+    """
+    检查结果都是有限数
+
+    NumPy 在溢出或没有定义时（例如负数的非整数次方）返回 inf/nan，纯 Python 实现则抛出异常，
+    两条路径都经过这里，报同样的错误。
+    """
+    if not all(math.isfinite(v) for v in values):
+        raise ValueError(f"{operation} 的结果超出浮点数范围或没有定义")
+    return values
+
+def _python_result(compute, operation: str) -> List[float]:
+    """纯 Python 实现的计算，溢出和定义域错误转换为与 NumPy 路径相同的错误"""
+    try:
+        return _finite(compute(), operation)
+    except (OverflowError, ValueError):
+        raise ValueError(f"{operation} 的结果超出浮点数范围或没有定义") from None
+
+@tool
+def elementwise(operation: str, a: List[float], b: Union[List[float], float]) -> List[float]:
+    """
+    对两列数字逐个元素进行运算，一次调用处理整列数据。
+    
+    参数:
+        operation: 运算类型，可选 add、subtract、multiply、divide、power
+        a: 第一列数字
+        b: 第二列数字（长度必须与a相同），或一个数字（与a中每个元素运算）
+    
+    返回:
+        逐元素运算的结果列表
+    """
+    if operation not in _ELEMENTWISE_OPS:
+        raise ValueError(f"不支持的运算: {operation}，可选: {', '.join(_ELEMENTWISE_OPS)}")
+    if isinstance(b, list) and len(b) != len(a):
+        raise ValueError(f"两列数字长度不同: {len(a)} 和 {len(b)}")
+    if operation == "divide" and (0 in b if isinstance(b, list) else b == 0):
+        raise ValueError("除数不能为0")
+    
+    py_op, np_name = _ELEMENTWISE_OPS[operation]
+    if np is not None:
+        with np.errstate(all="ignore"):
+            result = getattr(np, np_name)(np.asarray(a, dtype=float), np.asarray(b, dtype=float)).tolist()
+        return _finite(result, operation)
+    
+    bs = b if isinstance(b, list) else [b] * len(a)
+    return _python_result(lambda: [float(py_op(x, y)) for x, y in zip(a, bs)], operation)
+
+@tool
+def batch_square_root(numbers: List[float]) -> List[float]:
+    """
+    计算一列数字中每个数的平方根。
+    
+    参数:
+        numbers: 需要计算平方根的数字列表 (每个数都必须大于等于0)
+    
+    返回:
+        每个数字的平方根组成的列表
+    """
+    if any(n < 0 for n in numbers):
+        raise ValueError("不能计算负数的平方根")
+    if np is not None:
+        with np.errstate(all="ignore"):
+            return _finite(np.sqrt(np.asarray(numbers, dtype=float)).tolist(), "square_root")
+    return _python_result(lambda: [math.sqrt(n) for n in numbers], "square_root")
+
+@tool
+def aggregate(operation: str, numbers: List[float]) -> float:
+    """
+    对一列数字做汇总计算。
+    
+    参数:
+        operation: 汇总类型，可选 sum、mean、min、max、product
+        numbers: 数字列表 (不能为空)
+    
+    返回:
+        汇总结果
+    """
+    if operation not in _AGGREGATE_OPS:
+        raise ValueError(f"不支持的汇总类型: {operation}，可选: {', '.join(_AGGREGATE_OPS)}")
+    if not numbers:
+        raise ValueError("数字列表不能为空")
+    
+    py_op, np_name = _AGGREGATE_OPS[operation]
+    if np is not None:
+        with np.errstate(all="ignore"):
+            return _finite([float(getattr(np, np_name)(np.asarray(numbers, dtype=float)))], operation)[0]
+    return _python_result(lambda: [float(py_op(numbers))], operation)[0]
+
 # 字符串处理工具
 @tool
 def concatenate(strings: List[str], separator: str = "") -> str:
@@ -0,0 +1,288 @@
+"""
+MCP 连接管理：心跳检测 + 自动重连 + 断线时重新发出进行中的调用
+
+SSE 传输为每个会话保持一条长连接，服务器重启、代理超时或网络抖动都会让它断开，
+之前只能整轮重试（所有问题从头再来）。MCPConnection 在一个后台任务中持有会话
+（支持 mcp_transport.py 中的 streamable_http / sse / stdio 传输）:
+
+- 心跳: 每隔 heartbeat_interval 秒发送一次 ping，heartbeat_timeout 秒内没有响应即认为连接已断开
+- 重连: 连接断开（心跳失败、调用时发现连接错误或流被关闭）后按指数退避（带随机抖动）重新连接
+- 重发: 连接断开时正在进行的工具调用会在新连接上重新发出，调用方只看到多一些延迟；
+  reconnect_timeout 秒内没有重新连上（或重连次数用完）时调用抛出 ConnectionError，不会一直等待
+
+会话在后台任务中打开和关闭（anyio 要求会话在创建它的任务中退出），调用可以来自任意任务。
+重发要求工具是幂等的（天气查询、搜索这类只读工具都满足）。
+
+用法:
+    async with MCPConnection("http://localhost:8000/mcp/", name="weather", transport="streamable_http") as connection:
+        tools = await connection.load_tools()  # LangChain 工具，调用经过连接管理
+        result = await connection.call_tool("get_alerts", {"state": "CA"})
+"""
+import time
+import random
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+import anyio
+import httpx
+from mcp_transport import open_streams
+
+# streamable HTTP 客户端收到 404（服务器重启后不认识原来的会话 ID）时返回的错误码
+# （mcp.client.streamable_http 中写的是 32600，不是 JSON-RPC 的 -32600）
+SESSION_TERMINATED = 32600
+
+@dataclass
+class _Generation:
+    """一次成功建立的连接（会话），lost 被设置后不再使用"""
+    session: Any
+    number: int
+    lost: asyncio.Event = field(default_factory=asyncio.Event)
+
+def is_connection_error(error: BaseException) -> bool:
+    """判断异常是否表示连接已断开（而不是工具本身出错），包括 streamable HTTP 的会话已失效"""
+    from mcp.shared.exceptions import McpError
+    from mcp.types import CONNECTION_CLOSED
+
+    if isinstance(error, BaseExceptionGroup):
+        return any(is_connection_error(e) for e in error.exceptions)
+    if isinstance(error, McpError):
+        return (error.error.code == CONNECTION_CLOSED
+                or (error.error.code == SESSION_TERMINATED and error.error.message == "Session terminated"))
+    return isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream,
+                              httpx.TransportError, ConnectionError))
+
+def _root_error(error: BaseException) -> BaseException:
+    """取出异常组（anyio 任务组抛出）中的第一个异常"""
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return error
+
+class MCPConnection:
+    """
+    带心跳和自动重连的 MCP 连接
+
+    参数见 __init__；start()/close() 或 async with 管理后台任务，stats 记录连接、重连、心跳和重发次数。
+    """
+
+    def __init__(self, url: Optional[str] = None, name: Optional[str] = None, transport: str = "sse",
+                 command: Optional[Sequence[str]] = None, heartbeat_interval: float = 10.0,
+                 heartbeat_timeout: float = 5.0, connect_timeout: float = 10.0, call_timeout: float = 120.0,
+                 backoff_base: float = 0.5, backoff_max: float = 10.0, max_reconnects: Optional[int] = 10,
+                 max_attempts: int = 3, reconnect_timeout: float = 30.0):
+        """
+        参数:
+            url: 端点地址，例如 "http://localhost:8000/sse"（stdio 时不需要）
+            name: 服务器名称，用于输出，默认为 url 或命令行
+            transport: "sse" / "streamable_http" / "stdio"
+            command: stdio 时启动服务器的命令行（重连时重新启动服务器进程）
+            heartbeat_interval: 心跳间隔（秒）
+            heartbeat_timeout: 心跳响应的超时（秒）
+            connect_timeout: 建立连接并完成初始化的超时（秒）
+            call_timeout: 单次工具调用的超时（秒），超时也按连接断开处理
+            backoff_base: 第一次重连前的等待（秒），之后每次翻倍
+            backoff_max: 重连等待的上限（秒）
+            max_reconnects: 连续重连失败的最大次数，None 表示一直重连；首次连接最多尝试 max_attempts 次
+            max_attempts: 每次工具调用最多发出的次数（包括断线后的重发）
+            reconnect_timeout: 调用等待可用连接的最长时间（秒），超时抛出 ConnectionError
+        """
+        if transport == "stdio":
+            self.config = {"command": command[0], "args": list(command[1:]), "transport": "stdio"}
+        else:
+            self.config = {"url": url, "transport": transport}
+        self.name = name or url or " ".join(command)
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.connect_timeout = connect_timeout
+        self.call_timeout = call_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_reconnects = max_reconnects
+        self.max_attempts = max_attempts
+        self.reconnect_timeout = reconnect_timeout
+        self.stats: Dict[str, int] = {"connects": 0, "reconnects": 0, "heartbeats": 0, "heartbeat_failures": 0,
+                                      "reissued_calls": 0}
+        self._generation: Optional[_Generation] = None
+        self._connected = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None  # 放弃重连时的最后一个错误
+        self._owner: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], name: Optional[str] = None, **kwargs: Any) -> "MCPConnection":
+        """按 MultiServerMCPClient 格式的连接配置（见 mcp_transport.client_connection）创建连接"""
+        command = [config["command"], *config.get("args", [])] if "command" in config else None
+        return cls(config.get("url"), name, config.get("transport", "sse"), command, **kwargs)
+
+    async def __aenter__(self) -> "MCPConnection":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self) -> "MCPConnection":
+        """启动后台任务并等待首次连接成功，连接失败时抛出最后一个错误"""
+        self._owner = asyncio.create_task(self._run())
+        await self._current()
+        return self
+
+    async def close(self) -> None:
+        """关闭连接并等待后台任务退出"""
+        self._closing.set()
+        if self._generation is not None:
+            self._mark_lost(self._generation)
+        if self._owner is not None:
+            await self._owner
+
+    def _mark_lost(self, generation: _Generation) -> None:
+        """标记连接已断开：新的调用等待重连，后台任务关闭这个会话"""
+        generation.lost.set()
+        if self._generation is generation:
+            self._connected.clear()
+
+    def _backoff(self, failures: int) -> float:
+        # 指数退避，乘以 0.5~1 的随机系数，避免多个客户端同时重连
+        return min(self.backoff_max, self.backoff_base * 2 ** (failures - 1)) * random.uniform(0.5, 1.0)
+
+    async def _run(self) -> None:
+        """后台任务：连接、心跳检测，断开后退避重连，直到 close() 或重连次数用完"""
+        from mcp import ClientSession
+
+        failures = 0
+        while not self._closing.is_set():
+            generation: Optional[_Generation] = None
+            try:
+                async with open_streams(self.config, self.connect_timeout) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await asyncio.wait_for(session.initialize(), self.connect_timeout)
+                        generation = _Generation(session, self.stats["connects"] + 1)
+                        self.stats["connects"] += 1
+                        if generation.number > 1:
+                            self.stats["reconnects"] += 1
+                            print(f"✅ 已重新连接到 {self.name}（第 {generation.number - 1} 次重连）")
+                        failures = 0
+                        self._generation = generation
+                        self._connected.set()
+                        await self._heartbeat(generation)
+            except Exception as e:
+                self._error = _root_error(e)
+            finally:
+                self._connected.clear()
+                if generation is not None:
+                    generation.lost.set()
+            if self._closing.is_set():
+                break
+
+            failures += 1
+            limit = self.max_reconnects if self.stats["connects"] else self.max_attempts
+            if limit is not None and failures > limit:
+                print(f"❌ 无法连接到 {self.name}，放弃重连: {self._error}")
+                break
+            delay = self._backoff(failures)
+            if self.stats["connects"]:
+                print(f"🔄 与 {self.name} 的连接已断开，{delay:.1f} 秒后重连（第 {failures} 次）")
+            else:
+                print(f"⚠️ 连接 {self.name} 失败: {self._error}，{delay:.1f} 秒后重试（第 {failures} 次）")
+            try:
+                await asyncio.wait_for(self._closing.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        self._generation = None
+        self._closing.set()  # 唤醒等待连接的调用
+        self._connected.set()
+
+    async def _heartbeat(self, generation: _Generation) -> None:
+        """定期发送 ping，直到连接被标记为断开或心跳失败"""
+        while True:
+            try:
+                await asyncio.wait_for(generation.lost.wait(), self.heartbeat_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(generation.session.send_ping(), self.heartbeat_timeout)
+                self.stats["heartbeats"] += 1
+            except Exception as e:
+                self.stats["heartbeat_failures"] += 1
+                self._error = e
+                print(f"💔 {self.name} 心跳失败: {type(e).__name__}")
+                self._mark_lost(generation)
+                return
+
+    async def _current(self, timeout: Optional[float] = None) -> _Generation:
+        """等待并返回当前可用的连接，timeout 秒内没有可用的连接时抛出 ConnectionError"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self._connected.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"{timeout:.0f} 秒内没有重新连接到 {self.name}") from self._error
+            generation = self._generation
+            if generation is not None and not generation.lost.is_set():
+                return generation
+            if self._closing.is_set():
+                raise ConnectionError(f"与 {self.name} 的连接已关闭") from self._error
+
+    async def _request(self, method: str, *args: Any) -> Any:
+        """在当前会话上发出请求，连接断开时在新连接上重新发出"""
+        error: Optional[BaseException] = None
+        for attempt in range(self.max_attempts):
+            generation = await self._current(self.reconnect_timeout)
+            call = asyncio.ensure_future(getattr(generation.session, method)(*args))
+            lost = asyncio.ensure_future(generation.lost.wait())
+            try:
+                done, _ = await asyncio.wait({call, lost}, timeout=self.call_timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                lost.cancel()
+                if not call.done():
+                    call.cancel()
+            if call in done:
+                if call.exception() is None:
+                    return call.result()
+                error = call.exception()
+                if not is_connection_error(error):
+                    raise error
+            else:
+                error = error or TimeoutError(f"{method} 在 {self.call_timeout} 秒内没有响应")
+            self._mark_lost(generation)  # 让后台任务重连
+            if attempt < self.max_attempts - 1:
+                self.stats["reissued_calls"] += 1
+                print(f"🔁 {self.name} 连接断开，在新连接上重新发出 {method}" + (f" {args[0]}" if args and args[0] else ""))
+        raise ConnectionError(f"与 {self.name} 的连接多次断开") from error
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """调用工具（与 ClientSession.call_tool 相同），连接断开时自动重发"""
+        return await self._request("call_tool", name, arguments)
+
+    async def list_tools(self) -> List[Any]:
+        """列出服务器的全部工具（mcp.types.Tool）"""
+        tools: List[Any] = []
+        cursor = None
+        while True:
+            page = await self._request("list_tools", cursor)
+            tools.extend(page.tools)
+            cursor = page.nextCursor
+            if not cursor:
+                return tools
+
+    async def load_tools(self) -> List[Any]:
+        """
+        加载服务器的工具，转换为 LangChain 工具
+
+        返回:
+            工具列表，调用时经过本连接（断线重连和重发对智能体透明）
+        """
+        from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+
+        return [convert_mcp_tool_to_langchain_tool(self, tool) for tool in await self.list_tools()]
+
+    def describe(self) -> str:
+        state = "已连接" if self.connected and not self._closing.is_set() else "未连接"
+        return (f"{self.name}: {state}，连接 {self.stats['connects']} 次（重连 {self.stats['reconnects']}），"
+                f"心跳 {self.stats['heartbeats']}（失败 {self.stats['heartbeat_failures']}），"
+                f"重发调用 {self.stats['reissued_calls']}")
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Set
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp_connection import is_connection_error
+
+logger = logging.getLogger(__name__)
+
+class PooledServer:
+    """
+    池中的一个 stdio MCP 服务器进程
+
+    子进程和 ClientSession 都在一个专属的后台任务里打开和关闭，
+    因此可以在任意任务中租用、回收，不受 anyio 取消作用域的限制。
+    """
+
+    def __init__(self, params: StdioServerParameters):
+        self.params = params
+        self.session: Optional[ClientSession] = None
+        self.requests = 0
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        """进程是否仍在运行且会话可用"""
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self, timeout: float) -> None:
+        """
+        启动进程并完成 initialize 握手
+
+        参数:
+            timeout: 等待服务器就绪的最长秒数
+        """
+        self._task = asyncio.create_task(self._run())
+        ready = asyncio.create_task(self._ready.wait())
+        await asyncio.wait({self._task, ready}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not self._ready.is_set():
+            ready.cancel()
+            await self.close()
+            raise RuntimeError(f"服务器 {self.params.command} 启动失败: {self.error or '启动超时'}")
+
+    async def _run(self) -> None:
+        try:
+            async with stdio_client(self.params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+
+    async def ping(self, timeout: float) -> bool:
+        """发送 ping 检查服务器是否健康"""
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        """关闭会话并结束子进程"""
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except Exception:
+            self._task.cancel()
+
+class PooledSession:
+    """
+    基于服务器池的会话代理
+
+    实现了 ClientSession 中加载和调用工具所需的接口（list_tools / call_tool），
+    每次请求都从池中租用一个已初始化的服务器，因此可以直接传给
+    langchain_mcp_adapters.tools.load_mcp_tools 使用。
+    """
+
+    def __init__(self, pool: "StdioServerPool"):
+        self.pool = pool
+
+    async def list_tools(self, *args: Any, **kwargs: Any) -> Any:
+        async with self.pool.lease() as session:
+            return await session.list_tools(*args, **kwargs)
+
+    async def call_tool(self, *args: Any, **kwargs: Any) -> Any:
+        async with self.pool.lease() as session:
+            return await session.call_tool(*args, **kwargs)
+
+class StdioServerPool:
+    """
+    预先启动的 stdio MCP 服务器池
+
+    启动时并发拉起 size 个已完成初始化的服务器进程（例如 npx -y tavily-mcp），
+    调用方通过 lease() 租用一个空闲服务器，用完自动归还。服务器在处理了
+    max_requests 个请求、进程退出或连接断开、健康检查失败后会被回收并在后台补充新进程；
+    工具本身出错或调用被取消时进程照常归还。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: Dict[str, Any],
+        size: int = 2,
+        max_requests: int = 100,
+        health_check_interval: float = 30.0,
+        startup_timeout: float = 60.0,
+        lease_timeout: float = 60.0,
+    ):
+        """
+        参数:
+            name: 服务器名称（用于日志）
+            config: stdio 服务器配置，格式与 get_mcp_config() 中的一致
+            size: 池中保持的服务器进程数
+            max_requests: 每个进程处理多少个请求后回收
+            health_check_interval: 空闲进程健康检查的间隔秒数
+            startup_timeout: 单个进程启动并完成初始化的最长秒数
+            lease_timeout: 租用服务器时最长等待秒数
+        """
+        self.name = name
+        self.params = StdioServerParameters(
+            command=config["command"],
+            args=config.get("args", []),
+            env=config.get("env"),
+            cwd=config.get("cwd"),
+        )
+        self.size = size
+        self.max_requests = max_requests
+        self.health_check_interval = health_check_interval
+        self.startup_timeout = startup_timeout
+        self.lease_timeout = lease_timeout
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._servers: Set[PooledServer] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._health_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(self) -> "StdioServerPool":
+        """并发启动所有服务器进程，并开始健康检查"""
+        results = await asyncio.gather(*(self._spawn() for _ in range(self.size)), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if len(failures) == len(results):
+            raise RuntimeError(f"服务器池 {self.name} 没有可用的进程: {failures[0]}")
+        logger.info(f"✓ 服务器池 {self.name} 已就绪: {len(results) - len(failures)}/{self.size} 个进程")
+
+        self._health_task = asyncio.create_task(self._health_loop())
+        return self
+
+    async def _spawn(self) -> None:
+        server = PooledServer(self.params)
+        self._servers.add(server)
+        try:
+            await server.start(self.startup_timeout)
+        except Exception as e:
+            self._servers.discard(server)
+            logger.error(f"❌ 服务器池 {self.name} 启动进程失败: {e}")
+            raise
+        self._idle.put_nowait(server)
+
+    def _recycle(self, server: PooledServer) -> None:
+        """关闭一个进程，并在后台启动替代进程"""
+        self._servers.discard(server)
+        self._spawn_background(replacing=server)
+
+    def _spawn_background(self, replacing: Optional[PooledServer] = None) -> None:
+        async def replace():
+            if replacing is not None:
+                await replacing.close()
+            if not self._closed:
+                try:
+                    await self._spawn()
+                except Exception:
+                    pass  # _spawn 已记录日志，健康检查时会再次补齐
+
+        task = asyncio.create_task(replace())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _acquire(self) -> PooledServer:
+        while True:
+            server = await asyncio.wait_for(self._idle.get(), timeout=self.lease_timeout)
+            if server.alive:
+                return server
+            logger.warning(f"⚠️ 服务器池 {self.name} 中的进程已退出，正在替换")
+            self._recycle(server)
+
+    def _release(self, server: PooledServer, failed: bool) -> None:
+        server.requests += 1
+        if failed or not server.alive or server.requests >= self.max_requests:
+            self._recycle(server)
+        else:
+            self._idle.put_nowait(server)
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        租用一个已初始化的服务器会话
+
+        用法:
+            async with pool.lease() as session:
+                result = await session.call_tool("name", {...})
+        """
+        if self._closed:
+            raise RuntimeError(f"服务器池 {self.name} 已关闭")
+        try:
+            server = await self._acquire()
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"服务器池 {self.name} 在 {self.lease_timeout} 秒内没有空闲进程")
+
+        failed = False
+        try:
+            yield server.session
+        except BaseException as e:
+            # 只有连接断开才回收进程，工具返回的 McpError、超时和取消不影响进程本身
+            failed = is_connection_error(e)
+            raise
+        finally:
+            self._release(server, failed)
+
+    def session(self) -> PooledSession:
+        """返回基于该池的会话代理，可传给 load_mcp_tools"""
+        return PooledSession(self)
+
+    async def _health_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+
+            # 检查所有空闲进程，不健康的回收
+            idle = []
+            while not self._idle.empty():
+                idle.append(self._idle.get_nowait())
+            healthy = await asyncio.gather(*(s.ping(self.startup_timeout) for s in idle))
+            for server, ok in zip(idle, healthy):
+                if ok:
+                    self._idle.put_nowait(server)
+                else:
+                    logger.warning(f"⚠️ 服务器池 {self.name} 健康检查失败，回收进程")
+                    self._recycle(server)
+
+            # 之前替换失败导致进程数不足时补齐
+            if not self._background:
+                for _ in range(self.size - len(self._servers)):
+                    self._spawn_background()
+
+    async def close(self) -> None:
+        """关闭池中所有进程"""
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*(s.close() for s in list(self._servers)), return_exceptions=True)
+        self._servers.clear()
+        logger.info(f"🔌 服务器池 {self.name} 已关闭")
+
+    async def __aenter__(self) -> "StdioServerPool":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
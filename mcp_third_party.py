@@ -2,32 +2,38 @@
 import os
 import asyncio
 from dotenv import load_dotenv
-from mcp.client.sse import sse_client
-from mcp import ClientSession
-from langchain_mcp_adapters.tools import load_mcp_tools
-from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import AIMessage
-from typing import List, Dict, Any, Optional
-from langchain_core.tools import BaseTool
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+
+# MCP客户端、langgraph、langchain_openai 在用到时才导入，
+# 其他模块导入本模块时不会加载这些依赖
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
 
 load_dotenv()
 
-zhipu_api_key = os.getenv("ZHIPU_API_KEY")
-if not zhipu_api_key:
-    raise ValueError("请在.env文件中设置ZHIPU_API_KEY")
+def get_zhipu_web_search_config() -> Dict[str, Any]:
+    """
+    获取智谱Web搜索配置
+
+    API密钥在调用时才检查，未设置 ZHIPU_API_KEY 时导入本模块不会报错。
 
-# 智谱Web搜索配置
-zhipu_web_search_sse = {
-  "mcpServers": {
-    "zhipu-web-search-sse": {
-      "url": f"https://open.bigmodel.cn/api/mcp/web_search/sse?Authorization={zhipu_api_key}"
+    返回:
+        智谱Web搜索的MCP服务器配置
+    """
+    zhipu_api_key = os.getenv("ZHIPU_API_KEY")
+    if not zhipu_api_key:
+        raise ValueError("请在.env文件中设置ZHIPU_API_KEY")
+
+    return {
+      "mcpServers": {
+        "zhipu-web-search-sse": {
+          "url": f"https://open.bigmodel.cn/api/mcp/web_search/sse?Authorization={zhipu_api_key}"
+        }
+      }
     }
-  }
-}
 
 # 将MCP服务器配置转换为LangGraph工具列表的函数
-async def get_tools_from_mcp_server(server_config: Dict[str, Any], server_name: Optional[str] = None) -> List[BaseTool]:
+async def get_tools_from_mcp_server(server_config: Dict[str, Any], server_name: Optional[str] = None) -> List["BaseTool"]:
     """
     从MCP服务器配置中获取LangGraph工具列表
     
@@ -50,6 +56,10 @@ async def get_tools_from_mcp_server(server_config: Dict[str, Any], server_name:
     server_url = server_config["mcpServers"][server_name]["url"]
     print(f"连接到MCP服务器 '{server_name}': {server_url}")
     
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+    from langchain_mcp_adapters.tools import load_mcp_tools
+
     # 连接到MCP服务器并加载工具
     try:
         async with sse_client(server_url) as (read, write):
@@ -69,17 +79,21 @@ async def get_tools_from_mcp_server(server_config: Dict[str, Any], server_name:
         return []
 
 # 简化版函数，专门用于获取智谱Web搜索工具
-async def get_zhipu_web_search_tools() -> List[BaseTool]:
+async def get_zhipu_web_search_tools() -> List["BaseTool"]:
     """
     获取智谱Web搜索MCP服务器提供的工具列表
     
     返回:
         智谱Web搜索工具列表
     """
-    return await get_tools_from_mcp_server(zhipu_web_search_sse, "zhipu-web-search-sse")
+    return await get_tools_from_mcp_server(get_zhipu_web_search_config(), "zhipu-web-search-sse")
 
 # 测试函数
 async def test_zhipu_tools():
+    from langgraph.prebuilt import create_react_agent
+    from model_factory import get_routed_model
+    from langchain_core.messages import AIMessage
+
     # 获取智谱Web搜索工具
     tools = await get_zhipu_web_search_tools()
     
@@ -93,12 +107,7 @@ async def test_zhipu_tools():
         print(f"  - {tool.name}: {tool.description}")
     
     # 创建模型
-    model = ChatOpenAI(
-        openai_api_base="https://api.moonshot.cn/v1",
-        openai_api_key=os.getenv("MOONSHOT_API_KEY"),
-        model_name="moonshot-v1-32k",
-        temperature=0.7
-    )
+    model = get_routed_model("moonshot-v1-32k", temperature=0.7)
     
     # 创建agent
     agent = create_react_agent(model, tools)
@@ -128,6 +137,9 @@ async def test_zhipu_tools():
 
 # 如何在其他代码中使用这些函数的示例
 async def example_usage():
+    from langgraph.prebuilt import create_react_agent
+    from model_factory import get_routed_model
+
     # 获取智谱Web搜索工具
     zhipu_tools = await get_zhipu_web_search_tools()
     
@@ -136,11 +148,7 @@ async def example_usage():
     combined_tools = zhipu_tools + [add, multiply]
     
     # 使用组合工具创建Agent
-    model = ChatOpenAI(
-        openai_api_base="https://api.moonshot.cn/v1",
-        openai_api_key=os.getenv("MOONSHOT_API_KEY"),
-        model_name="moonshot-v1-32k"
-    )
+    model = get_routed_model("moonshot-v1-32k")
     agent = create_react_agent(model, combined_tools)
     
     # 现在Agent可以同时处理Web搜索和数学计算
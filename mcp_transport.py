@@ -0,0 +1,140 @@
+"""
+MCP 传输方式：服务器的启动方式和客户端的连接配置
+
+FastMCP 服务器（weather.py、benchmarks/echo_mcp_server.py）启动时用 --transport 选择:
+- "http"（默认）: 同一端口同时提供 streamable HTTP（/mcp）和 SSE（/sse），新旧客户端都可以连接
+- "streamable-http": 只提供 /mcp，每个请求是一次 POST，响应在这次请求中直接以 JSON 返回，
+  不需要为每个会话保持一条接收响应的 SSE 长连接
+- "sse": 只提供 /sse（每个会话一条 SSE 长连接接收响应，请求另外 POST 到 /messages/）
+- "stdio": 由客户端作为子进程启动，通过标准输入输出通信，没有 HTTP 开销，但每个会话一个进程，
+  只能在客户端所在的机器上运行
+
+客户端默认使用开销最低的 streamable HTTP（见 DEFAULT_CLIENT_TRANSPORT；各传输方式每次调用的延迟和
+每个会话的连接数可以用 benchmarks/bench_mcp_transport.py 对比）。
+"""
+import os
+import argparse
+from typing import Any, Dict, Optional, Sequence
+
+SERVER_TRANSPORTS = ("http", "streamable-http", "sse", "stdio")
+
+# 客户端传输方式（langchain-mcp-adapters 的写法）-> 服务器上的端点路径
+CLIENT_PATHS: Dict[str, str] = {
+    "streamable_http": "/mcp/",  # 以 / 结尾：FastMCP 把 /mcp 挂载为子应用，不带 / 时每个请求会多一次重定向
+    "sse": "/sse",
+}
+DEFAULT_CLIENT_TRANSPORT = "streamable_http"
+
+def parse_server_args(description: str, default_transport: str = "http") -> argparse.Namespace:
+    """
+    解析服务器的命令行参数（--transport / --host / --port）
+
+    参数:
+        description: 命令行帮助中的说明
+        default_transport: 默认的传输方式，可以用 MCP_TRANSPORT 环境变量覆盖
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--transport", choices=SERVER_TRANSPORTS,
+                        default=os.getenv("MCP_TRANSPORT", default_transport),
+                        help="传输方式，http 表示同时提供 streamable HTTP（/mcp）和 SSE（/sse）")
+    parser.add_argument("--host", help="监听地址，默认为 127.0.0.1")
+    parser.add_argument("--port", type=int, help="监听端口，默认为 8000")
+    return parser.parse_args()
+
+def http_app(mcp: Any) -> Any:
+    """同时提供 streamable HTTP 和 SSE 端点的 Starlette 应用"""
+    from starlette.applications import Starlette
+
+    streamable = mcp.streamable_http_app()
+    sse = mcp.sse_app()
+    return Starlette(
+        debug=mcp.settings.debug,
+        routes=streamable.routes + sse.routes,
+        middleware=streamable.user_middleware,
+        lifespan=lambda app: mcp.session_manager.run(),
+    )
+
+def run_server(mcp: Any, transport: str = "http", host: Optional[str] = None, port: Optional[int] = None,
+               json_response: bool = True) -> None:
+    """
+    以指定的传输方式运行 FastMCP 服务器（阻塞直到服务器退出）
+
+    参数:
+        mcp: FastMCP 实例
+        transport: SERVER_TRANSPORTS 之一
+        host: 监听地址，None 表示使用 mcp.settings 中的值
+        port: 监听端口，None 表示使用 mcp.settings 中的值
+        json_response: streamable HTTP 的响应直接以 JSON 返回（不使用 SSE 帧，每次调用约快 1ms），
+            代价是调用过程中不能向客户端推送进度通知
+    """
+    mcp.settings.json_response = json_response
+    if host:
+        mcp.settings.host = host
+    if port:
+        mcp.settings.port = port
+    if transport != "http":
+        mcp.run(transport=transport)
+        return
+
+    import anyio
+    import uvicorn
+
+    config = uvicorn.Config(http_app(mcp), host=mcp.settings.host, port=mcp.settings.port,
+                            log_level=mcp.settings.log_level.lower())
+    anyio.run(uvicorn.Server(config).serve)
+
+def client_connection(transport: Optional[str] = None, base_url: str = "http://localhost:8000",
+                      command: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    客户端的连接配置（MultiServerMCPClient 的格式）
+
+    参数:
+        transport: "streamable_http" / "sse" / "stdio"，None 表示 DEFAULT_CLIENT_TRANSPORT
+        base_url: HTTP 服务器地址
+        command: stdio 时启动服务器的命令行
+
+    返回:
+        {"url": ..., "transport": ...} 或 {"command": ..., "args": [...], "transport": "stdio"}
+    """
+    transport = (transport or DEFAULT_CLIENT_TRANSPORT).replace("-", "_")
+    if transport == "stdio":
+        if not command:
+            raise ValueError("stdio 传输需要启动服务器的命令行")
+        return {"command": command[0], "args": list(command[1:]), "transport": "stdio"}
+    if transport not in CLIENT_PATHS:
+        raise ValueError(f"未知的传输方式: {transport}")
+    return {"url": base_url.rstrip("/") + CLIENT_PATHS[transport], "transport": transport}
+
+def open_streams(config: Dict[str, Any], timeout: float = 10.0) -> Any:
+    """
+    按连接配置打开 MCP 读写流（异步上下文管理器，产出 (read, write)）
+
+    参数:
+        config: client_connection 返回的连接配置
+        timeout: HTTP 连接超时（秒）
+    """
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def streams():
+        transport = config["transport"]
+        if transport == "stdio":
+            from mcp import StdioServerParameters
+            from mcp.client.stdio import stdio_client
+
+            params = StdioServerParameters(command=config["command"], args=config.get("args", []),
+                                           env=config.get("env"))
+            async with stdio_client(params) as (read, write):
+                yield read, write
+        elif transport == "streamable_http":
+            from mcp.client.streamable_http import streamablehttp_client
+
+            async with streamablehttp_client(config["url"], timeout=timeout) as (read, write, _):
+                yield read, write
+        else:
+            from mcp.client.sse import sse_client
+
+            async with sse_client(config["url"], timeout=timeout) as (read, write):
+                yield read, write
+
+    return streams()
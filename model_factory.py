@@ -0,0 +1,296 @@
+import os
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import httpx
+from langchain_openai import ChatOpenAI
+from rate_limiter import get_rate_limiter
+
+# LLM 提供方配置：base_url 为 OpenAI 兼容接口地址，api_key_env 为读取密钥的环境变量
+PROVIDERS: Dict[str, Dict[str, str]] = {
+    "moonshot": {
+        "base_url": "https://api.moonshot.cn/v1",
+        "api_key_env": "MOONSHOT_API_KEY",
+    },
+    "zhipu": {
+        "base_url": "https://open.bigmodel.cn/api/paas/v4/",
+        "api_key_env": "ZHIPU_API_KEY",
+    },
+}
+
+# 按模型名前缀注册的模型工厂 factory(model_name, **kwargs)，优先于 PROVIDERS，
+# 例如测试和基准测试注册的离线模拟模型（见 fake_llm.register_fake_models）
+_model_factories: Dict[str, Callable[..., Any]] = {}
+
+# 备用模型（"提供方:模型"，省略提供方时与主模型相同），主模型出错或慢于 p95 时使用（见 model_router.py）
+# 默认不使用：切换到其他提供方会改变回答所用的模型，需要显式开启，
+# 例如 LLM_FALLBACKS="zhipu:glm-4-flash,moonshot:moonshot-v1-8k" 或 AgentConfig.fallback_llms
+DEFAULT_FALLBACKS: List[str] = []
+
+# 默认连接配置，可以通过环境变量覆盖，例如 HTTP_MOONSHOT_MAX_CONNECTIONS=50、HTTP_MOONSHOT_HTTP2=0
+DEFAULT_HTTP_CONFIG: Dict[str, float] = {
+    "connect_timeout": 5.0,  # 建立连接（含TLS握手）的超时秒数
+    "read_timeout": 120.0,  # 等待响应数据的超时秒数，流式输出时为两个数据块之间的间隔
+    "write_timeout": 10.0,
+    "pool_timeout": 10.0,  # 连接池满时等待空闲连接的秒数
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60.0,  # 空闲连接保留的秒数
+    "http2": 1,  # 启用 HTTP/2（h2 由 httpx[http2] 依赖提供，没有安装时退回 HTTP/1.1 长连接）
+    "max_retries": 2,  # OpenAI SDK 的重试次数
+}
+
+def _env_key(provider: str, field: str) -> str:
+    return f"HTTP_{provider.upper().replace('-', '_')}_{field.upper()}"
+
+def get_http_config(provider: str) -> Dict[str, float]:
+    """
+    获取指定提供方的连接配置（默认值加上环境变量覆盖）
+
+    参数:
+        provider: 提供方名称，例如 "moonshot"
+
+    返回:
+        连接配置字典，字段见 DEFAULT_HTTP_CONFIG
+    """
+    config = dict(DEFAULT_HTTP_CONFIG)
+    for field in config:
+        value = os.getenv(_env_key(provider, field))
+        if value:
+            config[field] = float(value)
+    return config
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _client_kwargs(config: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "timeout": httpx.Timeout(
+            connect=config["connect_timeout"],
+            read=config["read_timeout"],
+            write=config["write_timeout"],
+            pool=config["pool_timeout"],
+        ),
+        "limits": httpx.Limits(
+            max_connections=int(config["max_connections"]),
+            max_keepalive_connections=int(config["max_keepalive_connections"]),
+            keepalive_expiry=config["keepalive_expiry"],
+        ),
+        "http2": bool(config["http2"]) and _http2_available(),
+    }
+
+# 进程内共享的HTTP客户端和模型，同一个提供方的所有调用复用同一个连接池
+_sync_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[str, Tuple[Optional[asyncio.AbstractEventLoop], httpx.AsyncClient]] = {}
+_models: Dict[Tuple, ChatOpenAI] = {}
+_lock = threading.Lock()
+
+def register_model_factory(prefix: str, factory: Callable[..., Any]) -> None:
+    """
+    注册模型工厂：名称以 prefix 开头的模型由 factory(model_name, **kwargs) 创建，不访问提供方接口
+
+    多进程工作池会把已注册的工厂传给工作进程，因此 factory 需要是模块级函数（可以被 pickle）。
+
+    参数:
+        prefix: 模型名前缀，例如 "fake"
+        factory: 模型工厂
+    """
+    _model_factories[prefix] = factory
+
+def registered_model_factories() -> Dict[str, Callable[..., Any]]:
+    """返回已注册的模型工厂（前缀 -> 工厂）"""
+    return dict(_model_factories)
+
+def _model_factory(model_name: str) -> Optional[Callable[..., Any]]:
+    for prefix, factory in _model_factories.items():
+        if model_name.startswith(prefix):
+            return factory
+    return None
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def get_http_client(provider: str) -> httpx.Client:
+    """获取（或创建）指定提供方共享的同步HTTP客户端"""
+    with _lock:
+        if provider not in _sync_clients:
+            _sync_clients[provider] = httpx.Client(**_client_kwargs(get_http_config(provider)))
+        return _sync_clients[provider]
+
+def get_async_http_client(provider: str) -> httpx.AsyncClient:
+    """
+    获取（或创建）指定提供方共享的异步HTTP客户端
+
+    异步连接绑定创建它们的事件循环；在新的事件循环中（例如再次调用 asyncio.run）
+    获取时会创建新的客户端，旧客户端随旧的事件循环一起失效。
+    """
+    loop = _running_loop()
+    with _lock:
+        entry = _async_clients.get(provider)
+        if entry is not None:
+            owner, client = entry
+            if owner is None:
+                # 在事件循环外创建的客户端，绑定到第一个使用它的事件循环
+                _async_clients[provider] = (loop, client)
+                return client
+            if not owner.is_closed() and (loop is None or loop is owner):
+                return client
+        client = httpx.AsyncClient(**_client_kwargs(get_http_config(provider)))
+        _async_clients[provider] = (loop, client)
+        # 换了事件循环后，缓存的模型持有的是旧客户端，需要重新创建
+        for key in [k for k in _models if k[0] == provider]:
+            del _models[key]
+        return client
+
+def get_chat_model(
+    model_name: str = "moonshot-v1-32k",
+    provider: str = "moonshot",
+    temperature: float = 0.7,
+    rate_limited: bool = True,
+    **kwargs: Any,
+) -> ChatOpenAI:
+    """
+    获取（或创建）共享的聊天模型
+
+    同一提供方的所有模型共用一个连接池（长连接，安装 h2 时使用 HTTP/2）和一个限流器，
+    相同参数的模型只创建一次，因此进程内的所有智能体运行都会复用到 api.moonshot.cn 的连接。
+
+    参数:
+        model_name: 模型名称，例如 "moonshot-v1-32k"、"kimi-latest"；
+            匹配 register_model_factory 注册的前缀时由对应的工厂创建
+        provider: 提供方名称，见 PROVIDERS
+        temperature: 采样温度
+        rate_limited: 是否使用该提供方共享的限流器（见 rate_limiter.py）
+        kwargs: 传给 ChatOpenAI 的其他参数
+
+    返回:
+        ChatOpenAI 实例
+    """
+    factory = _model_factory(model_name)
+    if factory is not None:
+        return factory(model_name, **kwargs)
+
+    if provider not in PROVIDERS:
+        raise ValueError(f"未知的模型提供方: {provider}")
+
+    key = (provider, model_name, temperature, rate_limited, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        key = None  # 参数不可哈希（例如 model_kwargs 字典）时不缓存模型
+
+    async_client = get_async_http_client(provider)
+    with _lock:
+        if key in _models:
+            return _models[key]
+
+    settings = PROVIDERS[provider]
+    config = get_http_config(provider)
+    model = ChatOpenAI(
+        openai_api_base=settings["base_url"],
+        openai_api_key=os.getenv(settings["api_key_env"]),
+        model_name=model_name,
+        temperature=temperature,
+        rate_limiter=get_rate_limiter(provider) if rate_limited else None,
+        max_retries=int(config["max_retries"]),
+        http_client=get_http_client(provider),
+        http_async_client=async_client,
+        **kwargs,
+    )
+    if key is None:
+        return model
+    with _lock:
+        return _models.setdefault(key, model)
+
+def parse_fallbacks(model_name: str, provider: str = "moonshot",
+                    fallbacks: Optional[Sequence[str]] = None) -> List[Tuple[str, str]]:
+    """
+    解析备用模型列表，去掉与主模型相同的和没有设置API密钥的提供方
+
+    参数:
+        model_name: 主模型名称
+        provider: 主模型的提供方
+        fallbacks: 备用模型列表，None 时读取 LLM_FALLBACKS 环境变量或使用 DEFAULT_FALLBACKS
+
+    返回:
+        [(提供方, 模型名称), ...]；注册了工厂的模型（见 register_model_factory）只与同类模型组合
+    """
+    if fallbacks is None:
+        env = os.getenv("LLM_FALLBACKS")
+        fallbacks = DEFAULT_FALLBACKS if env is None else [item.strip() for item in env.split(",") if item.strip()]
+    result = []
+    for item in fallbacks:
+        fallback_provider, _, fallback_model = item.rpartition(":")
+        fallback_provider = fallback_provider or provider
+        if (fallback_provider, fallback_model) == (provider, model_name) or \
+                (fallback_provider, fallback_model) in result:
+            continue
+        registered = _model_factory(model_name) is not None, _model_factory(fallback_model) is not None
+        if any(registered):
+            if all(registered):
+                result.append((fallback_provider, fallback_model))
+            continue
+        if fallback_provider not in PROVIDERS:
+            raise ValueError(f"未知的模型提供方: {fallback_provider}")
+        if os.getenv(PROVIDERS[fallback_provider]["api_key_env"]):
+            result.append((fallback_provider, fallback_model))
+    return result
+
+def get_routed_model(
+    model_name: str = "moonshot-v1-32k",
+    provider: str = "moonshot",
+    temperature: float = 0.7,
+    fallbacks: Optional[Sequence[str]] = None,
+    hedge: bool = True,
+    **kwargs: Any,
+) -> Any:
+    """
+    获取带故障切换和对冲请求的聊天模型（见 model_router.ModelRouter）
+
+    每个候选模型都通过 get_chat_model 获取，共用各自提供方的连接池和限流器。
+    没有可用的备用模型时直接返回主模型。
+
+    参数:
+        model_name: 主模型名称
+        provider: 主模型的提供方
+        temperature: 采样温度（所有候选模型相同）
+        fallbacks: 备用模型列表（"提供方:模型"），None 表示使用默认配置，见 parse_fallbacks
+        hedge: 是否在主模型慢于 p95 时发出对冲请求；为False时只在出错时切换
+        kwargs: 传给每个候选模型的其他参数
+
+    返回:
+        ModelRouter 实例，或没有备用模型时的主模型
+    """
+    from model_router import ModelRouter
+
+    primary = get_chat_model(model_name, provider, temperature=temperature, **kwargs)
+    routes = parse_fallbacks(model_name, provider, fallbacks)
+    if not routes:
+        return primary
+    candidates = [primary] + [get_chat_model(name, route_provider, temperature=temperature, **kwargs)
+                              for route_provider, name in routes]
+    names = [f"{provider}:{model_name}"] + [f"{route_provider}:{name}" for route_provider, name in routes]
+    return ModelRouter(candidates=candidates, names=names, hedge=hedge)
+
+async def close_http_clients() -> None:
+    """关闭所有共享的HTTP客户端（通常在进程退出前调用）"""
+    with _lock:
+        sync_clients = list(_sync_clients.values())
+        async_clients = [client for _, client in _async_clients.values()]
+        _sync_clients.clear()
+        _async_clients.clear()
+        _models.clear()
+    for client in sync_clients:
+        client.close()
+    for client in async_clients:
+        try:
+            await client.aclose()
+        except RuntimeError:
+            pass  # 客户端属于已经关闭的事件循环
@@ -0,0 +1,268 @@
+"""
+LLM 调用路由：故障切换 + 对冲请求
+
+所有智能体原来只依赖一个 Moonshot 接口，它变慢时整批问题都会变慢。ModelRouter 把主模型和
+若干备用模型（其他提供方或模型）包装成一个聊天模型:
+
+- 故障切换: 当前模型调用出错时立即改用下一个模型
+- 对冲请求: 当前模型超过它最近调用延迟的 p95 还没有返回（流式输出时为首个片段）时，
+  同时向下一个模型发出相同的请求，采用先返回的结果并取消另一个
+- 延迟统计: 每个 "提供方:模型" 最近的延迟、错误数、对冲次数和胜出次数记录在
+  LatencyTracker 中（进程内共享），对冲延迟随之自适应
+
+因此单次模型调用的耗时大致不超过 主模型的 p95 + 备用模型的耗时，process_questions 的
+尾延迟不再取决于主模型最慢的那几次调用。对冲会让最慢的约 5% 的调用多发一个请求。
+
+流式输出只在首个片段之前对冲和切换，之后出错时直接抛出异常（已输出的内容无法撤回）。
+
+用法:
+    from model_factory import get_routed_model
+    model = get_routed_model("moonshot-v1-32k", fallbacks=["zhipu:glm-4-flash"])
+"""
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from pydantic import Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# 调用候选模型时不传递回调：路由器自己的运行已经上报了输出，候选模型再上报会重复
+_NO_CALLBACKS = {"callbacks": []}
+
+class LatencyTracker:
+    """
+    按 "提供方:模型" 记录最近的调用延迟和调用结果
+
+    延迟分两类: "latency" 为非流式调用的总耗时，"ttft" 为流式调用首个片段的耗时。
+    计数包括 calls（发出的请求）、errors、hedged（超过 p95 而触发对冲）、wins（结果被采用）
+    和 cancelled（对冲中落后而被取消）。
+    """
+
+    def __init__(self, window: int = 200):
+        """
+        参数:
+            window: 每类延迟保留的最近样本数
+        """
+        self.window = window
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, kind: str, ms: float) -> None:
+        """记录一次成功调用的延迟（毫秒）"""
+        with self._lock:
+            self._latencies.setdefault((name, kind), deque(maxlen=self.window)).append(ms)
+
+    def count(self, name: str, event: str) -> None:
+        """计数一次事件（calls / errors / hedged / wins / cancelled）"""
+        with self._lock:
+            counts = self._counts.setdefault(name, {})
+            counts[event] = counts.get(event, 0) + 1
+
+    def quantile(self, name: str, kind: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """最近样本的分位数（毫秒），样本数不足 min_samples 时返回None"""
+        with self._lock:
+            samples = sorted(self._latencies.get((name, kind), ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个模型的计数和延迟分位数（p50/p95，毫秒）"""
+        with self._lock:
+            names = sorted(set(self._counts) | {name for name, _ in self._latencies})
+        result = {}
+        for name in names:
+            entry: Dict[str, Any] = dict(self._counts.get(name, {}))
+            for kind in ("latency", "ttft"):
+                p50 = self.quantile(name, kind, 0.5)
+                if p50 is not None:
+                    entry[f"{kind}_p50_ms"] = round(p50, 1)
+                    entry[f"{kind}_p95_ms"] = round(self.quantile(name, kind, 0.95), 1)
+            result[name] = entry
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencies.clear()
+            self._counts.clear()
+
+# 进程内共享的延迟统计，同一个模型在所有路由器中共用样本
+default_latency_tracker = LatencyTracker()
+
+class ModelRouter(BaseChatModel):
+    """
+    在多个聊天模型之间故障切换和对冲请求的聊天模型
+
+    candidates[0] 为主模型，其余按顺序作为备用。bind_tools 的工具定义会原样传给每个候选模型，
+    候选模型各自的限流器和重试配置保持不变。
+    """
+
+    candidates: List[Any]
+    names: List[str]  # 与 candidates 对应的 "提供方:模型"，用于延迟统计
+    hedge: bool = True  # 为False时只在出错时切换
+    hedge_quantile: float = 0.95  # 超过这个分位数的延迟时发出对冲请求
+    default_hedge_ms: float = 5000.0  # 样本不足 min_samples 时使用的对冲延迟
+    min_hedge_ms: float = 50.0  # 对冲延迟的下限，避免延迟很稳定时几乎每次都对冲
+    min_samples: int = 20
+    tracker: Any = Field(default_factory=lambda: default_latency_tracker)
+
+    @property
+    def _llm_type(self) -> str:
+        return "model-router"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def hedge_delay(self, index: int, kind: str) -> float:
+        """等待第 index 个候选模型多久（秒）后向下一个模型发出对冲请求"""
+        value = self.tracker.quantile(self.names[index], kind, self.hedge_quantile, self.min_samples)
+        return (self.default_hedge_ms if value is None else max(value, self.min_hedge_ms)) / 1000
+
+    async def _race(self, start: Callable[[int], Awaitable[Any]], kind: str,
+                    discard: Optional[Callable[[Any], Awaitable[None]]] = None) -> Tuple[int, Any]:
+        """
+        依次启动候选模型的调用，返回最先成功的 (序号, 结果)
+
+        当前调用出错时立即启动下一个；超过对冲延迟还没有结果时也启动下一个，同时等待两者。
+        所有候选都失败时抛出最后一个异常。没有被采用的调用会被取消（已经完成的交给 discard 清理）。
+        """
+        pending: Dict[asyncio.Task, int] = {}
+        errors: List[BaseException] = []
+        launched = 0
+
+        async def timed(index: int) -> Any:
+            name = self.names[index]
+            self.tracker.count(name, "calls")
+            started = time.perf_counter()
+            try:
+                result = await start(index)
+            except asyncio.CancelledError:
+                self.tracker.count(name, "cancelled")
+                raise
+            except Exception:
+                self.tracker.count(name, "errors")
+                raise
+            self.tracker.record(name, kind, (time.perf_counter() - started) * 1000)
+            return result
+
+        def launch() -> None:
+            nonlocal launched
+            pending[asyncio.ensure_future(timed(launched))] = launched
+            launched += 1
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge and launched < len(self.candidates)
+                timeout = self.hedge_delay(launched - 1, kind) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.tracker.count(self.names[launched - 1], "hedged")
+                    launch()
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        index = pending.pop(task)
+                        self.tracker.count(self.names[index], "wins")
+                        return index, task.result()
+                    errors.append(task.exception())
+                    del pending[task]
+                if launched < len(self.candidates):
+                    launch()  # 故障切换
+            raise errors[-1]
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        # 同步调用只做故障切换，不对冲
+        error: Optional[Exception] = None
+        for candidate, name in zip(self.candidates, self.names):
+            self.tracker.count(name, "calls")
+            started = time.perf_counter()
+            try:
+                message = candidate.invoke(messages, config=_NO_CALLBACKS, stop=stop, **kwargs)
+            except Exception as e:
+                self.tracker.count(name, "errors")
+                error = e
+                continue
+            self.tracker.record(name, "latency", (time.perf_counter() - started) * 1000)
+            self.tracker.count(name, "wins")
+            message.response_metadata = {**message.response_metadata, "routed_to": name}
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise error
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        async def call(index: int) -> Any:
+            return await self.candidates[index].ainvoke(messages, config=_NO_CALLBACKS, stop=stop, **kwargs)
+
+        index, message = await self._race(call, "latency")
+        message.response_metadata = {**message.response_metadata, "routed_to": self.names[index]}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # 同步流式输出不切换，直接使用主模型
+        for chunk in self.candidates[0].stream(messages, config=_NO_CALLBACKS, stop=stop, **kwargs):
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async def open_stream(index: int) -> Tuple[Any, Any]:
+            # 等到首个片段才算这个模型已经响应
+            stream = self.candidates[index].astream(messages, config=_NO_CALLBACKS, stop=stop, **kwargs)
+            try:
+                return await stream.__anext__(), stream
+            except StopAsyncIteration:
+                return None, stream
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def close(opened: Tuple[Any, Any]) -> None:
+            await opened[1].aclose()
+
+        index, (first, stream) = await self._race(open_stream, "ttft", discard=close)
+        try:
+            if first is not None:
+                first.response_metadata = {**first.response_metadata, "routed_to": self.names[index]}
+                yield ChatGenerationChunk(message=first)
+            async for chunk in stream:
+                yield ChatGenerationChunk(message=chunk)
+        finally:
+            await stream.aclose()
+
+def routed_models(messages: Sequence[Any]) -> List[str]:
+    """
+    回答中各次模型调用实际使用的模型
+
+    返回:
+        "提供方:模型" 列表（去重，按首次出现的顺序）；没有经过 ModelRouter 时为空列表
+    """
+    names: List[str] = []
+    for message in messages:
+        name = (getattr(message, "response_metadata", None) or {}).get("routed_to")
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def format_router_stats(stats: Dict[str, Dict[str, Any]]) -> str:
+    """把 LatencyTracker.stats() 格式化为每个模型一行的文本"""
+    lines = []
+    for name, entry in stats.items():
+        latency = ", ".join(f"{kind} p50/p95 {entry[f'{kind}_p50_ms']:.0f}/{entry[f'{kind}_p95_ms']:.0f}ms"
+                            for kind in ("latency", "ttft") if f"{kind}_p50_ms" in entry)
+        lines.append(f"   {name}: 请求 {entry.get('calls', 0)}，采用 {entry.get('wins', 0)}，"
+                     f"出错 {entry.get('errors', 0)}，对冲 {entry.get('hedged', 0)}，"
+                     f"取消 {entry.get('cancelled', 0)}" + (f"，{latency}" if latency else ""))
+    return "\n".join(lines)
@@ -0,0 +1,241 @@
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+
+# 每个MCP服务器允许同时进行的工具调用数
+DEFAULT_SERVER_LIMITS: Dict[str, int] = {
+    "weather": 4,
+    "zhipu-web-search": 2,
+    "tavily-mcp": 2,
+}
+
+# 单个工具允许同时进行的调用数（未配置的工具不单独限制）
+DEFAULT_TOOL_LIMITS: Dict[str, int] = {}
+
+# 当前这一步的工具调用耗时；用上下文变量保存，多个问题并发执行时互不干扰
+_step_timings: contextvars.ContextVar[List[Dict[str, Any]]] = contextvars.ContextVar("step_timings")
+# 当前这一步工具调用的截止时间（time.monotonic），来自状态中的 deadline（见 step_limits.StepLimits）
+_step_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("step_deadline", default=None)
+
+# 超过截止时间被取消的工具调用返回给模型的内容
+CANCELLED_MESSAGE = "工具调用已取消：已达到时间预算"
+
+def tool_server(tool: BaseTool) -> Optional[str]:
+    """返回工具所属的MCP服务器名称，本地工具返回None"""
+    return (tool.metadata or {}).get("mcp_server")
+
+def tag_server_tools(tools: List[BaseTool], server_name: str) -> List[BaseTool]:
+    """在工具的 metadata 中记录所属的MCP服务器，供按服务器限流使用"""
+    return [
+        tool.model_copy(update={"metadata": {**(tool.metadata or {}), "mcp_server": server_name}})
+        for tool in tools
+    ]
+
+class _LimitedTool(BaseTool):
+    """
+    包装一个工具：调用前获取并发许可，调用后记录排队和执行耗时
+
+    ToolNode 只通过 invoke/ainvoke 调用工具，并发限制放在这里，不需要覆盖 ToolNode 的内部方法。
+    """
+
+    tool: BaseTool
+    node: Any  # 所属的 ParallelToolNode，提供信号量和耗时记录
+
+    @classmethod
+    def wrap(cls, tool: BaseTool, node: "ParallelToolNode") -> "_LimitedTool":
+        return cls(name=tool.name, description=tool.description, args_schema=tool.args_schema,
+                   return_direct=tool.return_direct, response_format=tool.response_format,
+                   metadata=tool.metadata, tags=tool.tags, tool=tool, node=node)
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        raise NotImplementedError("_LimitedTool 只通过 invoke/ainvoke 调用")
+
+    def invoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        queued = time.perf_counter()
+        semaphores = [self.node._thread_semaphore(key) for key in self.node._limit_keys(self.name)]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            started = time.perf_counter()
+            result = self.tool.invoke(input, config, **kwargs)
+            finished = time.perf_counter()
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+        self.node._record(self.name, queued, started, finished)
+        return result
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        deadline = _step_deadline.get()
+        if deadline is None:
+            return await self._ainvoke(input, config, **kwargs)
+        try:
+            return await asyncio.wait_for(self._ainvoke(input, config, **kwargs), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            if not (isinstance(input, dict) and input.get("type") == "tool_call"):
+                raise
+            # 返回取消结果而不是抛出异常，同一步中已经完成的调用结果照常交给模型
+            return ToolMessage(content=CANCELLED_MESSAGE, name=self.name, tool_call_id=input["id"], status="error",
+                               response_metadata={"stopped_by": "time_budget"})
+
+    async def _ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        queued = time.perf_counter()
+        semaphores = [self.node._async_semaphore(key) for key in self.node._limit_keys(self.name)]
+        for semaphore in semaphores:
+            await semaphore.acquire()
+        try:
+            started = time.perf_counter()
+            result = await self.tool.ainvoke(input, config, **kwargs)
+            finished = time.perf_counter()
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+        self.node._record(self.name, queued, started, finished)
+        return result
+
+class ParallelToolNode(ToolNode):
+    """
+    并行执行工具调用的 ToolNode
+
+    模型一步中给出的多个工具调用会并发执行，同时受每个工具和每个MCP服务器的
+    并发上限约束，避免压垮天气服务器或智谱接口。每次调用的排队时间和执行时间
+    记录在 timings 中（只保留最近 max_timings 步，timing_summary 汇总全部步骤），
+    可以直接替换 ToolNode(tools)。
+
+    只使用 ToolNode 的公开接口：工具被包装为 _LimitedTool，每一步的耗时在 invoke/ainvoke 中统计。
+
+    输入状态中有 deadline（time.monotonic 的截止时间）时，异步执行的工具调用（包括排队）到期即被
+    取消，对应的结果为内容是 CANCELLED_MESSAGE 的 ToolMessage。
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        *,
+        tool_limits: Optional[Dict[str, int]] = None,
+        server_limits: Optional[Dict[str, int]] = None,
+        verbose: bool = True,
+        max_timings: int = 1000,
+        **kwargs: Any,
+    ):
+        """
+        参数:
+            tools: 工具列表，MCP工具需要通过 tag_server_tools 标记所属服务器
+            tool_limits: 每个工具的并发上限，默认为 DEFAULT_TOOL_LIMITS
+            server_limits: 每个MCP服务器的并发上限，默认为 DEFAULT_SERVER_LIMITS
+            verbose: 是否打印每一步的耗时统计
+            max_timings: timings 中保留的最近步骤数
+            kwargs: 传给 ToolNode 的其他参数
+        """
+        super().__init__([_LimitedTool.wrap(tool, self) if isinstance(tool, BaseTool) else tool for tool in tools],
+                         **kwargs)
+        self.tool_limits = tool_limits if tool_limits is not None else DEFAULT_TOOL_LIMITS
+        self.server_limits = server_limits if server_limits is not None else DEFAULT_SERVER_LIMITS
+        self.verbose = verbose
+        self.timings: Deque[Dict[str, Any]] = deque(maxlen=max_timings)
+        self._totals = {"steps": 0, "calls": 0, "wall_ms": 0.0, "serial_ms": 0.0}
+        self._thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _limit_keys(self, tool_name: str) -> List[str]:
+        """返回一次调用需要获取的信号量键（先服务器后工具，顺序固定以避免死锁）"""
+        keys = []
+        tool = self.tools_by_name.get(tool_name)
+        server = tool_server(tool) if tool is not None else None
+        if server is not None and server in self.server_limits:
+            keys.append(f"server:{server}")
+        if tool_name in self.tool_limits:
+            keys.append(f"tool:{tool_name}")
+        return keys
+
+    def _limit(self, key: str) -> int:
+        kind, name = key.split(":", 1)
+        return (self.server_limits if kind == "server" else self.tool_limits)[name]
+
+    def _thread_semaphore(self, key: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if key not in self._thread_semaphores:
+                self._thread_semaphores[key] = threading.BoundedSemaphore(self._limit(key))
+            return self._thread_semaphores[key]
+
+    def _async_semaphore(self, key: str) -> asyncio.Semaphore:
+        # asyncio.Semaphore 绑定事件循环，换了事件循环需要重新创建
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_semaphores = {}
+            self._async_loop = loop
+        if key not in self._async_semaphores:
+            self._async_semaphores[key] = asyncio.Semaphore(self._limit(key))
+        return self._async_semaphores[key]
+
+    def _record(self, tool_name: str, queued: float, started: float, finished: float) -> Dict[str, Any]:
+        tool = self.tools_by_name.get(tool_name)
+        timing = {
+            "tool": tool_name,
+            "server": tool_server(tool) if tool is not None else None,
+            "wait_ms": (started - queued) * 1000,
+            "run_ms": (finished - started) * 1000,
+            "start": started,
+            "end": finished,
+        }
+        _step_timings.get([]).append(timing)
+        return timing
+
+    def _report(self, calls: List[Dict[str, Any]], wall_ms: float) -> None:
+        """记录并打印一步中所有工具调用的耗时"""
+        serial_ms = sum(c["run_ms"] for c in calls)
+        step = {
+            "calls": calls,
+            "wall_ms": wall_ms,
+            "serial_ms": serial_ms,
+            "speedup": serial_ms / wall_ms if wall_ms > 0 else 1.0,
+        }
+        self.timings.append(step)
+        with self._lock:
+            self._totals["steps"] += 1
+            self._totals["calls"] += len(calls)
+            self._totals["wall_ms"] += wall_ms
+            self._totals["serial_ms"] += serial_ms
+        if self.verbose and calls:
+            details = ", ".join(f"{c['tool']} {c['run_ms']:.0f}ms" for c in calls)
+            print(f"⏱️ 工具调用 {len(calls)} 个: 实际 {wall_ms:.0f}ms / 串行 {serial_ms:.0f}ms "
+                  f"(加速 {step['speedup']:.1f}x) [{details}]")
+
+    def invoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        calls: List[Dict[str, Any]] = []
+        token = _step_timings.set(calls)
+        try:
+            started = time.perf_counter()
+            output = super().invoke(input, config, **kwargs)
+            self._report(calls, (time.perf_counter() - started) * 1000)
+        finally:
+            _step_timings.reset(token)
+        return output
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs: Any) -> Any:
+        calls: List[Dict[str, Any]] = []
+        token = _step_timings.set(calls)
+        deadline_token = _step_deadline.set(input.get("deadline") if isinstance(input, dict) else None)
+        try:
+            started = time.perf_counter()
+            output = await super().ainvoke(input, config, **kwargs)
+            self._report(calls, (time.perf_counter() - started) * 1000)
+        finally:
+            _step_deadline.reset(deadline_token)
+            _step_timings.reset(token)
+        return output
+
+    def timing_summary(self) -> Dict[str, Any]:
+        """汇总所有步骤（包括已经不在 timings 中的）的工具调用耗时"""
+        with self._lock:
+            totals = dict(self._totals)
+        totals["speedup"] = totals["serial_ms"] / totals["wall_ms"] if totals["wall_ms"] > 0 else 1.0
+        return totals
@@ -0,0 +1,169 @@
+import os
+import time
+import asyncio
+import functools
+import threading
+from typing import Any, Dict, List, Optional
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_core.tools import BaseTool
+
+# 默认限流配置：rpm 为每分钟请求数，burst 为令牌桶容量（允许的瞬时并发突发）
+# 可以通过环境变量覆盖，例如 RATE_LIMIT_MOONSHOT_RPM=120、RATE_LIMIT_TAVILY_MCP_BURST=2
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    # LLM 提供方
+    "moonshot": {"rpm": 60, "burst": 5},
+    "zhipu": {"rpm": 60, "burst": 5},
+    # MCP 服务器
+    "weather": {"rpm": 120, "burst": 10},
+    "zhipu-web-search": {"rpm": 30, "burst": 3},
+    "tavily-mcp": {"rpm": 60, "burst": 5},
+}
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """
+    令牌桶限流器
+
+    令牌以 rpm/60 个每秒的速度补充，桶容量为 burst。每次请求消耗一个令牌，
+    桶空时等待到下一个令牌可用为止。实现了 LangChain 的 BaseRateLimiter 接口，
+    因此可以直接作为 ChatOpenAI 的 rate_limiter 参数使用。
+    """
+
+    def __init__(self, rpm: float, burst: float = 1, check_every_n_seconds: float = 0.05):
+        """
+        参数:
+            rpm: 每分钟允许的请求数
+            burst: 令牌桶容量，即允许的最大突发请求数
+            check_every_n_seconds: 等待令牌时的最小轮询间隔
+        """
+        if rpm <= 0:
+            raise ValueError("rpm 必须大于0")
+        self.rpm = rpm
+        self.burst = max(burst, 1)
+        self.check_every_n_seconds = check_every_n_seconds
+        self._rate = rpm / 60.0
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _consume(self) -> float:
+        """尝试消耗一个令牌，成功返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        wait = self._consume()
+        if not blocking:
+            return wait == 0
+        while wait > 0:
+            time.sleep(max(wait, self.check_every_n_seconds))
+            wait = self._consume()
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        wait = self._consume()
+        if not blocking:
+            return wait == 0
+        while wait > 0:
+            await asyncio.sleep(max(wait, self.check_every_n_seconds))
+            wait = self._consume()
+        return True
+
+# 进程内共享的限流器，同一个提供方/服务器的所有调用共用一个令牌桶
+_limiters: Dict[str, Optional[TokenBucketRateLimiter]] = {}
+# 本进程分到的配额比例（多进程工作池中每个进程为 1/进程数）
+_share = 1.0
+
+def set_rate_limit_share(share: float) -> None:
+    """
+    设置本进程分到的限流配额比例，之后创建的限流器按比例缩小 rpm 和 burst
+
+    多个进程各自限流时，每个进程只使用 1/进程数 的配额，合计不超过提供方的限额。
+    已经创建的限流器会被丢弃并按新的比例重新创建。
+
+    参数:
+        share: 配额比例，0~1
+    """
+    global _share
+    _share = share
+    _limiters.clear()
+
+def _env_key(name: str, field: str) -> str:
+    return f"RATE_LIMIT_{name.upper().replace('-', '_')}_{field.upper()}"
+
+def get_rate_limit_config(name: str) -> Optional[Dict[str, float]]:
+    """
+    获取指定提供方或MCP服务器的限流配置
+
+    参数:
+        name: 提供方或MCP服务器名称，例如 "moonshot"、"tavily-mcp"
+
+    返回:
+        包含 rpm 和 burst 的字典；没有配置时返回None（表示不限流）
+    """
+    config = dict(DEFAULT_RATE_LIMITS.get(name, {}))
+    for field in ("rpm", "burst"):
+        value = os.getenv(_env_key(name, field))
+        if value:
+            config[field] = float(value)
+
+    if "rpm" not in config or config["rpm"] <= 0:
+        return None
+    config.setdefault("burst", 1)
+    config["rpm"] *= _share
+    config["burst"] = max(1, config["burst"] * _share)
+    return config
+
+def get_rate_limiter(name: str) -> Optional[TokenBucketRateLimiter]:
+    """
+    获取（或创建）指定提供方或MCP服务器的共享限流器
+
+    参数:
+        name: 提供方或MCP服务器名称
+
+    返回:
+        令牌桶限流器；没有限流配置时返回None
+    """
+    if name not in _limiters:
+        config = get_rate_limit_config(name)
+        _limiters[name] = TokenBucketRateLimiter(**config) if config else None
+    return _limiters[name]
+
+def _limited(coroutine: Any, limiter: BaseRateLimiter) -> Any:
+    """包装工具协程，调用前先获取令牌"""
+    @functools.wraps(coroutine)
+    async def limited_coroutine(*args: Any, **kwargs: Any) -> Any:
+        await limiter.aacquire()
+        return await coroutine(*args, **kwargs)
+
+    return limited_coroutine
+
+def apply_rate_limit(tools: List[BaseTool], limiter: Optional[BaseRateLimiter]) -> List[BaseTool]:
+    """
+    为工具列表加上限流，每次异步调用工具前先获取一个令牌
+
+    参数:
+        tools: 工具列表（通常来自同一个MCP服务器）
+        limiter: 限流器，为None时原样返回
+
+    返回:
+        加上限流后的工具列表
+    """
+    if limiter is None:
+        return tools
+
+    limited_tools = []
+    for tool in tools:
+        coroutine = getattr(tool, "coroutine", None)
+        if coroutine is None:
+            limited_tools.append(tool)
+            continue
+
+        limited_tools.append(tool.model_copy(update={"coroutine": _limited(coroutine, limiter)}))
+
+    return limited_tools
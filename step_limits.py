@@ -0,0 +1,115 @@
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from history import truncate_text, truncate_tool_messages
+
+# 达到限制时让模型根据已有信息直接回答的提示（这次调用不绑定工具）
+FINAL_ANSWER_PROMPT = "已经达到本次回答的工具调用限制，请不要再调用工具，根据上面已经得到的信息直接给出尽可能完整的最终回答。"
+
+STOP_REASONS = {
+    "max_steps": "已达到最大工具调用次数",
+    "max_iterations": "已达到最大迭代次数",
+    "time_budget": "已达到时间预算",
+}
+
+def turn_progress(messages: Sequence[BaseMessage]) -> Tuple[int, int]:
+    """
+    统计最后一个用户问题之后的进度
+
+    返回:
+        (模型回复数, 工具调用数)
+    """
+    iterations, tool_calls = 0, 0
+    for message in reversed(messages):
+        if message.type == "human":
+            break
+        if message.type == "ai":
+            iterations += 1
+            tool_calls += len(getattr(message, "tool_calls", None) or [])
+    return iterations, tool_calls
+
+def partial_answer(messages: Sequence[BaseMessage], reason: str) -> AIMessage:
+    """不调用模型，用目前得到的工具结果拼出部分回答"""
+    results: List[str] = []
+    for message in reversed(messages):
+        if message.type == "human":
+            break
+        if isinstance(message, ToolMessage):
+            results.append(f"- {message.name}: {truncate_text(str(message.content), 500)}")
+    if results:
+        content = f"（{STOP_REASONS[reason]}，以下是目前得到的部分结果）\n" + "\n".join(reversed(results))
+    else:
+        content = f"（{STOP_REASONS[reason]}，还没有得到可用的结果）"
+    return AIMessage(content=content, response_metadata={"stopped_by": reason})
+
+@dataclass
+class StepLimits:
+    """
+    单个问题的执行限制
+
+    max_steps 限制工具调用总数（一步中并行的多个调用分别计数，超出剩余次数的调用会被丢弃），
+    max_iterations 限制模型调用次数（包括最后一次回答），time_budget_s 限制从开始处理问题
+    到给出回答的时间（包括模型调用和工具调用，截止时间 deadline() 记录在图的状态中，
+    ParallelToolNode 取消到期的工具调用）。达到步数/迭代限制时再调用一次不绑定工具的模型给出最终回答；
+    达到时间预算时不再调用模型，直接返回已有的工具结果。
+    """
+    max_steps: Optional[int] = None
+    max_iterations: Optional[int] = None
+    time_budget_s: Optional[float] = None
+
+    def recursion_limit(self, fast_path: bool = False) -> Optional[int]:
+        """LangGraph 的 recursion_limit：正常情况下不会触发，只作为兜底"""
+        if self.max_iterations is None:
+            return None
+        # 每次迭代经过 call_model 和 tools 两个节点，另外留出快速路径和余量
+        return 2 * self.max_iterations + (1 if fast_path else 0) + 2
+
+    def remaining(self, started_at: float) -> Optional[float]:
+        """剩余的时间预算（秒），没有时间预算时返回None"""
+        if self.time_budget_s is None:
+            return None
+        return self.time_budget_s - (time.monotonic() - started_at)
+
+    def deadline(self, started_at: float) -> Optional[float]:
+        """时间预算的截止时间（time.monotonic），没有时间预算时返回None"""
+        return None if self.time_budget_s is None else started_at + self.time_budget_s
+
+    def exhausted(self, messages: Sequence[BaseMessage], started_at: float) -> Optional[str]:
+        """调用模型前检查是否已经达到限制，返回原因（max_steps / max_iterations / time_budget）或None"""
+        remaining = self.remaining(started_at)
+        if remaining is not None and remaining <= 0:
+            return "time_budget"
+        iterations, tool_calls = turn_progress(messages)
+        if self.max_steps is not None and tool_calls >= self.max_steps:
+            return "max_steps"
+        if self.max_iterations is not None and iterations >= self.max_iterations - 1:
+            return "max_iterations"  # 留出最后一次调用给出回答
+        return None
+
+    def cap_tool_calls(self, response: AIMessage, messages: Sequence[BaseMessage]) -> AIMessage:
+        """丢弃超出剩余工具调用次数的调用"""
+        tool_calls = getattr(response, "tool_calls", None) or []
+        if self.max_steps is None or not tool_calls:
+            return response
+        allowed = max(self.max_steps - turn_progress(messages)[1], 0)
+        if len(tool_calls) <= allowed:
+            return response
+        return response.model_copy(update={"tool_calls": tool_calls[:allowed]})
+
+    async def final_answer(self, model: Any, messages: Sequence[BaseMessage], reason: str,
+                           started_at: float) -> AIMessage:
+        """达到限制时给出最终回答：还有时间时让模型（不绑定工具）总结，否则返回部分结果"""
+        remaining = self.remaining(started_at)
+        if reason == "time_budget" or (remaining is not None and remaining <= 0):
+            return partial_answer(messages, "time_budget")
+        try:
+            call = model.ainvoke(truncate_tool_messages(messages) + [HumanMessage(content=FINAL_ANSWER_PROMPT)])
+            response = await (asyncio.wait_for(call, remaining) if remaining is not None else call)
+        except asyncio.TimeoutError:
+            return partial_answer(messages, "time_budget")
+        except Exception:
+            return partial_answer(messages, reason)
+        return AIMessage(content=response.content,
+                         response_metadata={**response.response_metadata, "stopped_by": reason})
@@ -0,0 +1,139 @@
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+def _chunk_text(chunk: Any) -> str:
+    """提取模型输出块中的文本（content 可能是字符串，也可能是内容块列表）"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return ""
+
+def _output_text(output: Any) -> str:
+    """工具输出（通常是 ToolMessage）转为文本"""
+    return str(getattr(output, "content", output))
+
+async def stream_agent(agent: Any, query: Union[str, List[Any]],
+                       config: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    以流式方式运行智能体，边执行边产出事件
+
+    基于 LangGraph 的 astream_events，适用于 create_react_agent 创建的智能体和
+    agent_langgraph.create_graph 构建的状态图。产出的事件:
+        {"type": "token", "text": ...}  模型输出的文本片段
+        {"type": "tool_start", "tool": ..., "args": ...}  开始调用工具
+        {"type": "tool_end", "tool": ..., "output": ..., "ms": ...}  工具调用完成
+        {"type": "final", "answer": ..., "ttft_ms": ..., "total_ms": ..., "tool_calls": ..., "tools": [...],
+         "stopped_by": ..., "routed_to": [...]}  最后一个事件（stopped_by 为达到的执行限制，见 step_limits.py，
+        正常结束时为None；routed_to 为实际使用的模型，见 model_router.routed_models）
+
+    ttft_ms 为从提交问题到第一个文本片段的毫秒数；没有流式文本时（例如快速路径直接给出回答）
+    为拿到回答的时间。
+
+    参数:
+        agent: 智能体或编译后的状态图
+        query: 用户问题，或完整的输入消息列表（多轮对话时包含历史）
+        config: 传给 astream_events 的运行配置
+    """
+    from model_router import routed_models
+
+    started = time.perf_counter()
+    first_token_ms = None
+    tool_started: Dict[str, float] = {}
+    tools: List[str] = []
+    answer = None
+    stopped_by = None
+    routed_to: List[str] = []
+
+    messages = [{"role": "user", "content": query}] if isinstance(query, str) else query
+    events = agent.astream_events({"messages": messages}, config=config, version="v2")
+    async for event in events:
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            text = _chunk_text(event["data"].get("chunk"))
+            if text:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                yield {"type": "token", "text": text}
+        elif kind == "on_tool_start":
+            tool_started[event["run_id"]] = time.perf_counter()
+            tools.append(event["name"])
+            yield {"type": "tool_start", "tool": event["name"], "args": event["data"].get("input")}
+        elif kind == "on_tool_end":
+            begin = tool_started.pop(event["run_id"], None)
+            yield {
+                "type": "tool_end",
+                "tool": event["name"],
+                "output": _output_text(event["data"].get("output")),
+                "ms": (time.perf_counter() - begin) * 1000 if begin is not None else 0.0,
+            }
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            # 最外层的图运行结束，最后一条消息就是回答
+            output = event["data"].get("output")
+            if isinstance(output, dict) and output.get("messages"):
+                answer = _chunk_text(output["messages"][-1])
+                stopped_by = (getattr(output["messages"][-1], "response_metadata", None) or {}).get("stopped_by")
+                routed_to = routed_models(output["messages"])
+
+    total_ms = (time.perf_counter() - started) * 1000
+    yield {
+        "type": "final",
+        "answer": answer,
+        "ttft_ms": first_token_ms if first_token_ms is not None else total_ms,
+        "total_ms": total_ms,
+        "tool_calls": len(tools),
+        "tools": tools,
+        "stopped_by": stopped_by,
+        "routed_to": routed_to,
+    }
+
+async def print_stream(agent: Any, query: Union[str, List[Any]], prefix: str = "", show_tokens: bool = True,
+                       config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    流式运行智能体并打印输出：文本片段边生成边打印，工具调用打印开始和完成
+
+    多个问题并发执行时，可以传入 prefix（例如 "[2] "）区分输出，并关闭 show_tokens
+    避免不同回答的文本交错，这时回答在完成后整体打印。
+
+    参数:
+        agent: 智能体或编译后的状态图
+        query: 用户问题，或完整的输入消息列表
+        prefix: 每行输出的前缀
+        show_tokens: 是否逐片段打印模型输出
+        config: 传给 astream_events 的运行配置
+
+    返回:
+        stream_agent 的 final 事件（包含 answer、ttft_ms、total_ms、tool_calls）
+    """
+    result: Dict[str, Any] = {}
+    mid_line = False  # 当前行是否有未换行的文本片段
+
+    def line(text: str) -> None:
+        nonlocal mid_line
+        if mid_line:
+            print()
+            mid_line = False
+        print(f"{prefix}{text}", flush=True)
+
+    async for event in stream_agent(agent, query, config=config):
+        if event["type"] == "token" and show_tokens:
+            if not mid_line:
+                print(f"{prefix}回答: ", end="")
+                mid_line = True
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "tool_start":
+            line(f"🔧 调用工具 {event['tool']}: {event['args']}")
+        elif event["type"] == "tool_end":
+            output = event["output"]
+            preview = output if len(output) <= 80 else output[:80] + "..."
+            line(f"✓ {event['tool']} 完成 ({event['ms']:.0f}ms): {preview}")
+        elif event["type"] == "final":
+            result = event
+
+    if mid_line:
+        print()
+    elif result.get("answer") is not None:
+        print(f"{prefix}回答: {result['answer']}")
+    print(f"{prefix}⏱️ 首个token {result['ttft_ms']:.0f}ms，总耗时 {result['total_ms']:.0f}ms", flush=True)
+    return result
@@ -5,6 +5,7 @@ import subprocess
 import time
 import json
 import shutil
+from collections import deque
 from typing import List, Any, Dict
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
@@ -15,6 +16,15 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 单条 JSON-RPC 消息的最大长度（工具列表可能很长）
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+INITIALIZE_PARAMS = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {},
+    "clientInfo": {"name": "custom-mcp-client", "version": "1.0"}
+}
+
 def test_npx_works():
     """测试 npx 是否能正常工作"""
     try:
@@ -124,20 +134,37 @@ async def test_manual_tavily():
     return False
 
 class CustomMCPClient:
-    """自定义 MCP 客户端，处理 Windows 上的 shell 问题"""
+    """
+    自定义 MCP 客户端，处理 Windows 上的 shell 问题
+    
+    基于 asyncio 子进程的 JSON-RPC 传输：每个服务器有一个读取任务，按请求 id
+    把响应分发给对应的 future，因此同一个 stdio 通道上可以同时有多个
+    tools/list、tools/call 请求在途（流水线），读写都不会阻塞事件循环。
+    """
     
     def __init__(self, config):
         self.config = config
         self.processes = {}
+        self.pending = {}  # 服务器名称 -> {请求id: 等待响应的future}
+        self.stderr_tails = {}  # 服务器名称 -> 最近的 stderr 输出
+        self._tasks = {}  # 服务器名称 -> 读取 stdout/stderr 的后台任务
+        self._request_id = 0
         
-    async def start_servers(self):
-        """启动所有服务器"""
-        for server_name, server_config in self.config.items():
-            if server_config.get("transport") == "stdio":
-                await self._start_stdio_server(server_name, server_config)
+    def _next_id(self):
+        self._request_id += 1
+        return self._request_id
+        
+    async def start_servers(self, deadline: float = 60.0):
+        """并发启动所有服务器，每个服务器就绪后立即返回"""
+        names = [name for name, server_config in self.config.items()
+                 if server_config.get("transport") == "stdio"]
+        results = await asyncio.gather(*(
+            self._start_stdio_server(name, self.config[name], deadline) for name in names
+        ))
+        return dict(zip(names, results))
     
-    async def _start_stdio_server(self, name, config):
-        """启动 stdio 服务器"""
+    async def _start_stdio_server(self, name, config, deadline: float = 60.0):
+        """启动 stdio 服务器，并通过 initialize 握手探测是否就绪"""
         command = config["command"]
         args = config.get("args", [])
         env = os.environ.copy()
@@ -151,80 +178,180 @@ class CustomMCPClient:
         
         try:
             print(f"🚀 启动服务器 {name}: {cmd_str}")
+            started = time.monotonic()
             
-            process = subprocess.Popen(
+            # 关键：使用 shell 启动以兼容 Windows 上的 npx.cmd
+            process = await asyncio.create_subprocess_shell(
                 cmd_str,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
                 env=env,
-                shell=True,  # 关键：Windows 兼容
-                bufsize=0
+                limit=MAX_LINE_BYTES
             )
             
             self.processes[name] = process
+            self.pending[name] = {}
+            self.stderr_tails[name] = deque(maxlen=50)
+            self._tasks[name] = [
+                asyncio.create_task(self._read_loop(name, process)),
+                asyncio.create_task(self._drain_stderr(name, process)),
+            ]
             
-            # 等待启动
-            await asyncio.sleep(10)
-            
-            if process.poll() is not None:
-                stderr = process.stderr.read()
-                print(f"❌ 服务器 {name} 启动失败: {stderr}")
+            # 等待 initialize 响应，而不是固定等待
+            if not await self._wait_until_ready(name, deadline):
+                if process.returncode is not None:
+                    stderr = "".join(self.stderr_tails[name])
+                    print(f"❌ 服务器 {name} 启动失败: {stderr}")
+                else:
+                    print(f"❌ 服务器 {name} 在 {deadline} 秒内未就绪")
                 return False
             
-            print(f"✅ 服务器 {name} 启动成功")
+            print(f"✅ 服务器 {name} 启动成功，耗时 {time.monotonic() - started:.1f} 秒")
             return True
             
         except Exception as e:
             print(f"❌ 启动服务器 {name} 失败: {e}")
             return False
     
-    async def get_tools(self, server_name):
+    async def _read_loop(self, name, process):
+        """读取服务器输出，按 id 把响应交给等待中的请求"""
+        pending = self.pending[name]
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 跳过非 JSON 的日志输出
+                future = pending.pop(message.get("id"), None) if "id" in message else None
+                if future is not None and not future.done():
+                    future.set_result(message)
+        finally:
+            # 进程输出结束，所有在途请求失败
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"服务器 {name} 已关闭输出"))
+            pending.clear()
+    
+    async def _drain_stderr(self, name, process):
+        """持续读取 stderr，避免管道写满阻塞服务器，并保留最近的输出用于排错"""
+        tail = self.stderr_tails[name]
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                break
+            tail.append(line.decode(errors="replace"))
+    
+    async def _send(self, name, message):
+        """向服务器发送一条 JSON-RPC 消息"""
+        process = self.processes[name]
+        process.stdin.write((json.dumps(message) + "\n").encode())
+        await process.stdin.drain()
+    
+    async def _send_request(self, name, method, params=None):
+        """发送请求并返回 (请求id, 等待响应的future)"""
+        request_id = self._next_id()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[name][request_id] = future
+        try:
+            await self._send(name, {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": method,
+                "params": params or {}
+            })
+        except Exception:
+            self.pending[name].pop(request_id, None)
+            raise
+        return request_id, future
+    
+    async def request(self, name, method, params=None, timeout: float = 30.0):
+        """
+        发送 JSON-RPC 请求并等待结果，可以并发调用
+        
+        Returns:
+            响应中的 result 字段
+        """
+        request_id, future = await self._send_request(name, method, params)
+        try:
+            message = await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self.pending[name].pop(request_id, None)
+        if "error" in message:
+            raise RuntimeError(f"{method} 失败: {message['error']}")
+        return message.get("result", {})
+    
+    async def _wait_until_ready(self, name, deadline: float = 60.0,
+                                initial_timeout: float = 0.5, max_timeout: float = 8.0):
+        """
+        发送一次 initialize 请求，等待服务器响应
+        
+        stdio 管道会保留请求直到服务器读取，不需要重发。等待分轮进行，每轮的时间从 initial_timeout
+        指数增长到 max_timeout，每轮之间检查服务器进程是否已经退出，直到收到响应或超过 deadline。
+        """
+        process = self.processes[name]
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        wait = initial_timeout
+        
+        request_id, future = await self._send_request(name, "initialize", INITIALIZE_PARAMS)
+        try:
+            while not future.done():
+                remaining = end - loop.time()
+                if remaining <= 0 or process.returncode is not None:
+                    return False
+                await asyncio.wait({future}, timeout=min(wait, remaining))
+                wait = min(wait * 2, max_timeout)
+            if future.exception() is not None or "error" in future.result():
+                return False
+        finally:
+            self.pending[name].pop(request_id, None)
+        
+        await self._send(name, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        return True
+    
+    async def get_tools(self, server_name, timeout: float = 30.0):
         """从指定服务器获取工具"""
         if server_name not in self.processes:
             return []
         
         process = self.processes[server_name]
-        if process.poll() is not None:
+        if process.returncode is not None:
             print(f"❌ 服务器 {server_name} 已停止")
             return []
         
         try:
-            # 发送工具列表请求
-            request = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "tools/list",
-                "params": {}
-            }
-            
-            req_str = json.dumps(request) + "\n"
-            process.stdin.write(req_str)
-            process.stdin.flush()
-            
-            # 读取响应
-            response = process.stdout.readline()
-            if response.strip():
-                resp_data = json.loads(response)
-                if 'result' in resp_data and 'tools' in resp_data['result']:
-                    return resp_data['result']['tools']
-            
+            result = await self.request(server_name, "tools/list", {}, timeout)
+            return result.get("tools", [])
         except Exception as e:
             print(f"❌ 获取工具失败: {e}")
         
         return []
     
-    def close(self):
+    async def call_tool(self, server_name, tool_name, arguments=None, timeout: float = 30.0):
+        """调用指定服务器上的工具，返回 tools/call 的 result"""
+        return await self.request(server_name, "tools/call", {
+            "name": tool_name,
+            "arguments": arguments or {}
+        }, timeout)
+    
+    async def close(self):
         """关闭所有进程"""
         for name, process in self.processes.items():
-            if process.poll() is None:
+            process.stdin.close()
+            if process.returncode is None:
                 print(f"🔌 关闭服务器 {name}")
                 process.terminate()
                 try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
+                    await asyncio.wait_for(process.wait(), timeout=5)
+                except asyncio.TimeoutError:
                     process.kill()
+                    await process.wait()
+            for task in self._tasks.get(name, []):
+                task.cancel()
 
 async def test_custom_client():
     """测试自定义客户端"""
@@ -244,13 +371,9 @@ async def test_custom_client():
     client = CustomMCPClient(config)
     
     try:
-        # 启动服务器
+        # 启动服务器（返回时已完成 initialize 握手）
         await client.start_servers()
         
-        # 等待完全启动
-        print("⏳ 等待服务器完全初始化...")
-        await asyncio.sleep(20)
-        
         # 获取工具
         tools = await client.get_tools("tavily-mcp")
         print(f"🎉 自定义客户端获取到 {len(tools)} 个工具:")
@@ -264,7 +387,7 @@ async def test_custom_client():
         print(f"❌ 自定义客户端测试失败: {e}")
         return False
     finally:
-        client.close()
+        await client.close()
 
 async def test_langchain_client_with_fixes():
     """测试 langchain 客户端（尝试修复）"""
@@ -302,12 +425,9 @@ async def test_langchain_client_with_fixes():
         try:
             client = MultiServerMCPClient(config)
             
-            # 等待更长时间
-            print("⏳ 等待服务器启动（30秒）...")
-            await asyncio.sleep(30)
-            
-            # 尝试获取工具
-            tools = client.get_tools()
+            # 获取工具本身会完成 initialize 握手，服务器就绪后立即返回
+            print("⏳ 等待服务器就绪（最多60秒）...")
+            tools = await asyncio.wait_for(client.get_tools(), timeout=60)
             print(f"✅ 配置 {i} 成功！获取到 {len(tools)} 个工具")
             
             if tools:
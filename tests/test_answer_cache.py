@@ -0,0 +1,53 @@
+"""answer_cache.py 的单元测试：运算和数字顺序不同的问题不能命中同一条缓存"""
+import pytest
+from answer_cache import AnswerCache, normalize_question, question_signature
+
+DIFFERENT_QUESTIONS = [
+    ("What is 3 + 5?", "What is 3 * 5?"),
+    ("What is 3 + 5?", "What is 3 - 5?"),
+    ("2 to the power of 3", "3 to the power of 2"),
+    ("divide 10 by 2", "divide 2 by 10"),
+    ("计算3加5", "计算3乘5"),
+    ("What is the square root of 16?", "What is the square root of 25?"),
+]
+
+# 数字、地名都相同，只差一个实词的问题（词法向量的相似度都超过 0.85）
+ONE_WORD_APART = [
+    ("What is the high temperature in Denver tomorrow?", "What is the low temperature in Denver tomorrow?"),
+    ("Will it rain in Boston this weekend?", "Will it rain in Boston next weekend?"),
+    ("Is it going to rain in Boston tomorrow?", "Is it going to snow in Boston tomorrow?"),
+]
+
+SAME_QUESTIONS = [
+    ("What is 3 + 5?", "what is 3+5"),
+    ("alerts in CA?", "Are there any severe weather alerts in California?"),
+]
+
+@pytest.fixture
+def cache():
+    return AnswerCache(embedder=None)
+
+@pytest.mark.parametrize("first, second", DIFFERENT_QUESTIONS)
+def test_different_questions_miss(cache, first, second):
+    assert question_signature(first) != question_signature(second)
+    cache.store(first, "answer")
+    assert cache.lookup(second) is None
+
+@pytest.mark.parametrize("first, second", ONE_WORD_APART)
+def test_one_word_apart_miss(cache, first, second):
+    cache.store(first, "answer")
+    assert cache.lookup(second) is None
+    assert cache.lookup(first) is not None
+
+@pytest.mark.parametrize("first, second", SAME_QUESTIONS)
+def test_paraphrases_hit(cache, first, second):
+    cache.store(first, "answer")
+    hit = cache.lookup(second)
+    assert hit is not None and hit["answer"] == "answer"
+
+def test_operators_kept_in_normalized_text():
+    assert normalize_question("What is 3 + 5?") == "3 plus 5"
+    assert normalize_question("What is 3 * 5?") == "3 times 5"
+
+def test_signature_keeps_number_order():
+    assert question_signature("divide 10 by 2")[0] == (10.0, 2.0)
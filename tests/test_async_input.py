@@ -0,0 +1,48 @@
+"""async_input.py 的单元测试：按顺序读出排队的输入，输入结束时返回None，读取期间事件循环不被阻塞"""
+import io
+import os
+import asyncio
+from async_input import StdinReader
+
+def test_reads_lines_then_eof():
+    async def scenario():
+        async with StdinReader(io.StringIO("first\r\nsecond\n\nlast")) as reader:
+            return [await reader.readline() for _ in range(5)]
+
+    assert asyncio.run(scenario()) == ["first", "second", "", "last", None]
+
+def test_pending_counts_queued_lines():
+    async def scenario():
+        reader = StdinReader(io.StringIO("a\nb\nc\n")).start()
+        while reader.pending() < 4:  # 三行输入加上结束标记
+            await asyncio.sleep(0.01)
+        first = await reader.readline()
+        return first, reader.pending()
+
+    assert asyncio.run(scenario()) == ("a", 3)
+
+def test_event_loop_keeps_running_while_waiting():
+    read_fd, write_fd = os.pipe()
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        with os.fdopen(read_fd) as stream:
+            reader = StdinReader(stream).start()
+            task = asyncio.create_task(ticker())
+            pending = asyncio.create_task(reader.readline())
+            await asyncio.sleep(0.2)  # 没有输入时 readline 挂起，其他任务照常运行
+            assert not pending.done() and ticks >= 5
+            os.write(write_fd, b"hello\n")
+            line = await asyncio.wait_for(pending, timeout=2)
+            os.close(write_fd)
+            task.cancel()
+            return line, await asyncio.wait_for(reader.readline(), timeout=2)
+
+    assert asyncio.run(scenario()) == ("hello", None)
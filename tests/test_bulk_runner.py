@@ -0,0 +1,120 @@
+"""bulk_runner.py 的测试：中断后从检查点继续，输出文件中每个问题恰好一个结果"""
+import os
+import json
+import asyncio
+import pytest
+import bulk_runner
+import model_factory
+from agent_langgraph import AgentConfig
+from fake_llm import fake_chat_model
+from bulk_runner import Checkpoint, read_questions, run_bulk
+
+QUESTIONS = 20
+
+class Crash(BaseException):
+    """模拟进程被中断（不会被 answer_question 捕获）"""
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setitem(model_factory._model_factories, "fake", fake_chat_model)
+    monkeypatch.delenv("LLM_FALLBACKS", raising=False)
+    monkeypatch.setattr(bulk_runner, "CHECKPOINT_EVERY", 3)
+    input_path = tmp_path / "questions.jsonl"
+    lines = [json.dumps({"id": i, "question": f"What is the square root of {i * i}?"}) for i in range(QUESTIONS)]
+    lines.insert(5, "")  # 空行
+    lines.insert(9, "not json")
+    input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(input_path), str(tmp_path / "results.jsonl")
+
+def config() -> AgentConfig:
+    return AgentConfig(llm="fake", tools=["square_root"], stream=False)
+
+def crash_after(monkeypatch, calls: int) -> None:
+    answer_question = bulk_runner.answer_question
+    count = {"n": 0}
+
+    async def crashing(*args, **kwargs):
+        count["n"] += 1
+        if count["n"] > calls:
+            raise Crash()
+        return await answer_question(*args, **kwargs)
+    monkeypatch.setattr(bulk_runner, "answer_question", crashing)
+
+def read_results(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def check_complete(results: list) -> None:
+    answered = sorted(r["id"] for r in results if r["success"])
+    assert answered == list(range(QUESTIONS))
+    failed = [r for r in results if not r["success"]]
+    assert len(failed) == 1 and failed[0]["error"].startswith("无效的JSON")
+    assert all(r["answer"] == f"{r['id'] ** 2} 的平方根是 {r['id']}" for r in results if r["success"])
+
+def test_full_run(files):
+    input_path, output_path = files
+    summary = asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, progress_every=0))
+    assert summary["processed"] == QUESTIONS + 1
+    check_complete(read_results(output_path))
+
+def test_resume_after_crash(files, monkeypatch):
+    input_path, output_path = files
+    crash_after(monkeypatch, 8)
+    with pytest.raises(Crash):
+        asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, progress_every=0))
+    partial = read_results(output_path)
+    assert 0 < len(partial) < QUESTIONS
+
+    # 进程在写一行结果的中途被杀死：输出文件末尾多出半行
+    with open(output_path, "ab") as f:
+        f.write(b'{"id": 99, "li')
+
+    monkeypatch.undo()
+    monkeypatch.setitem(model_factory._model_factories, "fake", fake_chat_model)
+    summary = asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, progress_every=0))
+    assert summary["resumed"]
+    assert summary["processed"] == QUESTIONS + 1 - len(partial)
+    check_complete(read_results(output_path))
+
+def test_resume_from_older_checkpoint(files, monkeypatch):
+    """检查点之后已经写入的结果会被截掉并重新处理，不会重复"""
+    input_path, output_path = files
+    checkpoint_path = f"{output_path}.ckpt"
+    saved = []
+    save = Checkpoint.save
+
+    def recording_save(self, output_bytes):
+        save(self, output_bytes)
+        with open(self.path, encoding="utf-8") as f:
+            saved.append(f.read())
+    monkeypatch.setattr(Checkpoint, "save", recording_save)
+    crash_after(monkeypatch, 12)
+    with pytest.raises(Crash):
+        asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, progress_every=0))
+
+    # 模拟最后几次检查点没来得及保存
+    older = next(s for s in saved if json.loads(s)["next_line"] > 0)
+    with open(checkpoint_path, "w", encoding="utf-8") as f:
+        f.write(older)
+    assert os.path.getsize(output_path) > json.loads(older)["output_bytes"]  # 检查点之后还写入了结果
+
+    monkeypatch.undo()
+    monkeypatch.setitem(model_factory._model_factories, "fake", fake_chat_model)
+    asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, progress_every=0))
+    check_complete(read_results(output_path))
+
+def test_no_resume_overwrites(files):
+    input_path, output_path = files
+    asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, progress_every=0))
+    summary = asyncio.run(run_bulk(input_path, output_path, config(), concurrency=4, resume=False, progress_every=0))
+    assert not summary["resumed"] and summary["processed"] == QUESTIONS + 1
+    check_complete(read_results(output_path))
+
+def test_read_questions_formats(tmp_path):
+    path = tmp_path / "q.jsonl"
+    path.write_text('"plain"\n{"question": "no id"}\n\n{"id": "x", "question": "q"}\n[1]\n', encoding="utf-8")
+    assert list(read_questions(str(path))) == [
+        (0, 0, "plain", None), (1, 1, "no id", None), (2, None, None, None),
+        (3, "x", "q", None), (4, 4, None, "缺少 question 字段"),
+    ]
+    assert [item[0] for item in read_questions(str(path), start_line=3)] == [3, 4]
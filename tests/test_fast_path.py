@@ -0,0 +1,29 @@
+"""fast_path.py 的单元测试：只有明确的简单算术/字符串问题才走快速路径"""
+import pytest
+from fast_path import match_fast_path
+
+@pytest.mark.parametrize("question, tool, args", [
+    ("计算 23 + 45 的结果", "add", {"a": 23.0, "b": 45.0}),
+    ("23 + 45", "add", {"a": 23.0, "b": 45.0}),
+    ("3*5=", "multiply", {"a": 3.0, "b": 5.0}),
+    ("10/2 等于多少？", "divide", {"a": 10.0, "b": 2.0}),
+    ("计算 16 的平方根", "square_root", {"number": 16.0}),
+    ("2 的 3 次方", "power", {"base": 2.0, "exponent": 3.0}),
+    ("计算 (3 + 5) * 12 的结果", "evaluate_expression", {"expression": "(3 + 5) * 12"}),
+    ("将 'hello world' 转换为大写", "to_uppercase", {"text": "hello world"}),
+])
+def test_matches(question, tool, args):
+    match = match_fast_path(question)
+    assert match is not None
+    assert (match.tool, match.args) == (tool, args)
+
+@pytest.mark.parametrize("question", [
+    "2024-06-01",
+    "2024-06",
+    "2024/06/01",
+    "3-5",
+    "2024-06-01 上海的天气怎么样",
+    "计算 7 * 8 然后减去 10，并查询一下上海的天气预报",
+])
+def test_not_matched(question):
+    assert match_fast_path(question) is None
@@ -0,0 +1,71 @@
+"""history.py 的单元测试：工具输出截断不修改原消息，对话窗口外的轮次合并为摘要"""
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from history import ChatSession, make_pre_model_hook, truncate_text, truncate_tool_messages
+
+def test_truncate_text_keeps_head_and_tail():
+    text = "a" * 50 + "b" * 50
+    truncated = truncate_text(text, 30)
+    assert truncated.startswith("a" * 20) and truncated.endswith("b" * 10)
+    assert "省略 70 个字符" in truncated
+    assert truncate_text("short", 30) == "short"
+
+def test_truncate_tool_messages_leaves_state_unchanged():
+    long_output = "x" * 5000
+    state = {"messages": [HumanMessage(content="q"),
+                          AIMessage(content="", tool_calls=[{"name": "get_alerts", "args": {}, "id": "1"}]),
+                          ToolMessage(content=long_output, tool_call_id="1"),
+                          ToolMessage(content="short", tool_call_id="2")]}
+    original = list(state["messages"])
+
+    compacted = make_pre_model_hook(max_tool_chars=100)(state)["llm_input_messages"]
+
+    assert state["messages"] == original
+    assert state["messages"][2].content == long_output
+    assert len(compacted[2].content) < 200 and compacted[2].tool_call_id == "1"
+    assert compacted[0] is original[0] and compacted[3] is original[3]
+    assert truncate_tool_messages(original, 100)[2] is not original[2]
+
+def run_session(session: ChatSession, turns: int):
+    async def scenario():
+        for i in range(turns):
+            messages = await session.messages_for(f"question {i}")
+            session.add_turn(f"question {i}", f"answer {i}", messages, latency_ms=1.0)
+        return await session.messages_for("next")
+    return asyncio.run(scenario())
+
+def test_window_keeps_recent_turns():
+    session = ChatSession(model=None, window_turns=2)
+    messages = run_session(session, 5)
+    assert [m.content for m in messages[1:]] == ["question 3", "answer 3", "question 4", "answer 4", "next"]
+    assert len(session.turns) == 2
+
+def test_evicted_turns_become_summary():
+    session = ChatSession(model=None, window_turns=2)
+    messages = run_session(session, 5)
+    assert isinstance(messages[0], SystemMessage)
+    for i in range(3):
+        assert f"用户: question {i}" in session.summary and f"助手: answer {i}" in session.summary
+    assert "question 3" not in session.summary
+
+def test_summary_is_bounded():
+    session = ChatSession(model=None, window_turns=1, max_summary_chars=200)
+    run_session(session, 30)
+    assert len(session.summary) <= 200
+    assert "question 28" in session.summary  # 保留最新的内容
+
+def test_failed_turn_not_recorded():
+    session = ChatSession(model=None)
+
+    async def scenario():
+        messages = await session.messages_for("q")
+        return session.add_turn("q", None, messages, latency_ms=1.0)
+
+    stat = asyncio.run(scenario())
+    assert stat["turn"] == 1 and session.turns == []
+
+def test_reset():
+    session = ChatSession(model=None, window_turns=1)
+    run_session(session, 3)
+    session.reset()
+    assert session.summary == "" and session.turns == []
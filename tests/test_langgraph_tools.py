@@ -0,0 +1,80 @@
+"""langgraph_tools.py 的单元测试：表达式求值"""
+import pytest
+from langgraph_tools import evaluate_expression
+
+def evaluate(expression: str) -> float:
+    return evaluate_expression.func(expression)
+
+@pytest.mark.parametrize("expression, expected", [
+    ("(3 + 5) * 12", 96.0),
+    ("sqrt(16) + 2^3", 12.0),
+    ("3 × 4 ÷ 2", 6.0),
+    ("3 x 4", 12.0),
+    ("3X4", 12.0),
+    ("(1 + 2)x3", 9.0),
+    ("2.5 x 2", 5.0),
+    ("√16", 4.0),
+])
+def test_evaluate(expression, expected):
+    assert evaluate(expression) == expected
+
+@pytest.mark.parametrize("expression", [
+    "1e308*10",
+    "1e308*10 - 1e308*10",
+    "10.0**400",
+    "x * 3",
+    "3 xx 4",
+    "__import__('os')",
+    "2 ** 5000",
+    "pow(2, 3, 4)",
+    "pow(2)",
+    "sqrt()",
+    "sqrt(4, 9)",
+])
+def test_rejected(expression):
+    with pytest.raises(ValueError):
+        evaluate(expression)
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """分别测试 NumPy 路径和纯 Python 路径（没有安装 NumPy 时跳过前者）"""
+    import langgraph_tools
+
+    if request.param == "numpy":
+        monkeypatch.setattr(langgraph_tools, "np", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(langgraph_tools, "np", None)
+    return request.param
+
+def test_batch_results(backend):
+    from langgraph_tools import aggregate, batch_square_root, elementwise
+
+    assert elementwise.func("multiply", [1, 2, 3], 2) == [2.0, 4.0, 6.0]
+    assert elementwise.func("power", [2, 3], [3, 2]) == [8.0, 9.0]
+    assert batch_square_root.func([4, 9]) == [2.0, 3.0]
+    assert aggregate.func("sum", [1, 2, 3]) == 6.0
+
+@pytest.mark.parametrize("operation, a, b", [
+    ("power", [-8], 1 / 3),
+    ("power", [10], 400),
+    ("multiply", [1e308], 10),
+    ("add", [1e308], [1e308]),
+])
+def test_elementwise_non_finite(backend, operation, a, b):
+    from langgraph_tools import elementwise
+
+    with pytest.raises(ValueError, match="超出浮点数范围或没有定义"):
+        elementwise.func(operation, a, b)
+
+@pytest.mark.parametrize("operation", ["sum", "product"])
+def test_aggregate_overflow(backend, operation):
+    from langgraph_tools import aggregate
+
+    with pytest.raises(ValueError, match="超出浮点数范围或没有定义"):
+        aggregate.func(operation, [1e308, 1e308])
+
+def test_batch_square_root_negative(backend):
+    from langgraph_tools import batch_square_root
+
+    with pytest.raises(ValueError):
+        batch_square_root.func([4, -1])
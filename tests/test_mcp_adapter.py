@@ -0,0 +1,27 @@
+"""agent_langgraph_mcp_adapter.py 的单元测试：批量查询的流式路径也使用回答缓存"""
+import asyncio
+from types import SimpleNamespace
+from agent_langgraph import create_graph
+from agent_langgraph_mcp_adapter import batch_queries
+from answer_cache import AnswerCache
+from fake_llm import ScriptedChatModel
+from langgraph_tools import square_root
+
+def fake_runtime():
+    """只提供 batch_queries 用到的属性的运行时"""
+    graph = create_graph(ScriptedChatModel(), [square_root], verbose=False)
+
+    async def start():
+        return runtime
+    runtime = SimpleNamespace(tools=[square_root], ready=True, agent=graph, start=start,
+                              answer_cache=AnswerCache(embedder=None))
+    return runtime
+
+def test_stream_uses_answer_cache():
+    runtime = fake_runtime()
+    queries = ["What is the square root of 16?"]
+    first = asyncio.run(batch_queries(queries, runtime=runtime, stream=True))
+    second = asyncio.run(batch_queries(queries, runtime=runtime, stream=True))
+    assert first[0]["answer"] == second[0]["answer"]
+    assert "cached" not in first[0] and second[0]["cached"]
+    assert runtime.answer_cache.stats()["hits"] == 1
@@ -0,0 +1,91 @@
+"""mcp_connection.py 的测试：用本地 echo 服务器（benchmarks/echo_mcp_server.py）模拟服务器停止"""
+import sys
+import time
+import socket
+import asyncio
+import subprocess
+import pytest
+from benchmarks.bench_mcp_transport import SERVERS, free_port
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, INVALID_PARAMS, ErrorData
+from mcp_connection import SESSION_TERMINATED, MCPConnection, is_connection_error
+from mcp_transport import client_connection
+
+ECHO_SCRIPT = SERVERS["echo"][0]
+
+def start_server(transport: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, ECHO_SCRIPT, "--transport", transport, "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise TimeoutError(f"echo 服务器没有在 15 秒内监听端口 {port}")
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    process.wait()
+
+@pytest.mark.parametrize("error, expected", [
+    (McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed")), True),
+    # streamable HTTP 客户端把 404（服务器重启后会话 ID 失效）转换成这个错误
+    (McpError(ErrorData(code=SESSION_TERMINATED, message="Session terminated")), True),
+    (McpError(ErrorData(code=INVALID_PARAMS, message="Invalid arguments")), False),
+    (ExceptionGroup("task group", [ConnectionResetError()]), True),
+    (ValueError("tool failed"), False),
+])
+def test_is_connection_error(error, expected):
+    assert is_connection_error(error) is expected
+
+@pytest.fixture
+def port():
+    return free_port()
+
+@pytest.mark.parametrize("transport", ["streamable_http", "sse"])
+def test_call_fails_when_server_stays_down(port, transport):
+    process = start_server(transport.replace("_", "-"), port)
+
+    async def scenario():
+        config = client_connection(transport, f"http://127.0.0.1:{port}")
+        async with MCPConnection.from_config(config, heartbeat_interval=0.2, heartbeat_timeout=0.5,
+                                             backoff_base=0.1, backoff_max=0.2, reconnect_timeout=2.0) as connection:
+            result = await connection.call_tool("echo", {"text": "hello"})
+            assert result.content[0].text == "hello"
+            stop_server(process)
+            started = time.monotonic()
+            with pytest.raises(ConnectionError):
+                await connection.call_tool("echo", {"text": "hello"})
+            return time.monotonic() - started
+
+    try:
+        assert asyncio.run(scenario()) < 10
+    finally:
+        if process.poll() is None:
+            stop_server(process)
+
+def test_streamable_http_server_restart(port):
+    """服务器重启后原来的会话 ID 失效（404 / 400），调用应在新会话上重新发出"""
+    process = start_server("streamable-http", port)
+
+    async def scenario():
+        config = client_connection("streamable_http", f"http://127.0.0.1:{port}")
+        # 心跳间隔足够长，由调用本身发现会话已失效
+        async with MCPConnection.from_config(config, heartbeat_interval=60, backoff_base=0.1,
+                                             backoff_max=0.2) as connection:
+            assert (await connection.call_tool("echo", {"text": "before"})).content[0].text == "before"
+            nonlocal process
+            stop_server(process)
+            process = start_server("streamable-http", port)
+            assert (await connection.call_tool("echo", {"text": "after"})).content[0].text == "after"
+            return connection.stats
+
+    try:
+        stats = asyncio.run(scenario())
+        assert stats["reconnects"] == 1
+        assert stats["reissued_calls"] == 1
+    finally:
+        stop_server(process)
@@ -0,0 +1,100 @@
+"""mcp_server_pool.py 的测试：用本地 echo 服务器（benchmarks/echo_mcp_server.py）测试租用、回收和关闭"""
+import sys
+import asyncio
+import anyio
+import pytest
+from benchmarks.bench_mcp_transport import SERVERS
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, INVALID_PARAMS, ErrorData
+from mcp_server_pool import StdioServerPool
+
+ECHO_CONFIG = {"command": sys.executable, "args": [SERVERS["echo"][0], "--transport", "stdio"]}
+
+def make_pool(**kwargs) -> StdioServerPool:
+    return StdioServerPool("echo", ECHO_CONFIG, startup_timeout=20, lease_timeout=20, **kwargs)
+
+async def wait_for_replacement(pool: StdioServerPool) -> None:
+    """等待后台补充的进程启动完成"""
+    while pool._background:
+        await asyncio.sleep(0.05)
+
+def test_lease_reuses_process():
+    async def scenario():
+        async with make_pool(size=1) as pool:
+            async with pool.lease() as first:
+                result = await first.call_tool("echo", {"text": "hello"})
+            async with pool.lease() as second:
+                pass
+            return result, first is second
+
+    result, same = asyncio.run(scenario())
+    assert result.content[0].text == "hello"
+    assert same
+
+@pytest.mark.parametrize("error", [
+    ValueError("tool failed"),
+    McpError(ErrorData(code=INVALID_PARAMS, message="Invalid arguments")),
+    asyncio.CancelledError(),
+])
+def test_tool_errors_keep_process(error):
+    async def scenario():
+        async with make_pool(size=1) as pool:
+            with pytest.raises(type(error)):
+                async with pool.lease() as first:
+                    raise error
+            async with pool.lease() as second:
+                result = await second.call_tool("echo", {"text": "still here"})
+            return first is second, result
+
+    same, result = asyncio.run(scenario())
+    assert same
+    assert result.content[0].text == "still here"
+
+@pytest.mark.parametrize("error", [
+    anyio.ClosedResourceError(),
+    anyio.BrokenResourceError(),
+    McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed")),
+])
+def test_connection_errors_recycle_process(error):
+    async def scenario():
+        async with make_pool(size=1) as pool:
+            with pytest.raises(type(error)):
+                async with pool.lease() as first:
+                    raise error
+            await wait_for_replacement(pool)
+            async with pool.lease() as second:
+                result = await second.call_tool("echo", {"text": "replaced"})
+            return first is second, result, len(pool._servers)
+
+    same, result, servers = asyncio.run(scenario())
+    assert not same
+    assert result.content[0].text == "replaced"
+    assert servers == 1
+
+def test_max_requests_recycles_process():
+    async def scenario():
+        async with make_pool(size=1, max_requests=2) as pool:
+            sessions = []
+            for _ in range(3):
+                async with pool.lease() as session:
+                    sessions.append(session)
+                await wait_for_replacement(pool)
+            return sessions
+
+    first, second, third = asyncio.run(scenario())
+    assert first is second and third is not first
+
+def test_close_stops_processes():
+    async def scenario():
+        pool = await make_pool(size=2).start()
+        servers = list(pool._servers)
+        await pool.close()
+        with pytest.raises(RuntimeError):
+            async with pool.lease():
+                pass
+        return servers, pool
+
+    servers, pool = asyncio.run(scenario())
+    assert len(servers) == 2
+    assert not pool._servers
+    assert all(not server.alive for server in servers)
@@ -0,0 +1,51 @@
+"""model_factory.py 的单元测试：同一提供方共用HTTP客户端，模型工厂只在注册后生效"""
+import asyncio
+import pytest
+import model_factory
+from fake_llm import ScriptedChatModel, fake_chat_model
+from model_factory import close_http_clients, get_chat_model, parse_fallbacks
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    monkeypatch.setitem(model_factory._model_factories, "fake", fake_chat_model)
+
+def test_same_provider_shares_clients(monkeypatch):
+    monkeypatch.setenv("MOONSHOT_API_KEY", "x")
+    monkeypatch.setenv("ZHIPU_API_KEY", "x")
+
+    async def scenario():
+        try:
+            first = get_chat_model("moonshot-v1-8k")
+            second = get_chat_model("moonshot-v1-32k", temperature=0)
+            other = get_chat_model("glm-4-flash", provider="zhipu")
+            return first, second, other, get_chat_model("moonshot-v1-8k")
+        finally:
+            await close_http_clients()
+
+    first, second, other, again = asyncio.run(scenario())
+    assert first is not second and first is again
+    assert first.http_client is second.http_client
+    assert first.http_async_client is second.http_async_client
+    assert first.http_async_client is not other.http_async_client
+
+def test_new_event_loop_gets_new_async_client(monkeypatch):
+    monkeypatch.setenv("MOONSHOT_API_KEY", "x")
+
+    async def client():
+        return get_chat_model("moonshot-v1-8k").http_async_client
+
+    try:
+        assert asyncio.run(client()) is not asyncio.run(client())
+    finally:
+        asyncio.run(close_http_clients())
+
+def test_fake_models_need_registration(fake_models):
+    assert isinstance(get_chat_model("fake"), ScriptedChatModel)
+    assert parse_fallbacks("fake", fallbacks=["fake-backup", "zhipu:glm-4-flash"]) == [("moonshot", "fake-backup")]
+
+def test_unregistered_prefix_uses_provider(monkeypatch):
+    monkeypatch.setenv("MOONSHOT_API_KEY", "x")
+    try:
+        assert not isinstance(get_chat_model("fake"), ScriptedChatModel)
+    finally:
+        asyncio.run(close_http_clients())
@@ -0,0 +1,39 @@
+"""model_router.py 的单元测试：故障切换、routed_to 记录和默认不启用备用模型"""
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage
+import model_factory
+from fake_llm import ScriptedChatModel, fake_chat_model
+from model_factory import get_routed_model, parse_fallbacks
+from model_router import LatencyTracker, ModelRouter, routed_models
+
+def router(fail_rate: float = 0.0) -> ModelRouter:
+    return ModelRouter(candidates=[ScriptedChatModel(fail_rate=fail_rate), ScriptedChatModel()],
+                       names=["fake:primary", "fake:fallback"], hedge=False, tracker=LatencyTracker())
+
+def test_routed_to_primary():
+    message = asyncio.run(router().ainvoke([HumanMessage(content="hello")]))
+    assert message.response_metadata["routed_to"] == "fake:primary"
+
+def test_failover_records_fallback():
+    message = asyncio.run(router(fail_rate=1.0).ainvoke([HumanMessage(content="hello")]))
+    assert message.response_metadata["routed_to"] == "fake:fallback"
+
+def test_routed_models():
+    messages = [HumanMessage(content="q"),
+                AIMessage(content="", response_metadata={"routed_to": "fake:primary"}),
+                AIMessage(content="a", response_metadata={"routed_to": "fake:fallback"}),
+                AIMessage(content="b", response_metadata={"routed_to": "fake:primary"})]
+    assert routed_models(messages) == ["fake:primary", "fake:fallback"]
+    assert routed_models([AIMessage(content="a")]) == []
+
+def test_no_fallbacks_by_default(monkeypatch):
+    monkeypatch.setitem(model_factory._model_factories, "fake", fake_chat_model)
+    monkeypatch.delenv("LLM_FALLBACKS", raising=False)
+    monkeypatch.setenv("ZHIPU_API_KEY", "x")
+    assert parse_fallbacks("moonshot-v1-32k", "moonshot") == []
+    assert not isinstance(get_routed_model("fake"), ModelRouter)
+
+def test_fallbacks_opt_in(monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACKS", "zhipu:glm-4-flash")
+    monkeypatch.setenv("ZHIPU_API_KEY", "x")
+    assert parse_fallbacks("moonshot-v1-32k", "moonshot") == [("zhipu", "glm-4-flash")]
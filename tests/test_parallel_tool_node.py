@@ -0,0 +1,73 @@
+"""parallel_tool_node.py 的单元测试：并发执行、按服务器限流和有界的耗时记录"""
+import time
+import asyncio
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from parallel_tool_node import ParallelToolNode, tag_server_tools
+
+@tool
+async def slow_echo(text: str) -> str:
+    """Echo the text after a short delay."""
+    await asyncio.sleep(0.1)
+    return text
+
+@tool
+def sync_echo(text: str) -> str:
+    """Echo the text after a short delay."""
+    time.sleep(0.1)
+    return text
+
+def tool_calls(name: str, count: int) -> dict:
+    calls = [{"name": name, "args": {"text": str(i)}, "id": f"call_{i}", "type": "tool_call"} for i in range(count)]
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+def test_calls_run_concurrently():
+    node = ParallelToolNode([slow_echo], verbose=False)
+    started = time.perf_counter()
+    result = asyncio.run(node.ainvoke(tool_calls("slow_echo", 4)))
+    assert time.perf_counter() - started < 0.3
+    assert [m.content for m in result["messages"]] == ["0", "1", "2", "3"]
+    assert node.timing_summary()["calls"] == 4
+
+def test_server_limit():
+    tools = tag_server_tools([slow_echo], "weather")
+    node = ParallelToolNode(tools, server_limits={"weather": 2}, verbose=False)
+    asyncio.run(node.ainvoke(tool_calls("slow_echo", 4)))
+    calls = node.timings[-1]["calls"]
+    assert all(c["server"] == "weather" for c in calls)
+    # 同一时刻最多 2 个调用在执行
+    for call in calls:
+        running = sum(1 for other in calls if other["start"] <= call["start"] < other["end"])
+        assert running <= 2
+
+def test_sync_invoke():
+    node = ParallelToolNode([sync_echo], verbose=False)
+    started = time.perf_counter()
+    result = node.invoke(tool_calls("sync_echo", 3))
+    assert time.perf_counter() - started < 0.25
+    assert len(result["messages"]) == 3
+    assert len(node.timings[-1]["calls"]) == 3
+
+def test_timings_bounded():
+    node = ParallelToolNode([slow_echo], verbose=False, max_timings=3)
+
+    async def run_steps():
+        for _ in range(5):
+            await node.ainvoke(tool_calls("slow_echo", 1))
+
+    asyncio.run(run_steps())
+    assert len(node.timings) == 3
+    summary = node.timing_summary()
+    assert summary["steps"] == 5 and summary["calls"] == 5
+
+def test_create_graph_verbose(capsys):
+    from agent_langgraph import create_graph
+    from fake_llm import ScriptedChatModel
+    from langgraph_tools import square_root
+
+    question = {"messages": [{"role": "user", "content": "What is the square root of 16?"}]}
+    for verbose in (True, False):
+        graph = create_graph(ScriptedChatModel(), [square_root], verbose=verbose)
+        asyncio.run(graph.ainvoke(question))
+        assert graph.builder.nodes["tools"].runnable.verbose is verbose
+        assert bool(capsys.readouterr().out) is verbose
@@ -0,0 +1,41 @@
+"""step_limits.py 的测试：时间预算同样约束工具调用"""
+import time
+import asyncio
+from langchain_core.tools import tool
+from agent_langgraph import create_graph
+from fake_llm import ScriptedChatModel, ScriptRule
+from parallel_tool_node import CANCELLED_MESSAGE
+from step_limits import StepLimits
+
+@tool
+async def fast_lookup(text: str) -> str:
+    """Return the text immediately."""
+    return f"fast:{text}"
+
+@tool
+async def slow_lookup(text: str) -> str:
+    """Return the text after a long delay."""
+    await asyncio.sleep(5)
+    return f"slow:{text}"
+
+def test_time_budget_cancels_slow_tools():
+    model = ScriptedChatModel(rules=[
+        ScriptRule(r"lookup", [[("fast_lookup", {"text": "a"}), ("slow_lookup", {"text": "b"})]], "{results}"),
+    ])
+    graph = create_graph(model, [fast_lookup, slow_lookup], limits=StepLimits(time_budget_s=0.5), verbose=False)
+
+    started = time.monotonic()
+    result = asyncio.run(graph.ainvoke({"messages": [{"role": "user", "content": "lookup both"}]}))
+    assert time.monotonic() - started < 2
+
+    tool_messages = {m.name: m for m in result["messages"] if m.type == "tool"}
+    assert tool_messages["fast_lookup"].content == "fast:a"
+    assert tool_messages["slow_lookup"].content == CANCELLED_MESSAGE
+    answer = result["messages"][-1]
+    assert answer.response_metadata["stopped_by"] == "time_budget"
+    assert "fast:a" in answer.content
+
+def test_no_budget_waits_for_tools():
+    limits = StepLimits()
+    assert limits.deadline(time.monotonic()) is None
+    assert limits.remaining(time.monotonic()) is None
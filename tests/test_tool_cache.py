@@ -0,0 +1,123 @@
+"""tool_cache.py 的单元测试：过期、LRU 淘汰、参数归一化和并发调用合并"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from langchain_core.tools import tool
+import tool_cache
+from tool_cache import ToolResultCache, apply_tool_cache, cache_tool, round_coordinates
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动拨动的时钟，替换 tool_cache 使用的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(tool_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def counting_tool(results=None):
+    """返回 (工具, 调用记录)，工具返回参数本身或 results 中的值"""
+    calls = []
+
+    @tool
+    def echo(value: float) -> list:
+        """Return the value in a list."""
+        calls.append(value)
+        return [value] if results is None else results
+    return echo, calls
+
+def test_ttl_expiry(clock):
+    cache = ToolResultCache()
+    cache.set(("echo", "{}"), "result", ttl=60)
+    clock[0] += 59
+    assert cache.get(("echo", "{}")) == (True, "result")
+    clock[0] += 2
+    assert cache.get(("echo", "{}")) == (False, None)
+    assert len(cache) == 0
+
+def test_no_ttl_never_expires(clock):
+    cache = ToolResultCache()
+    cache.set(("echo", "{}"), "result", ttl=None)
+    clock[0] += 10 ** 9
+    assert cache.get(("echo", "{}")) == (True, "result")
+
+def test_lru_eviction():
+    cache = ToolResultCache(max_size=2)
+    cache.set(("t", "a"), 1, ttl=None)
+    cache.set(("t", "b"), 2, ttl=None)
+    assert cache.get(("t", "a"))[0]  # a 变为最近使用
+    cache.set(("t", "c"), 3, ttl=None)
+    assert cache.get(("t", "b")) == (False, None)
+    assert cache.get(("t", "a")) == (True, 1)
+    assert cache.get(("t", "c")) == (True, 3)
+
+def test_int_and_float_args_are_different_keys():
+    echo, calls = counting_tool()
+    cached = cache_tool(echo, ToolResultCache(), ttl=None)
+    cached.func(value=16)
+    cached.func(value=16.0)
+    cached.func(value=16)
+    assert calls == [16, 16.0]
+
+def test_normalize_and_injected_args():
+    key = tool_cache._make_key("get_forecast", (), {"latitude": 37.77493, "longitude": -122.41942, "config": {}},
+                               round_coordinates(2))
+    assert key == tool_cache._make_key("get_forecast", (), {"latitude": 37.7712, "longitude": -122.4199},
+                                       round_coordinates(2))
+    assert key != tool_cache._make_key("get_forecast", (), {"latitude": 37.79, "longitude": -122.42},
+                                       round_coordinates(2))
+
+def test_mutable_results_are_copied():
+    echo, calls = counting_tool(results=["a"])
+    cached = cache_tool(echo, ToolResultCache(), ttl=None)
+    first = cached.func(value=1)
+    first.append("changed")
+    second = cached.func(value=1)
+    assert second == ["a"] and len(calls) == 1
+    second.append("changed")
+    assert cached.func(value=1) == ["a"]
+
+def test_only_tools_with_policy_are_cached():
+    echo, calls = counting_tool()
+    assert apply_tool_cache([echo], ToolResultCache(), policies={})[0] is echo
+    assert apply_tool_cache([echo], ToolResultCache(), policies={"echo": {"ttl": 0}})[0] is echo
+    cached = apply_tool_cache([echo], ToolResultCache(), policies={"echo": {"ttl": 60}})[0]
+    cached.func(value=1)
+    cached.func(value=1)
+    assert calls == [1]
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    @tool
+    async def slow_lookup(query: str) -> dict:
+        """Look up the query after a short delay."""
+        calls.append(query)
+        await asyncio.sleep(0.05)
+        return {"query": query}
+
+    cached = cache_tool(slow_lookup, ToolResultCache(), ttl=None)
+
+    async def main():
+        return await asyncio.gather(*(cached.coroutine(query="x") for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == ["x"]
+    assert results == [{"query": "x"}] * 5
+    # 每个等待者拿到各自的副本
+    assert len({id(r) for r in results}) == 5
+
+def test_failed_calls_are_not_cached():
+    calls = []
+
+    @tool
+    async def flaky(query: str) -> str:
+        """Fail on the first call."""
+        calls.append(query)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    cached = cache_tool(flaky, ToolResultCache(), ttl=None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(cached.coroutine(query="x"))
+    assert asyncio.run(cached.coroutine(query="x")) == "ok"
+    assert len(calls) == 2
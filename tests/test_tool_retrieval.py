@@ -0,0 +1,76 @@
+"""tool_retrieval.py 的单元测试：关键词按整词/最长优先匹配，天气、搜索和数学问题选出正确的工具"""
+import pytest
+from langchain_core.tools import tool
+import langgraph_tools
+from tool_retrieval import ToolIndex
+
+# 与 benchmarks/mock_mcp_server.py 中的 MCP 工具同名、同描述
+@tool
+async def get_alerts(state: str) -> str:
+    """Get weather alerts for a US state.
+
+    Args:
+        state: Two-letter US state code (e.g. CA, NY)
+    """
+    return ""
+
+@tool
+async def get_forecast(latitude: float, longitude: float) -> str:
+    """Get weather forecast for a location.
+
+    Args:
+        latitude: Latitude of the location
+        longitude: Longitude of the location
+    """
+    return ""
+
+@tool
+async def webSearchPro(search_query: str) -> str:
+    """Search the web and return summarized results.
+
+    Args:
+        search_query: Search keywords
+    """
+    return ""
+
+LOCAL_TOOLS = ["add", "multiply", "subtract", "divide", "square_root", "power", "concatenate", "to_uppercase",
+               "to_lowercase", "evaluate_expression", "elementwise", "batch_square_root", "aggregate"]
+
+@pytest.fixture(scope="module")
+def index():
+    tools = [getattr(langgraph_tools, name) for name in LOCAL_TOOLS] + [get_alerts, get_forecast, webSearchPro]
+    return ToolIndex(tools, embedder=None)
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the weather forecast in Denver tomorrow?", "get_forecast"),
+    ("Are there any severe weather alerts in California?", "get_alerts"),
+    ("Search for the latest news about AI", "webSearchPro"),
+    ("16的平方根是多少？", "square_root"),
+    ("计算3的平方", "power"),
+    ("What is 2 to the power of 10?", "power"),
+    ("10 除以 4 等于多少？", "divide"),
+    ("计算3加5", "add"),
+    ("把 hello 转成大写", "to_uppercase"),
+])
+def test_top_tool(index, question, expected):
+    assert index.scores(question)[0][1].name == expected
+    assert expected in [t.name for t in index.select(question, k=4)]
+
+@pytest.mark.parametrize("question, absent", [
+    ("16的平方根是多少？", "power"),  # "平方根" 不算 "平方"
+    ("除了加州，还有哪些州有天气预警？", "divide"),
+    ("除了加州，还有哪些州有天气预警？", "add"),
+    ("今年的销量增加了多少？", "add"),
+    ("Summarize https://example.com/a/b for me", "divide"),  # 网址中的 /
+    ("计算3加5", "evaluate_expression"),  # "计算" 不再是关键词
+])
+def test_keyword_not_hit(index, question, absent):
+    assert absent not in index.keyword_hits(question)
+
+def test_expression_pattern(index):
+    assert index.keyword_hits("计算 23 + 45 的结果")["evaluate_expression"] == 1
+    assert "evaluate_expression" in [t.name for t in index.select("计算 (3 + 5) * 12 的结果", k=4)]
+    assert {"divide", "evaluate_expression"} <= {t.name for t in index.select("What is 10 / 4?", k=4)}
+
+def test_keyword_counted_once(index):
+    assert index.keyword_hits("Are there any severe weather alerts in California?")["get_alerts"] == 2
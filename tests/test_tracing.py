@@ -0,0 +1,52 @@
+"""tracing.py 的单元测试：区间数有上限，结束的运行从 _runs 中删除"""
+import json
+import asyncio
+from tracing import Tracer, run_config, use_tracer
+
+def record(tracer: Tracer, count: int) -> None:
+    for i in range(count):
+        with tracer.span(f"step-{i}", category="tool"):
+            pass
+
+def test_spans_bounded_without_spill():
+    tracer = Tracer(max_spans=100)
+    record(tracer, 1000)
+    assert len(tracer.spans) <= 100
+    summary = tracer.summary()
+    assert summary["spans"] == 1000
+    assert summary["by_category"]["tool"]["count"] == 1000
+
+def test_spilled_spans_exported(tmp_path):
+    spill = tmp_path / "trace.json.spill"
+    tracer = Tracer(max_spans=100, spill_path=str(spill))
+    with tracer.span("run", category="run"):
+        record(tracer, 500)
+    assert len(tracer.spans) <= 100
+    assert spill.exists()
+
+    path = tracer.export(str(tmp_path / "trace.json"))
+    with open(path, encoding="utf-8") as f:
+        events = [e for e in json.load(f)["traceEvents"] if e["ph"] == "X"]
+    assert len(events) == 501
+    # 最早打开、最后结束的 run 区间一直留在内存中
+    assert any(span.name == "run" for span in tracer.spans)
+    tracer.close()
+    assert not spill.exists()
+
+def test_runs_pruned_after_graph_run():
+    from agent_langgraph import create_graph
+    from fake_llm import ScriptedChatModel
+    from langgraph_tools import square_root
+
+    graph = create_graph(ScriptedChatModel(), [square_root], verbose=False)
+    tracer = Tracer()
+
+    async def run():
+        with use_tracer(tracer):
+            for _ in range(3):
+                await graph.ainvoke({"messages": [{"role": "user", "content": "计算 16 的平方根"}]},
+                                    config=run_config())
+
+    asyncio.run(run())
+    assert tracer._runs == {} and tracer._aliases == set()
+    assert sum(1 for span in tracer.spans if span.category == "tool") == 3
@@ -0,0 +1,41 @@
+"""worker_pool.py 的测试：记录转换为 run_agent 的回答格式，多进程分片的结果按问题原顺序合并"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+import model_factory
+from agent_langgraph import AgentConfig
+from fake_llm import fake_chat_model
+from worker_pool import _response, run_agent_pool
+
+def record(**kwargs):
+    base = {"answer": "4", "success": True, "error": None, "cached": False, "tools": ["square_root"],
+            "stopped_by": None, "routed_to": [], "total_ms": 12.5}
+    base.update(kwargs)
+    return base
+
+def test_response_success():
+    assert _response("q", record()) == {"question": "q", "answer": "4", "success": True, "total_ms": 12.5}
+
+def test_response_failure_uses_error():
+    response = _response("q", record(answer=None, success=False, error="TimeoutError: slow"))
+    assert response["answer"] == "错误: TimeoutError: slow" and not response["success"]
+
+def test_response_cached_and_routed():
+    response = _response("q", record(cached=True, routed_to=["fake:fallback"]))
+    assert response["cached"] is True
+    assert response["routed_to"] == ["fake:fallback"]
+
+def test_shards_merged_in_question_order(monkeypatch):
+    # 注册的模型工厂会传给 spawn 出来的工作进程
+    monkeypatch.setitem(model_factory._model_factories, "fake", fake_chat_model)
+    monkeypatch.delenv("LLM_FALLBACKS", raising=False)
+    numbers = list(range(1, 25))
+    questions = [f"What is the square root of {n * n}?" for n in numbers]
+    config = AgentConfig(llm="fake", tools=["square_root"], stream=False, workers=2, worker_concurrency=3)
+
+    result = asyncio.run(run_agent_pool(SimpleNamespace(questions=questions), config, shard_size=1))
+
+    assert result["successful_tests"] == len(questions)
+    assert [r["question"] for r in result["responses"]] == questions
+    assert [r["answer"] for r in result["responses"]] == [f"{n * n} 的平方根是 {n}" for n in numbers]
+    assert sum(stats["questions"] for stats in result["workers"].values()) == len(questions)
@@ -0,0 +1,261 @@
+import copy
+import json
+import time
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.tools import BaseTool
+from tracing import span
+
+# LangChain 注入给工具函数的参数，不参与缓存键
+_INJECTED_ARGS = {"callbacks", "run_manager", "config"}
+
+def round_coordinates(precision: int = 2) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    坐标参数归一化：把 latitude/longitude 四舍五入到指定小数位
+
+    小数点后两位约为1公里，天气预报在这个精度下没有区别。
+    """
+    def normalize(args: Dict[str, Any]) -> Dict[str, Any]:
+        args = dict(args)
+        for key in ("latitude", "longitude"):
+            if isinstance(args.get(key), (int, float)):
+                args[key] = round(float(args[key]), precision)
+        return args
+    return normalize
+
+def upper_strip(*keys: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """字符串参数归一化：去掉首尾空白并转为大写（例如州代码 ca -> CA）"""
+    def normalize(args: Dict[str, Any]) -> Dict[str, Any]:
+        args = dict(args)
+        for key in keys:
+            if isinstance(args.get(key), str):
+                args[key] = args[key].strip().upper()
+        return args
+    return normalize
+
+def strip_query(*keys: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """搜索参数归一化：去掉首尾空白并合并连续空白"""
+    def normalize(args: Dict[str, Any]) -> Dict[str, Any]:
+        args = dict(args)
+        for key in keys:
+            if isinstance(args.get(key), str):
+                args[key] = " ".join(args[key].split())
+        return args
+    return normalize
+
+# 每个工具的缓存策略：ttl 为缓存秒数（None 表示不过期，0 表示不缓存），normalize 为参数归一化函数
+DEFAULT_TOOL_CACHE_POLICIES: Dict[str, Dict[str, Any]] = {
+    # 本地数学/字符串工具是纯函数，结果不会变化
+    "add": {"ttl": None},
+    "multiply": {"ttl": None},
+    "subtract": {"ttl": None},
+    "divide": {"ttl": None},
+    "square_root": {"ttl": None},
+    "power": {"ttl": None},
+    "concatenate": {"ttl": None},
+    "to_uppercase": {"ttl": None},
+    "to_lowercase": {"ttl": None},
+    "evaluate_expression": {"ttl": None, "normalize": strip_query("expression")},
+    "elementwise": {"ttl": None},
+    "batch_square_root": {"ttl": None},
+    "aggregate": {"ttl": None},
+    # 天气数据更新较快
+    "get_forecast": {"ttl": 600, "normalize": round_coordinates(2)},
+    "get_alerts": {"ttl": 120, "normalize": upper_strip("state")},
+    # 搜索结果
+    "webSearchPro": {"ttl": 900, "normalize": strip_query("search_query")},
+    "tavily-search": {"ttl": 900, "normalize": strip_query("query")},
+}
+
+# 策略中没有写 ttl 时使用的缓存时间（未配置策略的工具不缓存）
+DEFAULT_TTL = 300
+
+# 不可变的结果直接返回，其余结果在写入和读取缓存时复制，避免调用方修改缓存中的对象
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+def _copy(value: Any) -> Any:
+    return value if isinstance(value, _IMMUTABLE_TYPES) else copy.deepcopy(value)
+
+class ToolResultCache:
+    """
+    工具结果缓存（带过期时间的 LRU）
+
+    键为 (工具名, 归一化后的参数)，超过 max_size 时淘汰最久未使用的条目。
+    同一个键的并发异步调用只会真正执行一次，其余调用等待同一个结果。
+    可变的结果（列表、字典等）存入和取出时都会复制，调用方修改返回值不会影响缓存。
+    """
+
+    def __init__(self, max_size: int = 512):
+        """
+        参数:
+            max_size: 最多缓存的结果数
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[float], Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        """查找缓存，返回 (是否命中, 结果)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, _copy(value)
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Tuple[str, str], value: Any, ttl: Optional[float]) -> None:
+        """写入缓存，必要时淘汰最久未使用的条目"""
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        value = _copy(value)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+# 进程内共享的默认缓存，同一会话中的所有智能体共用
+default_tool_cache = ToolResultCache()
+
+def _make_key(tool_name: str, args: tuple, kwargs: Dict[str, Any],
+              normalize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]) -> Tuple[str, str]:
+    """根据工具名和参数生成缓存键"""
+    call_args = {k: v for k, v in kwargs.items() if k not in _INJECTED_ARGS}
+    if args:
+        call_args["__args__"] = list(args)
+    if normalize is not None:
+        call_args = normalize(call_args)
+    # 整数和浮点数保持区分：add(2, 3) 返回 5，add(2.0, 3.0) 返回 5.0
+    return tool_name, json.dumps(call_args, sort_keys=True, ensure_ascii=False, default=str)
+
+def cache_tool(tool: BaseTool, cache: Optional[ToolResultCache] = None, ttl: Optional[float] = DEFAULT_TTL,
+               normalize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> BaseTool:
+    """
+    为单个工具加上结果缓存
+
+    支持本地 @tool 函数（func）和 MCP 加载的工具（coroutine），出错的调用不会被缓存。
+
+    参数:
+        tool: 要包装的工具
+        cache: 使用的缓存，默认为进程内共享的 default_tool_cache
+        ttl: 缓存秒数，None 表示不过期
+        normalize: 参数归一化函数，返回用于生成缓存键的参数字典
+
+    返回:
+        加上缓存后的工具副本
+    """
+    cache = cache if cache is not None else default_tool_cache
+    update = {}
+
+    func = getattr(tool, "func", None)
+    if func is not None:
+        @functools.wraps(func)
+        def cached_func(*args: Any, **kwargs: Any) -> Any:
+            key = _make_key(tool.name, args, kwargs, normalize)
+            with span("tool_cache.lookup", category="cache", tool=tool.name) as lookup:
+                hit, value = cache.get(key)
+                if lookup is not None:
+                    lookup.attributes["hit"] = hit
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            cache.set(key, value, ttl)
+            return value
+        update["func"] = cached_func
+
+    coroutine = getattr(tool, "coroutine", None)
+    if coroutine is not None:
+        @functools.wraps(coroutine)
+        async def cached_coroutine(*args: Any, **kwargs: Any) -> Any:
+            key = _make_key(tool.name, args, kwargs, normalize)
+            with span("tool_cache.lookup", category="cache", tool=tool.name) as lookup:
+                hit, value = cache.get(key)
+                if lookup is not None:
+                    lookup.attributes["hit"] = hit
+            if hit:
+                return value
+
+            # 相同参数的调用正在进行时，等待它的结果而不是再发一次请求
+            inflight = cache._inflight.get(key)
+            if inflight is not None:
+                try:
+                    return _copy(await asyncio.shield(inflight))
+                except asyncio.CancelledError:
+                    if not inflight.cancelled():
+                        raise
+                    # 发起调用的一方被取消了，由当前调用自己执行
+
+            future = asyncio.get_running_loop().create_future()
+            cache._inflight[key] = future
+            try:
+                value = await coroutine(*args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()  # 避免没有等待者时出现 "exception was never retrieved"
+                raise
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                cache._inflight.pop(key, None)
+            cache.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        update["coroutine"] = cached_coroutine
+
+    if not update:
+        return tool
+    return tool.model_copy(update=update)
+
+def apply_tool_cache(tools: List[BaseTool], cache: Optional[ToolResultCache] = None,
+                     policies: Optional[Dict[str, Dict[str, Any]]] = None) -> List[BaseTool]:
+    """
+    按策略为工具列表加上结果缓存
+
+    参数:
+        tools: 工具列表（本地工具和MCP工具均可）
+        cache: 使用的缓存，默认为 default_tool_cache
+        policies: 每个工具的缓存策略，默认为 DEFAULT_TOOL_CACHE_POLICIES；
+            只缓存配置了策略的工具，未配置或 ttl 为0的工具原样返回
+
+    返回:
+        加上缓存后的工具列表
+    """
+    policies = policies if policies is not None else DEFAULT_TOOL_CACHE_POLICIES
+    cached_tools = []
+    for tool in tools:
+        policy = policies.get(tool.name)
+        if policy is None or policy.get("ttl", DEFAULT_TTL) == 0:
+            cached_tools.append(tool)
+            continue
+        cached_tools.append(cache_tool(tool, cache, policy.get("ttl", DEFAULT_TTL), policy.get("normalize")))
+    return cached_tools
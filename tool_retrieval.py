@@ -0,0 +1,170 @@
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from answer_cache import cosine, lexical_vector, load_embedder
+
+# 工具的中英文关键词（问题多为中文，而工具描述是英文）；未列出的工具只按名称和描述匹配
+TOOL_KEYWORDS: Dict[str, List[str]] = {
+    "add": ["加", "相加", "加上", "之和", "plus", "sum of", "+"],
+    "subtract": ["减", "减去", "相减", "之差", "minus", "subtract"],
+    "multiply": ["乘", "乘以", "相乘", "之积", "times", "multiply", "*", "×"],
+    "divide": ["除", "除以", "相除", "之商", "divided", "divide", "/", "÷"],
+    "square_root": ["平方根", "开方", "根号", "square root", "sqrt"],
+    "power": ["次方", "次幂", "乘方", "平方", "立方", "power", "^", "**"],
+    "evaluate_expression": ["算式", "表达式", "四则运算", "混合运算", "evaluate", "expression"],
+    "elementwise": ["逐个", "逐元素", "对应", "每个元素", "两组", "elementwise", "element-wise"],
+    "batch_square_root": ["批量", "一组数", "这些数", "每个数的平方根", "batch"],
+    "aggregate": ["总和", "求和", "平均", "最大值", "最小值", "average", "mean", "total", "maximum", "minimum"],
+    "concatenate": ["拼接", "连接", "合并", "concatenate", "join"],
+    "to_uppercase": ["大写", "uppercase", "upper case"],
+    "to_lowercase": ["小写", "lowercase", "lower case"],
+    "get_alerts": ["预警", "警报", "警告", "灾害", "alert", "alerts", "warning", "severe"],
+    "get_forecast": ["天气", "预报", "气温", "温度", "下雨", "forecast", "weather", "temperature", "rain"],
+    "webSearchPro": ["搜索", "最新", "最近", "新闻", "进展", "有哪些", "是什么", "趋势",
+                     "search", "news", "latest", "recent"],
+}
+
+# 按正则匹配的提示：问题里出现算式（数字之间有运算符）时才提示 evaluate_expression，
+# 而不是 "计算"、"结果" 这类几乎每个数学问题都有的词
+TOOL_PATTERNS: Dict[str, List[str]] = {
+    "evaluate_expression": [r"[\d)]\s*[-+*/^×÷]\s*[\d(]"],
+}
+
+# 包含关键词但与工具无关的常用词（"除了"不是除法，"加州"不是加法），匹配时和关键词一起按最长优先消耗掉
+KEYWORD_EXCLUSIONS: List[str] = [
+    "除了", "除外", "除非", "删除", "清除", "排除", "去除", "解除",
+    "增加", "更加", "参加", "附加", "加州", "加拿大", "加利福尼亚", "加油", "加速",
+    "减少", "乘坐", "乘客", "平方米", "平方公里", "平方英尺",
+]
+
+# 每命中一个关键词增加的分数（描述的相似度在 0~1 之间）
+KEYWORD_WEIGHT = 0.5
+
+# 匹配关键词前去掉的网址（其中的 / 不是除号）
+_URL = re.compile(r"https?://\S+|www\.\S+")
+
+def _keyword_pattern(keyword: str) -> str:
+    """英文关键词按整词匹配，运算符号只在数字或括号之间匹配，中文关键词按原文匹配"""
+    escaped = re.escape(keyword)
+    if re.fullmatch(r"[a-z][a-z -]*", keyword):
+        return rf"\b{escaped}\b"
+    if re.fullmatch(r"[+\-*/^]+", keyword):
+        return rf"(?:(?<=[\d)])|(?<=[\d)]\s)){escaped}(?=\s?[\d(])"
+    return escaped
+
+def _split_name(name: str) -> str:
+    """webSearchPro / square_root -> "web search pro" / "square root" """
+    return re.sub(r"(?<=[a-z])(?=[A-Z])|_", " ", name).lower()
+
+def tool_text(tool: BaseTool) -> str:
+    """用于检索的工具文本：名称、描述和参数名"""
+    args = " ".join(_split_name(arg) for arg in (tool.args or {}))
+    return f"{_split_name(tool.name)} {tool.description or ''} {args}".lower()
+
+def tool_schema_chars(tools: Sequence[BaseTool]) -> int:
+    """工具定义（OpenAI 格式）序列化后的字符数，即每次调用模型时工具部分的提示词大小"""
+    return len(json.dumps([convert_to_openai_tool(tool) for tool in tools], ensure_ascii=False))
+
+class ToolIndex:
+    """
+    工具检索索引
+
+    创建时为每个工具预先计算名称+描述的向量（有本地向量模型时用向量模型，否则用词法向量，
+    见 answer_cache.load_embedder），检索时按 问题与描述的相似度 + 关键词命中数 排序，
+    选出最相关的 k 个工具。没有任何工具与问题相关时返回全部工具，由模型自己判断。
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], keywords: Optional[Dict[str, List[str]]] = None,
+                 embedder: Optional[Callable[[str], Sequence[float]]] = None, min_score: float = 0.15):
+        """
+        参数:
+            tools: 全部工具
+            keywords: 工具名 -> 关键词列表，默认为 TOOL_KEYWORDS
+            embedder: 文本向量函数，默认尝试 load_embedder()，没有时使用词法向量
+            min_score: 最相关的工具低于这个分数时认为没有相关工具，返回全部工具
+        """
+        self.tools = list(tools)
+        self.keywords = keywords if keywords is not None else TOOL_KEYWORDS
+        self.embedder = embedder if embedder is not None else load_embedder()
+        self.min_score = min_score
+        self._vectors = [self._vector(tool_text(tool)) for tool in self.tools]
+        # 所有关键词合成一个正则，按长度从长到短排列：同一位置优先匹配最长的词（"平方根"而不是"平方"）
+        self._keyword_tools: Dict[str, List[str]] = {word.lower(): [] for word in KEYWORD_EXCLUSIONS}
+        for name, words in self.keywords.items():
+            for word in words:
+                self._keyword_tools.setdefault(word.lower(), []).append(name)
+        words = sorted(self._keyword_tools, key=len, reverse=True)
+        self._keyword_re = re.compile("|".join(f"({_keyword_pattern(word)})" for word in words))
+        self._keyword_words = words
+
+    def _vector(self, text: str) -> Any:
+        if self.embedder is not None:
+            return self.embedder(text)
+        return lexical_vector(" ".join(re.findall(r"[a-z0-9]+|[一-鿿]+", text.lower())))
+
+    def keyword_hits(self, question: str) -> Dict[str, int]:
+        """
+        每个工具命中的关键词数（同一个关键词只算一次）
+
+        问题从左到右扫描，每个位置取最长的关键词或排除词，匹配过的文字不再参与其他匹配；
+        TOOL_PATTERNS 中的正则另外匹配，每个命中的正则算一个关键词。
+        """
+        text = _URL.sub(" ", question.lower())
+        matched = set()
+        for match in self._keyword_re.finditer(text):
+            matched.add(self._keyword_words[match.lastindex - 1])
+        hits: Dict[str, int] = {}
+        for word in matched:
+            for name in self._keyword_tools[word]:
+                hits[name] = hits.get(name, 0) + 1
+        for name, patterns in TOOL_PATTERNS.items():
+            count = sum(1 for pattern in patterns if re.search(pattern, text))
+            if count:
+                hits[name] = hits.get(name, 0) + count
+        return hits
+
+    def scores(self, question: str) -> List[Tuple[float, BaseTool]]:
+        """所有工具与问题的相关度，从高到低排列"""
+        vector = self._vector(question)
+        hits = self.keyword_hits(question)
+        scored = []
+        for tool, tool_vector in zip(self.tools, self._vectors):
+            scored.append((cosine(vector, tool_vector) + KEYWORD_WEIGHT * hits.get(tool.name, 0), tool))
+        return sorted(scored, key=lambda item: item[0], reverse=True)
+
+    def select(self, question: str, k: int = 4) -> List[BaseTool]:
+        """
+        选出与问题最相关的 k 个工具
+
+        参数:
+            question: 用户问题
+            k: 最多选出的工具数
+
+        返回:
+            工具列表（保持原来的顺序，便于缓存绑定结果）
+        """
+        scored = self.scores(question)
+        if not scored or scored[0][0] < self.min_score:
+            return list(self.tools)
+        selected = {tool.name for score, tool in scored[:k] if score >= self.min_score}
+        return [tool for tool in self.tools if tool.name in selected]
+
+def make_tool_selector(model: Any, tools: Sequence[BaseTool], k: int) -> Callable[[str], Any]:
+    """
+    返回 问题 -> 只绑定了相关工具的模型 的函数
+
+    相同的工具子集只绑定一次（bind_tools 会转换全部工具定义，开销不小）。
+    """
+    index = ToolIndex(tools)
+    bound: Dict[Tuple[str, ...], Any] = {}
+
+    def select(question: str) -> Any:
+        subset = index.select(question, k)
+        key = tuple(tool.name for tool in subset)
+        if key not in bound:
+            bound[key] = model.bind_tools(subset)
+        return bound[key]
+
+    return select
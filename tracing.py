@@ -0,0 +1,447 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+# 只依赖标准库：weather.py 服务器也可以直接使用；LangChain 回调在用到时才导入
+
+# OpenTelemetry 的 SpanKind 取值
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_current_tracer: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar("current_tracer", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+@dataclass
+class Span:
+    """一段计时区间，parent_id 指向父区间（根区间为None）"""
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    kind: str = "internal"
+    category: str = "step"  # step / llm / tool / mcp / cache / question ...
+    start_ns: int = 0
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+def _attribute_value(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= 500 else text[:500] + "..."
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Tracer:
+    """
+    记录一次运行中各个步骤的耗时区间
+
+    区间之间有父子关系：tracer.span() / span() 打开的区间是其中再打开的区间的父区间，
+    通过 callback_handler() 记录的图节点、LLM调用和工具调用按 LangChain 的运行层级
+    挂在对应的父区间下。结果可以导出为 OpenTelemetry (OTLP JSON) 或 Chrome trace 格式，
+    后者可以直接在 chrome://tracing 或 https://ui.perfetto.dev 中以火焰图查看。
+
+    内存中最多保留 max_spans 个区间（长时间运行的 weather.py 服务器也不会无限增长）：超出时最早结束的
+    区间被移出，有 spill_path 时按 JSON 行追加写入该文件，导出时与内存中的区间合并；没有时直接丢弃，
+    只计入 summary() 的统计。
+    """
+
+    def __init__(self, service_name: str = "agent", trace_id: Optional[str] = None, max_spans: int = 50000,
+                 spill_path: Optional[str] = None):
+        """
+        参数:
+            service_name: 服务名，导出时作为 OTel 的 service.name 和 Chrome trace 的进程名
+            trace_id: 32位十六进制的 trace ID，默认随机生成
+            max_spans: 内存中保留的区间数上限
+            spill_path: 移出内存的区间写入的文件（JSON 行），None 表示丢弃
+        """
+        self.service_name = service_name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.max_spans = max_spans
+        self.spill_path = spill_path
+        self.spans: List[Span] = []
+        self.evicted = 0  # 移出内存的区间数
+        self._evicted_by_category: Dict[str, Dict[str, float]] = {}
+        self._runs: Dict[Any, Optional[Span]] = {}  # 进行中的 LangChain run_id -> 对应的区间，运行结束时删除
+        self._aliases: Set[Any] = set()  # 不单独记录的运行（_runs 中为最近的祖先区间）
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        if spill_path is not None and os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    def start_span(self, name: str, parent: Optional[Span] = None, kind: str = "internal",
+                   category: str = "step", **attributes: Any) -> Span:
+        span = Span(
+            name=name,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent is not None else None,
+            kind=kind,
+            category=category,
+            start_ns=time.time_ns(),
+            attributes={k: _attribute_value(v) for k, v in attributes.items()},
+        )
+        evicted: List[Span] = []
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) > self.max_spans:
+                evicted = self._evict()
+        if evicted:
+            self._spill(evicted)
+        return span
+
+    def _evict(self) -> List[Span]:
+        """移出最早结束的区间，降到 max_spans 的 3/4（调用方持有 _lock）"""
+        target = len(self.spans) - self.max_spans * 3 // 4
+        keep: List[Span] = []
+        evicted: List[Span] = []
+        for span in self.spans:
+            if len(evicted) < target and span.end_ns is not None:
+                evicted.append(span)
+            else:
+                keep.append(span)
+        self.spans = keep
+        self.evicted += len(evicted)
+        for span in evicted:
+            entry = self._evicted_by_category.setdefault(span.category, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += span.duration_ms
+        return evicted
+
+    def _spill(self, spans: List[Span]) -> None:
+        if self.spill_path is None:
+            return
+        with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(asdict(span), ensure_ascii=False) + "\n")
+
+    def all_spans(self) -> List[Span]:
+        """写入 spill_path 的区间加上内存中的区间（导出时使用）"""
+        spans: List[Span] = []
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            with self._spill_lock, open(self.spill_path, encoding="utf-8") as f:
+                spans = [Span(**json.loads(line)) for line in f]
+        with self._lock:
+            return spans + list(self.spans)
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        span.end_ns = time.time_ns()
+        span.attributes.update({k: _attribute_value(v) for k, v in attributes.items()})
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+
+    def _parent(self) -> Optional[Span]:
+        """当前的父区间：上下文中打开的区间和正在执行的 LangChain 运行中，较晚开始的那个"""
+        parent = _current_span.get()
+        if "langchain_core" in sys.modules:
+            from langchain_core.runnables.config import var_child_runnable_config
+
+            callbacks = (var_child_runnable_config.get() or {}).get("callbacks")
+            run_span = self._runs.get(getattr(callbacks, "parent_run_id", None))
+            if run_span is not None and (parent is None or run_span.start_ns > parent.start_ns):
+                parent = run_span
+        return parent
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", category: str = "step", **attributes: Any) -> Iterator[Span]:
+        """打开一个区间，代码块结束时关闭；代码块中抛出的异常记录在区间上"""
+        span = self.start_span(name, self._parent(), kind, category, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+    def callback_handler(self) -> Any:
+        """返回记录图节点、LLM调用和工具调用的 LangChain 回调"""
+        return _handler_class()(self)
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        """
+        汇总各类区间的耗时
+
+        返回:
+            {"spans": 区间数, "by_category": {类别: {"count", "total_ms"}}, "slowest": [(名称, 毫秒), ...]}
+            （slowest 只在内存中的区间里查找）
+        """
+        with self._lock:
+            spans = list(self.spans)
+            by_category = {category: dict(entry) for category, entry in self._evicted_by_category.items()}
+        for span in spans:
+            entry = by_category.setdefault(span.category, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += span.duration_ms
+        leaves = [s for s in spans if s.category not in ("run", "question", "graph")]
+        slowest = sorted(leaves, key=lambda s: s.duration_ms, reverse=True)[:top]
+        return {
+            "spans": len(spans) + self.evicted,
+            "by_category": by_category,
+            "slowest": [(s.name, s.duration_ms) for s in slowest],
+        }
+
+    def to_otel(self) -> Dict[str, Any]:
+        """导出为 OTLP JSON（可以用 OpenTelemetry Collector 的 otlpjsonfile 接收器导入）"""
+        spans = []
+        for span in self.all_spans():
+            attributes = dict(span.attributes, **{"span.category": span.category})
+            otel_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": SPAN_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else span.start_ns),
+                "attributes": [{"key": k, "value": _otel_value(v)} for k, v in attributes.items() if v is not None],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otel_span["parentSpanId"] = span.parent_id
+            spans.append(otel_span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "weather-mcp.tracing"}, "spans": spans}],
+        }]}
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """
+        导出为 Chrome trace 格式（完整事件 "X"，时间为微秒级 Unix 时间戳）
+
+        并行执行的区间（例如同一步中的多个工具调用）放在不同的线程行中，
+        每一行内的区间严格嵌套，火焰图才能正确显示。
+        """
+        pid = os.getpid()
+        all_spans = self.all_spans()
+        by_id = {span.span_id: span for span in all_spans}
+        lanes: List[List[Span]] = []  # 每一行当前打开的区间栈
+        lane_of: Dict[str, int] = {}
+
+        def is_ancestor(candidate: Span, span: Span) -> bool:
+            parent_id = span.parent_id
+            while parent_id is not None:
+                if parent_id == candidate.span_id:
+                    return True
+                parent_id = getattr(by_id.get(parent_id), "parent_id", None)
+            return False
+
+        def fits(lane: List[Span], span: Span) -> bool:
+            while lane and (lane[-1].end_ns or 0) <= span.start_ns:
+                lane.pop()
+            return not lane or is_ancestor(lane[-1], span)
+
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.service_name}}]
+        for span in sorted(all_spans, key=lambda s: (s.start_ns, -(s.end_ns or s.start_ns))):
+            preferred = lane_of.get(span.parent_id)
+            candidates = ([preferred] if preferred is not None else []) + list(range(len(lanes)))
+            lane = next((i for i in candidates if fits(lanes[i], span)), None)
+            if lane is None:
+                lanes.append([])
+                lane = len(lanes) - 1
+            lanes[lane].append(span)
+            lane_of[span.span_id] = lane
+            end_ns = span.end_ns if span.end_ns is not None else span.start_ns
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": (end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": lane + 1,
+                "args": dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id,
+                             **({"error": span.error} if span.error else {})),
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str, fmt: str = "chrome") -> str:
+        """
+        把区间写入文件
+
+        参数:
+            path: 输出文件路径
+            fmt: "chrome"（Chrome trace / Perfetto）或 "otel"（OTLP JSON）
+        """
+        data = self.to_otel() if fmt == "otel" else self.to_chrome()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+    def close(self) -> None:
+        """删除 spill_path 文件（导出之后调用）"""
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+def current_tracer() -> Optional[Tracer]:
+    """当前上下文中启用的 Tracer，没有时返回None"""
+    return _current_tracer.get()
+
+@contextmanager
+def use_tracer(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """在代码块（及其中创建的任务）中启用 tracer，模块级的 span() 和 run_config() 会使用它"""
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+def span(name: str, kind: str = "internal", category: str = "step", **attributes: Any):
+    """在当前启用的 Tracer 中打开一个区间；没有启用时什么也不做（几乎没有开销）"""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, kind=kind, category=category, **attributes)
+
+def run_config() -> Optional[Dict[str, Any]]:
+    """传给 LangGraph ainvoke / astream_events 的运行配置：启用了 Tracer 时带上记录区间的回调"""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return None
+    return {"callbacks": [tracer.callback_handler()]}
+
+def merge_chrome_traces(paths: List[str], output: str) -> str:
+    """
+    合并多个进程的 Chrome trace 文件（例如智能体和 weather.py 服务器各自导出的文件）
+
+    时间戳都是 Unix 时间，合并后在同一条时间轴上按进程分行显示。
+    """
+    events = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            events.extend(json.load(f)["traceEvents"])
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return output
+
+_HANDLER_CLASS = None
+
+def _handler_class() -> type:
+    global _HANDLER_CLASS
+    if _HANDLER_CLASS is not None:
+        return _HANDLER_CLASS
+
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        """
+        把 LangChain/LangGraph 的运行记录为区间
+
+        图的每个节点（call_model、tools、fast_path 等）、每次LLM调用和每次工具调用各记录一个区间，
+        MCP 工具的区间类别为 mcp 并带上服务器名。节点内部的辅助运行（路由函数等）不单独记录。
+        """
+
+        run_inline = True  # 在调用方的上下文中同步执行，保证父子关系和时间准确
+
+        def __init__(self, tracer: Tracer):
+            self.tracer = tracer
+
+        def _parent(self, parent_run_id: Any) -> Optional[Span]:
+            if parent_run_id is None:
+                return _current_span.get()
+            return self.tracer._runs.get(parent_run_id)
+
+        def _start(self, run_id: Any, parent_run_id: Any, name: str, kind: str, category: str,
+                   **attributes: Any) -> None:
+            self.tracer._runs[run_id] = self.tracer.start_span(name, self._parent(parent_run_id), kind, category,
+                                                               **attributes)
+
+        def _end(self, run_id: Any, error: Optional[BaseException] = None, **attributes: Any) -> None:
+            # 运行结束后不会再有以它为父运行的子运行，从 _runs 中删除
+            span = self.tracer._runs.pop(run_id, None)
+            if run_id in self.tracer._aliases:
+                self.tracer._aliases.discard(run_id)  # 祖先的区间由祖先自己的运行结束
+                return
+            if span is not None and span.end_ns is None:
+                self.tracer.end_span(span, error=error, **attributes)
+
+        def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: Any, parent_run_id: Any = None,
+                           metadata: Optional[Dict[str, Any]] = None, name: Optional[str] = None, **kwargs: Any) -> None:
+            node = (metadata or {}).get("langgraph_node")
+            name = name or (serialized or {}).get("name", "chain")
+            if parent_run_id is None:
+                self._start(run_id, parent_run_id, name, "internal", "graph")
+            elif node is not None and name == node:
+                self._start(run_id, parent_run_id, node, "internal", "step",
+                            step=(metadata or {}).get("langgraph_step"))
+            else:
+                # 不单独记录，子运行挂到最近的祖先区间下
+                self.tracer._runs[run_id] = self._parent(parent_run_id)
+                self.tracer._aliases.add(run_id)
+
+        def on_chain_end(self, outputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+            self._end(run_id)
+
+        def on_chain_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+            self._end(run_id, error=error)
+
+        def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: Any, parent_run_id: Any = None,
+                                metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+            metadata = metadata or {}
+            self._start(run_id, parent_run_id, "llm", "client", "llm",
+                        model=metadata.get("ls_model_name"), provider=metadata.get("ls_provider"),
+                        input_messages=sum(len(batch) for batch in messages))
+
+        def on_llm_start(self, serialized: Any, prompts: Any, *, run_id: Any, parent_run_id: Any = None,
+                         **kwargs: Any) -> None:
+            self._start(run_id, parent_run_id, "llm", "client", "llm")
+
+        def on_llm_end(self, response: Any, *, run_id: Any, **kwargs: Any) -> None:
+            attributes = {}
+            try:
+                message = response.generations[0][0].message
+                usage = getattr(message, "usage_metadata", None) or {}
+                attributes = {
+                    "gen_ai.usage.input_tokens": usage.get("input_tokens"),
+                    "gen_ai.usage.output_tokens": usage.get("output_tokens"),
+                    "tool_calls": len(getattr(message, "tool_calls", []) or []),
+                }
+            except (AttributeError, IndexError):
+                pass
+            self._end(run_id, **attributes)
+
+        def on_llm_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+            self._end(run_id, error=error)
+
+        def on_tool_start(self, serialized: Any, input_str: str, *, run_id: Any, parent_run_id: Any = None,
+                          metadata: Optional[Dict[str, Any]] = None, inputs: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> None:
+            name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+            server = (metadata or {}).get("mcp_server")
+            self._start(run_id, parent_run_id, name, "client" if server else "internal", "mcp" if server else "tool",
+                        mcp_server=server, args=inputs if inputs is not None else input_str)
+
+        def on_tool_end(self, output: Any, *, run_id: Any, **kwargs: Any) -> None:
+            self._end(run_id, output_chars=len(str(getattr(output, "content", output))))
+
+        def on_tool_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+            self._end(run_id, error=error)
+
+    _HANDLER_CLASS = TracingCallbackHandler
+    return _HANDLER_CLASS
+
+if __name__ == "__main__":
+    # python tracing.py merged.json agent.trace.json weather.trace.json
+    if len(sys.argv) < 3:
+        print("用法: python tracing.py <输出文件> <trace文件> [<trace文件> ...]")
+        sys.exit(1)
+    print(f"✓ 已合并到 {merge_chrome_traces(sys.argv[2:], sys.argv[1])}")
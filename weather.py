@@ -1,6 +1,10 @@
+import os
+import sys
 from typing import Any
 import httpx
 from mcp.server.fastmcp import FastMCP
+from tracing import Tracer, span, use_tracer
+from mcp_transport import parse_server_args, run_server
 
 
 # Initialize FastMCP server
@@ -9,6 +13,9 @@ mcp = FastMCP("weather")
 # Constants
 NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "weather-app/1.0"
+# Set WEATHER_TRACE_FILE to record timed spans for every tool call and NWS request
+# (Chrome trace format; merge with the agent's trace via `python tracing.py`)
+TRACE_FILE = os.getenv("WEATHER_TRACE_FILE")
 
 async def make_nws_request(url: str) -> dict[str, Any] | None:
     """Make a request to the NWS API with proper error handling."""
@@ -16,13 +23,16 @@ async def make_nws_request(url: str) -> dict[str, Any] | None:
         "User-Agent": USER_AGENT,
         "Accept": "application/geo+json"
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    with span("nws_request", kind="client", category="http", url=url) as request_span:
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.get(url, headers=headers, timeout=30.0)
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                if request_span is not None:
+                    request_span.error = f"{type(e).__name__}: {e}"
+                return None
 
 def format_alert(feature: dict) -> str:
     """Format an alert feature into a readable string."""
@@ -42,6 +52,10 @@ async def get_alerts(state: str) -> str:
     Args:
         state: Two-letter US state code (e.g. CA, NY)
     """
+    with span("get_alerts", kind="server", category="tool", state=state):
+        return await _get_alerts(state)
+
+async def _get_alerts(state: str) -> str:
     url = f"{NWS_API_BASE}/alerts/active/area/{state}"
     data = await make_nws_request(url)
 
@@ -62,6 +76,10 @@ async def get_forecast(latitude: float, longitude: float) -> str:
         latitude: Latitude of the location
         longitude: Longitude of the location
     """
+    with span("get_forecast", kind="server", category="tool", latitude=latitude, longitude=longitude):
+        return await _get_forecast(latitude, longitude)
+
+async def _get_forecast(latitude: float, longitude: float) -> str:
     # First get the forecast grid endpoint
     points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
     points_data = await make_nws_request(points_url)
@@ -93,9 +111,21 @@ Forecast: {period['detailedForecast']}
 
 if __name__ == "__main__":
     # Initialize and run the server
-    print("This is a test message from weather.py.")
+    # --transport: http (default, serves /mcp and /sse), streamable-http, sse or stdio
+    args = parse_server_args("Weather MCP server")
+    # Messages go to stderr: with the stdio transport stdout carries the protocol
+    print("This is a test message from weather.py.", file=sys.stderr)
     # print(get_alerts("CA"))
     # print(get_forecast(37.7749, -122.4194))
-    print("the mcp server of weather is running successfully ......")
-    mcp.run(transport='sse')
+    print(f"the mcp server of weather is running successfully ({args.transport}) ......", file=sys.stderr)
+    # Spans beyond Tracer.max_spans are moved to <trace file>.spill so a long-running server stays bounded
+    tracer = Tracer("weather", spill_path=f"{TRACE_FILE}.spill") if TRACE_FILE else None
+    try:
+        with use_tracer(tracer):
+            run_server(mcp, args.transport, args.host, args.port)
+    finally:
+        if tracer is not None:
+            tracer.export(TRACE_FILE)
+            tracer.close()
+            print(f"trace written to {TRACE_FILE} ({tracer.summary()['spans']} spans)", file=sys.stderr)
     # mcp.run('sse')
@@ -0,0 +1,177 @@
+"""
+多进程智能体工作池
+
+一个事件循环处理大批量问题时，JSON 编解码、消息构建和工具 schema 处理会占满单个CPU核。
+工作池把问题分片交给多个进程：每个工作进程启动时按 AgentConfig 构建一次智能体，之后一直
+保持自己的 MCP 会话和模型连接池，在进程内再以有界并发处理分到的问题。各分片的结果按原顺序
+合并回与 run_agent 相同格式的结果字典。
+
+限流: 每个进程的限流器只分到 1/workers 的配额（见 rate_limiter.set_rate_limit_share），
+所有进程合计不超过提供方和MCP服务器的限额。
+
+用法:
+    AgentConfig(workers=4) 时 agent_langgraph.run_agent 自动使用工作池，也可以直接调用 run_agent_pool。
+"""
+import os
+import math
+import time
+import atexit
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Tuple
+
+# 工作进程内的状态：事件循环、MCP 会话和构建好的状态图在进程的整个生命周期内保持
+_worker: Dict[str, Any] = {}
+
+async def _hold_sessions(agent_config: Any, ready: "asyncio.Future", stop: asyncio.Event) -> None:
+    """
+    在同一个任务中打开和关闭MCP会话（anyio 要求会话在创建它的任务中退出）
+
+    构建好的状态图通过 ready 返回，之后一直等待到 stop 被设置。
+    """
+    from agent_langgraph import build_agent
+
+    try:
+        async with AsyncExitStack() as exit_stack:
+            # 多个进程的逐步耗时输出会交错，不打印
+            ready.set_result(await build_agent(agent_config, exit_stack, verbose=False))
+            await stop.wait()
+    except BaseException as e:
+        if not ready.done():
+            ready.set_exception(e)
+        raise
+
+def _init_worker(agent_config: Any, workers: int, model_factories: Dict[str, Any]) -> None:
+    """工作进程初始化：分摊限流配额，恢复父进程注册的模型工厂，构建智能体并保持连接"""
+    from model_factory import register_model_factory
+    from rate_limiter import set_rate_limit_share
+
+    set_rate_limit_share(1 / workers)
+    for prefix, factory in model_factories.items():
+        register_model_factory(prefix, factory)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    started = time.perf_counter()
+    ready = loop.create_future()
+    stop = asyncio.Event()
+    holder = loop.create_task(_hold_sessions(agent_config, ready, stop))
+    graph = loop.run_until_complete(ready)
+    _worker.update(loop=loop, holder=holder, stop=stop, graph=graph, agent_config=agent_config,
+                   startup_s=time.perf_counter() - started)
+    atexit.register(_close_worker)
+
+def _close_worker() -> None:
+    loop = _worker.get("loop")
+    if loop is not None and not loop.is_closed():
+        _worker["stop"].set()
+        loop.run_until_complete(_worker["holder"])
+        loop.close()
+
+def _run_shard(shard: List[Tuple[int, str]], concurrency: int) -> Dict[str, Any]:
+    """在工作进程中处理一个分片，返回 (序号, 回答记录) 列表和本进程的统计"""
+    from bulk_runner import answer_question
+    from answer_cache import default_answer_cache
+
+    graph = _worker["graph"]
+    if graph is None:
+        raise RuntimeError("没有加载到任何工具")
+    answer_cache = default_answer_cache if _worker["agent_config"].answer_cache else None
+
+    async def run() -> List[Tuple[int, Dict[str, Any]]]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(index: int, question: str) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                return index, await answer_question(graph, question, answer_cache)
+
+        return await asyncio.gather(*(one(index, question) for index, question in shard))
+
+    started = time.perf_counter()
+    results = _worker["loop"].run_until_complete(run())
+    return {
+        "pid": os.getpid(),
+        "results": results,
+        "busy_s": time.perf_counter() - started,
+        "startup_s": _worker.pop("startup_s", 0.0),  # 只在该进程的第一个分片中报告
+    }
+
+def _response(question: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """把 answer_question 的记录转换为 run_agent 的回答格式"""
+    response = {
+        "question": question,
+        "answer": record["answer"] if record["success"] else f"错误: {record['error']}",
+        "success": record["success"],
+        "total_ms": record["total_ms"],
+    }
+    if record["cached"]:
+        response["cached"] = True
+    if record.get("routed_to"):
+        response["routed_to"] = record["routed_to"]
+    return response
+
+async def run_agent_pool(task_config: Any, agent_config: Any, workers: Optional[int] = None,
+                         concurrency: Optional[int] = None, shard_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    用多个进程处理问题列表
+
+    参数:
+        task_config: 任务配置（问题列表）
+        agent_config: 智能体配置，每个工作进程按它构建自己的智能体
+        workers: 进程数，默认为 agent_config.workers
+        concurrency: 每个进程内同时处理的问题数，默认为 agent_config.worker_concurrency
+        shard_size: 每个分片的问题数，默认约为 问题数/(进程数*4)，分片较小时各进程的负载更均衡
+
+    返回:
+        与 run_agent 相同格式的结果字典，另外包含 workers（各进程的统计）和 throughput
+    """
+    questions = task_config.questions
+    workers = workers or agent_config.workers
+    concurrency = concurrency or agent_config.worker_concurrency
+    shard_size = shard_size or max(1, math.ceil(len(questions) / (workers * 4)))
+    indexed = list(enumerate(questions))
+    shards = [indexed[i:i + shard_size] for i in range(0, len(indexed), shard_size)]
+    print(f"🧵 工作池: {workers} 个进程，每个进程并发 {concurrency}，{len(shards)} 个分片")
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    responses: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+    worker_stats: Dict[int, Dict[str, Any]] = {}
+    # spawn: 工作进程不继承父进程的事件循环、线程和连接（也不继承注册的模型工厂，需要传过去）
+    from model_factory import registered_model_factories
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(agent_config, workers, registered_model_factories())) as pool:
+        futures = [loop.run_in_executor(pool, _run_shard, shard, concurrency) for shard in shards]
+        for done, future in enumerate(asyncio.as_completed(futures), 1):
+            shard_result = await future
+            for index, record in shard_result["results"]:
+                responses[index] = _response(questions[index], record)
+            stats = worker_stats.setdefault(shard_result["pid"], {"questions": 0, "busy_s": 0.0, "startup_s": 0.0})
+            stats["questions"] += len(shard_result["results"])
+            stats["busy_s"] += shard_result["busy_s"]
+            stats["startup_s"] += shard_result["startup_s"]
+            print(f"📦 分片 {done}/{len(shards)} 完成（进程 {shard_result['pid']}）", flush=True)
+
+    elapsed = time.perf_counter() - started
+    successful_tests = sum(1 for r in responses if r["success"])
+    result = {
+        "success": True,
+        "total_questions": len(questions),
+        "successful_tests": successful_tests,
+        "success_rate": successful_tests / len(questions) if questions else 0.0,
+        "responses": responses,
+        "agent_config": agent_config,
+        "task_config": task_config,
+        "workers": worker_stats,
+        "throughput": len(questions) / elapsed if elapsed else 0.0,
+    }
+
+    print(f"\n=== 任务完成 ===")
+    print(f"成功率: {successful_tests}/{len(questions)} ({result['success_rate']:.1%})")
+    print(f"耗时 {elapsed:.1f}s，{result['throughput']:.1f} 个问题/秒")
+    for pid, stats in worker_stats.items():
+        print(f"   进程 {pid}: {stats['questions']} 个问题，启动 {stats['startup_s']:.1f}s，处理 {stats['busy_s']:.1f}s")
+    return result